@@ -1,43 +1,170 @@
 """
-Healthcare Data Analysis Script
---------------------------------
-This script uses Polars (a fast DataFrame library) to analyze hospital CSV data.
-It loads and displays basic statistics about hospitals and physicians.
+Healthcare Data Analysis
+------------------------
+Columnar analytics over the hospital data files using lazy Polars scans.
+
+Every file is read from its typed Parquet copy (see parquet_cache.py, which
+converts a CSV on first use and again whenever it changes), so repeated runs
+skip CSV parsing. Nothing is read until a query is collected; Polars then
+pushes column selections (projection pushdown) and filters (predicate
+pushdown) into the Parquet reader, which also skips visit months whose
+statistics rule them out. With `collect(streaming=True)` visits are
+processed in batches, so files larger than RAM can be aggregated.
+
+The query functions take and return LazyFrames, so they can be combined
+with further filters before collecting:
+
+    visits = scan("visits").filter(pl.col("date_of_admission") >= date(2023, 1, 1))
+    collect(billing_per_payer(visits, scan("payers")))
+
+Run as a script to print a summary report.
 """
 
+import os
+
 import polars as pl
 
+from parquet_cache import DATE_COLUMNS, SCHEMAS, ParquetCache
+
 # ============================================================================
-# CONFIGURATION: Define paths to CSV data files
+# CONFIGURATION: Path of the CSV data files (column types live in parquet_cache)
 # ============================================================================
-HOSPITAL_DATA_PATH = "data/hospitals.csv"
-PHYSICIAN_DATA_PATH = "data/physicians.csv"
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
 
 # ============================================================================
-# LOAD AND ANALYZE HOSPITAL DATA
+# SCANS: Lazy, typed readers for each data file
 # ============================================================================
-# Read hospital CSV file into a Polars DataFrame
-data_hospitals = pl.read_csv(HOSPITAL_DATA_PATH)
+def scan(name, data_dir=None):
+    """
+    Lazily scan one of the six data files (e.g. scan("visits")) from its
+    Parquet cache, converting the CSV first if the cache is missing or stale.
+    """
+    return ParquetCache(data_dir or DATA_DIR).scan(name)
+
+
+def scan_csv(name, data_dir=None):
+    """
+    Lazily scan the raw CSV file, bypassing the Parquet cache.
+
+    Columns missing from the file are simply absent; types come from SCHEMAS
+    and date columns are parsed to pl.Date (unparsable values become null).
+    """
+    path = os.path.join(data_dir or DATA_DIR, f"{name}.csv")
+    frame = pl.scan_csv(path, dtypes=SCHEMAS[name])
+    dates = [
+        pl.col(column).str.to_date(strict=False)
+        for column in DATE_COLUMNS.get(name, [])
+        if column in frame.columns
+    ]
+    return frame.with_columns(dates) if dates else frame
+
+
+def scan_all(data_dir=None):
+    """Dict of name -> LazyFrame for all six data files"""
+    cache = ParquetCache(data_dir or DATA_DIR)
+    return {name: cache.scan(name) for name in SCHEMAS}
+
+
+def collect(frame, streaming=True):
+    """Collect a query; streaming processes the visits scan in batches"""
+    return frame.collect(streaming=streaming)
 
-# Display hospital data statistics
-print("=" * 60)
-print("HOSPITAL DATA ANALYSIS")
-print("=" * 60)
-print(f"Dataset shape (rows, columns): {data_hospitals.shape}")
-print("\nFirst 5 rows:")
-print(data_hospitals.head())
 
 # ============================================================================
-# LOAD AND ANALYZE PHYSICIAN DATA
+# QUERIES: Reusable aggregations (LazyFrame in, LazyFrame out)
 # ============================================================================
-# Read physician CSV file into a Polars DataFrame
-data_physicians = pl.read_csv(PHYSICIAN_DATA_PATH)
+def billing_per_payer(visits, payers):
+    """Visit count, total and average billing per insurance payer"""
+    return (
+        visits.select("payer_id", "billing_amount")
+        .group_by("payer_id")
+        .agg(
+            pl.count().alias("visits"),
+            pl.col("billing_amount").sum().alias("total_billing"),
+            pl.col("billing_amount").mean().alias("avg_billing"),
+        )
+        .join(payers.select("payer_id", "payer_name"), on="payer_id", how="left")
+        .sort("total_billing", descending=True)
+    )
+
+
+def length_of_stay_per_hospital(visits, hospitals):
+    """Average/median/max days between admission and discharge per hospital"""
+    stay = (pl.col("discharge_date") - pl.col("date_of_admission")).dt.total_days().alias("stay_days")
+    return (
+        visits.select("hospital_id", "date_of_admission", "discharge_date")
+        .filter(pl.col("discharge_date").is_not_null() & pl.col("date_of_admission").is_not_null())
+        .with_columns(stay)
+        .group_by("hospital_id")
+        .agg(
+            pl.count().alias("discharged_visits"),
+            pl.col("stay_days").mean().alias("avg_stay_days"),
+            pl.col("stay_days").median().alias("median_stay_days"),
+            pl.col("stay_days").max().alias("max_stay_days"),
+        )
+        .join(hospitals.select("hospital_id", "hospital_name"), on="hospital_id", how="left")
+        .sort("avg_stay_days", descending=True)
+    )
+
+
+def visit_volume_per_physician(visits, physicians):
+    """Visits and distinct patients per physician, busiest first"""
+    return (
+        visits.select("physician_id", "patient_id")
+        .group_by("physician_id")
+        .agg(
+            pl.count().alias("visits"),
+            pl.col("patient_id").n_unique().alias("patients"),
+        )
+        .join(physicians.select("physician_id", "physician_name"), on="physician_id", how="left")
+        .sort("visits", descending=True)
+    )
+
+
+def visit_volume_per_month(visits):
+    """Visits and billing per admission month"""
+    return (
+        visits.select("date_of_admission", "billing_amount")
+        .filter(pl.col("date_of_admission").is_not_null())
+        .group_by(pl.col("date_of_admission").dt.truncate("1mo").alias("month"))
+        .agg(
+            pl.count().alias("visits"),
+            pl.col("billing_amount").sum().alias("total_billing"),
+        )
+        .sort("month")
+    )
+
+
+def reviews_per_hospital(reviews):
+    """Review count per hospital name"""
+    return (
+        reviews.select("hospital_name")
+        .group_by("hospital_name")
+        .agg(pl.count().alias("reviews"))
+        .sort("reviews", descending=True)
+    )
+
+
+# ============================================================================
+# REPORT: Print every aggregation when run as a script
+# ============================================================================
+def main():
+    frames = scan_all()
+    reports = [
+        ("BILLING PER PAYER", billing_per_payer(frames["visits"], frames["payers"])),
+        ("LENGTH OF STAY PER HOSPITAL", length_of_stay_per_hospital(frames["visits"], frames["hospitals"])),
+        ("VISIT VOLUME PER PHYSICIAN", visit_volume_per_physician(frames["visits"], frames["physicians"]).head(10)),
+        ("VISIT VOLUME PER MONTH", visit_volume_per_month(frames["visits"])),
+        ("REVIEWS PER HOSPITAL", reviews_per_hospital(frames["reviews"]).head(10)),
+    ]
+    for title, query in reports:
+        print("=" * 60)
+        print(title)
+        print("=" * 60)
+        print(collect(query))
+        print()
+
 
-# Display physician data statistics
-print("\n" + "=" * 60)
-print("PHYSICIAN DATA ANALYSIS")
-print("=" * 60)
-print(f"Dataset shape (rows, columns): {data_physicians.shape}")
-print("\nFirst 5 rows:")
-print(data_physicians.head())
-print("=" * 60)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Async Neo4j Backend
+-------------------
+Runs independent sub-queries of a composite answer concurrently using the
+asyncio Neo4j driver (`AsyncGraphDatabase`).
+
+Streamlit executes every session's script in its own thread, so the runner
+owns ONE event loop on a background daemon thread and every session submits
+coroutines to it with `asyncio.run_coroutine_threadsafe`. The async driver
+and its connection pool live on that loop and are shared by all sessions.
+Latency of a composite answer approaches its slowest sub-query instead of
+the sum of all of them.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+
+from neo4j import READ_ACCESS, AsyncGraphDatabase
+
+
+class AsyncQueryRunner:
+    """
+    Event-loop thread plus async driver, safe to share across sessions.
+
+    Args:
+        uri: Neo4j Bolt URI
+        user: Neo4j username
+        password: Neo4j password
+        timeout: Seconds to wait for a batch of concurrent queries
+        driver_config: Extra keyword arguments for the async driver
+    """
+
+    def __init__(self, uri, user, password, timeout=30.0, **driver_config):
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="neo4j-async-loop", daemon=True
+        )
+        self._thread.start()
+        self.driver = self._submit(self._create_driver(uri, user, password, driver_config))
+
+    @staticmethod
+    async def _create_driver(uri, user, password, driver_config):
+        # Created on the loop thread so the pool is bound to the shared loop
+        return AsyncGraphDatabase.driver(uri, auth=(user, password), **driver_config)
+
+    def _submit(self, coroutine):
+        """
+        Run a coroutine on the shared loop and block for its result. On
+        timeout the task is cancelled, so its sub-queries stop and give
+        their connections back to the pool instead of running on.
+        """
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def _fetch(self, cypher, params):
+        async def work(tx):
+            result = await tx.run(cypher, params or {})
+            return [dict(record) async for record in result]
+
+        async with self.driver.session(default_access_mode=READ_ACCESS) as session:
+            return await session.execute_read(work)
+
+    async def _fetch_all(self, queries):
+        keys = list(queries)
+        rows = await asyncio.gather(*(self._fetch(*queries[key]) for key in keys))
+        return dict(zip(keys, rows))
+
+    def run_many(self, queries):
+        """
+        Run several queries concurrently.
+
+        Args:
+            queries: Mapping of key -> (cypher, params)
+
+        Returns:
+            Mapping of key -> list of row dicts
+        """
+        if not queries:
+            return {}
+        return self._submit(self._fetch_all(queries))
+
+    def close(self):
+        """Close the driver and stop the loop thread"""
+        self._submit(self.driver.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=self.timeout)
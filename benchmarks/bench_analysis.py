@@ -0,0 +1,114 @@
+"""
+Analytics Benchmark: eager read_csv vs lazy scan vs streaming vs Parquet
+------------------------------------------------------------------------
+Writes a synthetic dataset with a 10M-row visits.csv (by default), then runs
+the analysis.py aggregations (billing per payer, length of stay per
+hospital, visit volume per physician and per month) four ways:
+
+- eager:     pl.read_csv of the whole file, then the same queries
+- lazy:      scan_csv with projection/predicate pushdown, in-memory collect
+- streaming: scan_csv with pushdown, collect(streaming=True)
+- parquet:   the Parquet cache (parquet_cache.py), collect(streaming=True)
+
+The one-off CSV -> Parquet conversion is timed separately, before the runs.
+
+Dataset generation and each mode run in their own process, so every mode
+reports its own peak RSS (Linux carries ru_maxrss over from the parent).
+
+Usage:
+    python benchmarks/bench_analysis.py --visits 10000000
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import polars as pl
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import analysis  # noqa: E402
+from parquet_cache import ParquetCache  # noqa: E402
+from synthetic_data import write_dataset  # noqa: E402
+
+
+def queries(frames):
+    visits = frames["visits"]
+    return [
+        analysis.billing_per_payer(visits, frames["payers"]),
+        analysis.length_of_stay_per_hospital(visits, frames["hospitals"]),
+        analysis.visit_volume_per_physician(visits, frames["physicians"]),
+        analysis.visit_volume_per_month(visits),
+    ]
+
+
+def eager_frames(directory):
+    """Read every file completely, then query the in-memory frames"""
+    frames = {}
+    for name in ("hospitals", "payers", "physicians", "visits"):
+        path = os.path.join(directory, f"{name}.csv")
+        frame = pl.read_csv(path, dtypes=analysis.SCHEMAS[name])
+        dates = [pl.col(column).str.to_date(strict=False)
+                 for column in analysis.DATE_COLUMNS.get(name, []) if column in frame.columns]
+        frames[name] = (frame.with_columns(dates) if dates else frame).lazy()
+    return frames
+
+
+def convert(directory):
+    ParquetCache(directory).refresh_all()
+
+
+def run_mode(mode, directory, results):
+    started = time.perf_counter()
+    names = ("hospitals", "payers", "physicians", "visits")
+    if mode == "eager":
+        frames = eager_frames(directory)
+    elif mode == "parquet":
+        frames = {name: analysis.scan(name, directory) for name in names}
+    else:
+        frames = {name: analysis.scan_csv(name, directory) for name in names}
+    for query in queries(frames):
+        analysis.collect(query, streaming=mode != "lazy")
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in KiB on Linux
+    results.put((mode, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--visits", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        writer = context.Process(target=write_dataset, args=(directory, args.visits))
+        writer.start()
+        writer.join()
+        size = os.path.getsize(os.path.join(directory, "visits.csv")) / 2**20
+        print(f"Wrote {args.visits:,} visits ({size:,.0f} MiB) in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        converter = context.Process(target=convert, args=(directory,))
+        converter.start()
+        converter.join()
+        cache = ParquetCache(directory)
+        size = sum(os.path.getsize(path) for path in cache.files("visits")) / 2**20
+        print(f"Converted to Parquet ({size:,.0f} MiB of visits) in {time.perf_counter() - started:.1f}s")
+
+        print(f"\n{'mode':<12}{'seconds':>10}{'peak RSS (MiB)':>18}")
+        for mode in ("eager", "lazy", "streaming", "parquet"):
+            results = context.Queue()
+            process = context.Process(target=run_mode, args=(mode, directory, results))
+            process.start()
+            mode, elapsed, peak = results.get()
+            process.join()
+            print(f"{mode:<12}{elapsed:>10.2f}{peak:>18,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Response Formatting Benchmark: per-row if/elif ladder vs formatter registry
+--------------------------------------------------------------------------
+Formats 10k-row results (by default) of every chatbot result shape three
+ways:
+
+- ladder:   the previous formatter, which picked a branch by inspecting the
+            first row's keys on every call and yielded one chunk per row
+- registry: response_format with the page cap lifted (every row rendered)
+- page:     response_format as the chatbot uses it (first page only)
+
+Besides time, it reports the number of chunks and the total characters
+st.write_stream re-renders (it redraws the whole message after each chunk),
+which is what made long answers slow in the browser.
+
+Usage:
+    python benchmarks/bench_format_response.py --rows 10000
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import response_format  # noqa: E402
+
+SHAPES = {
+    "hospitals": lambda i: {"Hospital": f"Hospital {i}", "State": "CA"},
+    "patients": lambda i: {"Patient": f"Patient {i}", "Physician": f"Dr. {i % 50}", "Visits": i % 7},
+    "payer_billing": lambda i: {"Payer": f"Payer {i}", "Visits": i, "Total_Billing": i * 101.5},
+    "physician_salaries": lambda i: {"Physician": f"Dr. {i}", "School": "State U", "Salary": 250000 + i},
+    "patient_history": lambda i: {"Patient": "Jane", "Date": "2023-01-01", "Hospital": "H", "Diagnosis": "Flu"},
+    "generic": lambda i: {"Name": f"Row {i}", "Value": i},
+}
+
+
+def ladder(data):
+    """The formatter before the registry (per-row chunks, keys re-inspected)"""
+    rows = iter(data)
+    first = next(rows, None)
+    if first is None:
+        return
+    rows = itertools.chain([first], rows)
+    keys = list(first.keys())
+    total = len(data)
+    if "Hospital" in keys and "State" in keys:
+        yield f"I found {total} hospital(s):\n\n"
+        for item in rows:
+            yield f"• **{item['Hospital']}** - {item['State']}\n"
+    elif "Patient" in keys and "Physician" in keys:
+        yield "Here are the patients:\n\n"
+        for item in rows:
+            line = f"• **{item['Patient']}** treated by {item['Physician']}"
+            if 'Visits' in item:
+                line += f" ({item['Visits']} visits)"
+            yield line + "\n"
+    elif "Payer" in keys and "Total_Billing" in keys:
+        yield "Billing per insurance payer:\n\n"
+        for item in rows:
+            yield f"• **{item['Payer']}** - ${item['Total_Billing']:,.2f} over {item['Visits']} visits\n"
+    elif "Physician" in keys and "Salary" in keys:
+        yield "Here are the physicians:\n\n"
+        for item in rows:
+            yield f"• **{item['Physician']}** - ${item['Salary']:,.0f}\n"
+            if 'School' in item:
+                yield f"   School: {item['School']}\n"
+    elif "Diagnosis" in keys:
+        yield "Patient medical information:\n\n"
+        for item in rows:
+            yield (
+                f"Date: {item.get('Date', 'N/A')}\n"
+                f"  Diagnosis: {item['Diagnosis']}\n"
+                f"  Hospital: {item.get('Hospital', 'N/A')}\n\n"
+            )
+    else:
+        yield f"Found {total} result(s):\n\n"
+        for item in rows:
+            yield "".join(f"**{key}:** {value}\n" for key, value in item.items()) + "\n"
+
+
+def registry(data):
+    return response_format.iter_response(data)
+
+
+def measure(render, data, repeats):
+    """(ms per call, chunks, characters re-rendered by st.write_stream)"""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        chunks = list(render(data))
+    elapsed = (time.perf_counter() - started) * 1000 / repeats
+    shown = redrawn = 0
+    for chunk in chunks:
+        shown += len(chunk)
+        redrawn += shown
+    return elapsed, len(chunks), redrawn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'shape':<20}{'mode':<10}{'ms':>9}{'chunks':>9}{'redrawn MB':>12}")
+    for shape, make in SHAPES.items():
+        data = [make(i) for i in range(args.rows)]
+        for mode, render in (("ladder", ladder), ("registry", registry), ("page", registry)):
+            response_format.RESPONSE_PAGE_ROWS = args.rows if mode == "registry" else 200
+            elapsed, chunks, redrawn = measure(render, data, args.repeats)
+            print(f"{shape:<20}{mode:<10}{elapsed:>9.2f}{chunks:>9,}{redrawn / 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
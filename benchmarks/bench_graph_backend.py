@@ -0,0 +1,86 @@
+"""
+Graph Backend Benchmark
+-----------------------
+Times every chatbot intent against the in-process graph backend, built from
+a synthetic dataset (or the CSV files in --data-dir). With --neo4j the same
+Cypher is also timed against the Neo4j instance from NEO4J_URI, which
+should hold the same data (e.g. loaded with load_data.py from --data-dir).
+
+Usage:
+    python benchmarks/bench_graph_backend.py --visits 100000
+    python benchmarks/bench_graph_backend.py --data-dir data --neo4j
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from graph_backend import (  # noqa: E402
+    CHATBOT_QUERY_HANDLERS,
+    InMemoryBackend,
+    InMemoryGraph,
+    Neo4jBackend,
+)
+from intent_router import DEFAULT_INTENT, HOSPITAL_INTENTS  # noqa: E402
+from response_format import page_params  # noqa: E402
+from synthetic_data import write_dataset  # noqa: E402
+
+PARAMS = {"state": "CA", "physician_ids": [1, 2], "patient_ids": [1, 2]}
+
+
+def time_intents(backend, repeat):
+    """Mean latency in microseconds per intent"""
+    timings = {}
+    for intent in [*HOSPITAL_INTENTS, DEFAULT_INTENT]:
+        params = {slot: PARAMS[slot] for slot in intent.slots}
+        params = page_params(params) if intent.paged else params
+        seconds = timeit.timeit(lambda: backend.run(intent.cypher, params), number=repeat)
+        timings[intent.name] = 1e6 * seconds / repeat
+    return timings
+
+
+def run(data_dir, repeat, neo4j):
+    started = time.perf_counter()
+    graph = InMemoryGraph.from_csv_dir(data_dir)
+    print(f"Built in-memory graph ({len(graph.visits):,} visits) in {time.perf_counter() - started:.2f}s")
+    results = {"memory": time_intents(InMemoryBackend(graph, CHATBOT_QUERY_HANDLERS), repeat)}
+    if neo4j:
+        backend = Neo4jBackend(
+            os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+            os.getenv("NEO4J_USERNAME", "neo4j"),
+            os.getenv("NEO4J_PASSWORD", "password"),
+        )
+        try:
+            results["neo4j"] = time_intents(backend, max(1, repeat // 10))
+        finally:
+            backend.close()
+
+    print(f"\n{'intent':<26}" + "".join(f"{name + ' (us)':>16}" for name in results))
+    for intent in results["memory"]:
+        print(f"{intent:<26}" + "".join(f"{timings[intent]:>16,.1f}" for timings in results.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--visits", type=int, default=100_000)
+    parser.add_argument("--data-dir", help="use these CSV files instead of a synthetic dataset")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--neo4j", action="store_true", help="also time the Cypher against Neo4j")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        run(args.data_dir, args.repeat, args.neo4j)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Writing synthetic dataset with {args.visits:,} visits to {directory}")
+        write_dataset(directory, args.visits)
+        run(directory, args.repeat, args.neo4j)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Intent Router Micro-benchmark
+-----------------------------
+Measures per-question routing cost as the intent table grows from 10 to 500
+patterns, for two kinds of padding intents:
+- unrelated: phrases no question contains, so they are never candidates;
+  the cost should stay flat (the phrase table is one dict probe per token)
+- overlapping: one keyword group uses a word of the questions, the other
+  never matches, and they come before the real intents. Every one of them
+  becomes a candidate that is checked and rejected, so the cost grows with
+  the number of candidates; the report shows them per question.
+
+Usage:
+    python benchmarks/bench_intent_router.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from intent_router import (  # noqa: E402
+    DEFAULT_INTENT,
+    HOSPITAL_INTENTS,
+    HOSPITAL_SLOT_PHRASES,
+    TOKEN_PATTERN,
+    Intent,
+    IntentRouter,
+)
+
+TABLE_SIZES = [10, 50, 100, 250, 500]
+QUESTIONS = [
+    "Which hospitals are in the hospital system?",
+    "Show me all hospitals in California",
+    "Which patients were treated by Dr. Sarah Johnson?",
+    "What is the visit history for patient John Smith?",
+    "Show me the most common diagnoses",
+    "Which physicians have the highest salaries?",
+    "What are the hospital statistics?",
+    "Show me patient reviews about cardiology wait times",
+]
+
+
+# Words of QUESTIONS used by the overlapping padding
+QUESTION_WORDS = sorted({
+    word for question in QUESTIONS for word in TOKEN_PATTERN.findall(question.lower())
+})
+
+
+def build_router(size, overlapping=False):
+    """Pad the real intent table with synthetic two-keyword intents"""
+    padding = []
+    for i in range(max(0, size - len(HOSPITAL_INTENTS))):
+        if overlapping:
+            keywords = [(QUESTION_WORDS[i % len(QUESTION_WORDS)],), (f"detail{i}",)]
+        else:
+            keywords = [(f"topic{i}", f"subject{i}"), (f"detail{i}",)]
+        padding.append(Intent(f"synthetic_{i}", keywords, "RETURN 1"))
+    # Overlapping padding goes first, so it is checked before the real winner
+    intents = [*padding, *HOSPITAL_INTENTS] if overlapping else [*HOSPITAL_INTENTS, *padding]
+    return IntentRouter(intents, DEFAULT_INTENT, HOSPITAL_SLOT_PHRASES)
+
+
+def candidates_per_question(router):
+    """Mean number of intents whose keywords a question touches"""
+    tokens = [TOKEN_PATTERN.findall(question.lower()) for question in QUESTIONS]
+    return sum(len(router._scan(question)[2]) for question in tokens) / len(tokens)
+
+
+def run(number=2000):
+    """Time routing of the sample questions for each table size and padding"""
+    results = []
+    for padding in ["unrelated", "overlapping"]:
+        for size in TABLE_SIZES:
+            router = build_router(size, overlapping=padding == "overlapping")
+            elapsed = timeit.timeit(
+                lambda: [router.route(question) for question in QUESTIONS], number=number
+            )
+            per_question_us = elapsed / (number * len(QUESTIONS)) * 1e6
+            candidates = candidates_per_question(router)
+            results.append({
+                "padding": padding,
+                "patterns": size,
+                "candidates": candidates,
+                "per_question_us": per_question_us,
+            })
+            print(f"{padding:>11} {size:>5} intents: {candidates:6.1f} candidates, "
+                  f"{per_question_us:8.2f} us/question")
+    return results
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,103 @@
+"""
+Loader Benchmark: per-row session.run vs batched UNWIND
+-------------------------------------------------------
+Writes a synthetic dataset (1M visits by default), then loads it into the
+Neo4j instance from NEO4J_URI twice: once with the old per-row path and once
+with the batched UNWIND loader from load_data.py. The database is wiped
+before each run, so point this at a scratch instance.
+
+The per-row path is only run on the first --per-row-visits visits (it needs
+one round trip per row) and its rate is reported alongside the batched one.
+
+Usage:
+    python benchmarks/bench_load_data.py --visits 1000000 --batch-size 5000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from neo4j import GraphDatabase  # noqa: E402
+
+import load_data  # noqa: E402
+from synthetic_data import write_dataset  # noqa: E402
+
+PER_ROW_VISIT_QUERY = """
+    MATCH (patient:Patient {id: toInteger($pid)})
+    MATCH (hospital:Hospital {id: toInteger($hid)})
+    MATCH (physician:Physician {id: toInteger($phid)})
+    MATCH (payer:Payer {id: toInteger($payid)})
+    CREATE (visit:Visit {
+        id: toInteger($id),
+        admission_date: $date,
+        diagnosis: $diagnosis,
+        chief_complaint: $complaint
+    })
+    CREATE (patient)-[:HAS]->(visit)
+    CREATE (visit)-[:AT]->(hospital)
+    CREATE (physician)-[:TREATS]->(visit)
+    CREATE (visit)-[:COVERED_BY]->(payer)
+"""
+
+
+def per_row_visits(session, directory, limit):
+    """The original loader: one auto-commit session.run per visit"""
+    started = time.perf_counter()
+    count = 0
+    for v in load_data.iter_csv("visits.csv", directory):
+        if count >= limit:
+            break
+        session.run(PER_ROW_VISIT_QUERY, id=v["visit_id"], pid=v["patient_id"],
+                    hid=v["hospital_id"], phid=v["physician_id"], payid=v["payer_id"],
+                    date=v["date_of_admission"], diagnosis=v["primary_diagnosis"],
+                    complaint=v["chief_complaint"]).consume()
+        count += 1
+    return count, time.perf_counter() - started
+
+
+def reset(driver, directory, batch_size):
+    """Empty the database and load every dimension table (batched)"""
+    with driver.session() as session:
+        load_data.clean_database(session, batch_size)
+        load_data.create_constraints(session)
+        for name, filename, query in load_data.ENTITIES:
+            if name not in ("visits", "reviews"):
+                load_data.load_entity(session, query, load_data.iter_csv(filename, directory), batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--visits", type=int, default=1_000_000)
+    parser.add_argument("--per-row-visits", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=load_data.BATCH_SIZE)
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(load_data.URI, auth=(load_data.USER, load_data.PASSWORD))
+    visit_query = dict((name, query) for name, _, query in load_data.ENTITIES)["visits"]
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Writing synthetic dataset with {args.visits:,} visits to {directory}")
+        write_dataset(directory, args.visits)
+
+        reset(driver, directory, args.batch_size)
+        with driver.session() as session:
+            count, elapsed = per_row_visits(session, directory, args.per_row_visits)
+        per_row_rate = count / elapsed
+        print(f"per-row : {count:,} visits in {elapsed:.1f}s ({per_row_rate:,.0f} rows/sec)")
+
+        reset(driver, directory, args.batch_size)
+        with driver.session() as session:
+            count, elapsed = load_data.load_entity(
+                session, visit_query, load_data.iter_csv("visits.csv", directory), args.batch_size
+            )
+        batched_rate = count / elapsed
+        print(f"batched : {count:,} visits in {elapsed:.1f}s ({batched_rate:,.0f} rows/sec)")
+        print(f"speedup : {batched_rate / per_row_rate:.1f}x")
+    driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Name Index Micro-benchmark
+--------------------------
+Measures how long it takes to find the names mentioned in a question with
+100k indexed people.
+
+Usage:
+    python benchmarks/bench_name_index.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from intent_router import TOKEN_PATTERN  # noqa: E402
+from name_index import NameIndex  # noqa: E402
+
+FIRST_NAMES = ["sarah", "michael", "john", "mary", "james", "linda", "robert", "patricia"]
+QUESTIONS = [
+    "Which patients were treated by Dr. Sarah Johnson?",
+    "What is the visit history for patient John Smith?",
+    "What is the visit history for patient Jhon Smith?",
+    "Show me the most common diagnoses",
+]
+
+
+def build_index(size, seed=42):
+    """Index `size` synthetic patients plus a handful of physicians"""
+    rng = random.Random(seed)
+    index = NameIndex()
+    index.add_many(
+        ("Patient", node_id, f"{rng.choice(FIRST_NAMES).title()} Surname{node_id}")
+        for node_id in range(size)
+    )
+    index.add("Patient", size, "John Smith")
+    index.add("Physician", 1, "Dr. Sarah Johnson")
+    return index
+
+
+def run(size=100_000, number=2000):
+    """Time name extraction for the sample questions"""
+    index = build_index(size)
+    tokenized = [TOKEN_PATTERN.findall(question.lower()) for question in QUESTIONS]
+    elapsed = timeit.timeit(
+        lambda: [index.find_in_tokens(tokens) for tokens in tokenized], number=number
+    )
+    per_question_us = elapsed / (number * len(QUESTIONS)) * 1e6
+    print(f"{size} names indexed: {per_question_us:.2f} us/question")
+    return {"names": size, "per_question_us": per_question_us}
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,129 @@
+"""
+Review Search Benchmark: exhaustive scan vs IVF index
+-----------------------------------------------------
+Builds a review_search.ReviewIndex over synthetic reviews (1M by default,
+assembled from complaint/praise phrases so that topics repeat the way real
+reviews do, plus random words), then times top-10 queries:
+
+- scan:     every vector scored against the query (exact results)
+- ivf:      only the rows in the query's nprobe nearest IVF lists
+- hospital: IVF skipped, one hospital's reviews scored exhaustively
+
+and reports recall@10 of the IVF results against the exact scan. An
+incremental sync of 1% new reviews is timed after the initial build.
+
+Usage:
+    python benchmarks/bench_review_search.py --reviews 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import polars as pl
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import review_search  # noqa: E402
+
+HOSPITALS = 30
+PHRASES = [
+    "waited hours in the emergency room before anyone saw me",
+    "the wait time was far too long",
+    "nurses were kind and attentive",
+    "the doctor explained everything clearly",
+    "billing department overcharged my insurance",
+    "room was dirty and noisy at night",
+    "food was cold and tasteless",
+    "parking was expensive and hard to find",
+    "discharge process was quick and smooth",
+    "staff were rude at the front desk",
+    "pain was managed well after surgery",
+    "could not get test results for days",
+]
+FILLERS = ["overall", "honestly", "during my stay", "this time", "again", "sadly", "thankfully"]
+# Stand-ins for names, places and other words that vary between reviews
+NOISE_WORDS = 20_000
+QUERIES = [
+    "complaints about wait times",
+    "rude staff",
+    "expensive parking",
+    "surgery pain management",
+    "dirty rooms",
+    "billing problems with insurance",
+]
+
+
+def synthetic_reviews(count, start=0, seed=42):
+    rng = np.random.default_rng(seed + start)
+    phrases = np.array(PHRASES)
+    fillers = np.array(FILLERS)
+    first = phrases[rng.integers(0, len(PHRASES), count)]
+    second = phrases[rng.integers(0, len(PHRASES), count)]
+    filler = fillers[rng.integers(0, len(FILLERS), count)]
+    noise = np.char.add("w", rng.integers(0, NOISE_WORDS, (count, 2)).astype(str))
+    texts = np.char.add(np.char.add(np.char.add(first, ", "), filler), np.char.add(", ", second))
+    texts = np.char.add(np.char.add(texts, " "), np.char.add(np.char.add(noise[:, 0], " "), noise[:, 1]))
+    return pl.DataFrame({
+        "review_id": np.arange(start, start + count, dtype=np.int64),
+        "review": texts.tolist(),
+        "hospital_id": rng.integers(0, HOSPITALS, count),
+    })
+
+
+def timed(function, repeats):
+    """Median milliseconds per call and the last result"""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - started) * 1000)
+    return float(np.median(times)), result
+
+
+def exact(index, text, k):
+    query = index.embedder.embed([text])[0]
+    scores = np.asarray(index.vectors) @ query
+    best = review_search._top(scores, k)
+    return list(zip(index.ids[best].tolist(), scores[best].tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    reviews = synthetic_reviews(args.reviews)
+    with tempfile.TemporaryDirectory() as directory:
+        index = review_search.ReviewIndex(directory, review_search.HashingEmbedder())
+        started = time.perf_counter()
+        index.sync(reviews)
+        print(f"Indexed {len(index):,} reviews ({len(index.centroids):,} IVF lists) "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        extra = synthetic_reviews(max(1, args.reviews // 100), start=args.reviews)
+        started = time.perf_counter()
+        summary = index.sync(pl.concat([reviews, extra]))
+        print(f"Incremental sync of {len(extra):,} new reviews in {time.perf_counter() - started:.2f}s "
+              f"(rebuilt: {summary['rebuilt']})")
+
+        # Reopen from disk, as the chatbot does
+        index = review_search.ReviewIndex(directory, review_search.HashingEmbedder())
+        print(f"\n{'query':<34}{'scan ms':>9}{'ivf ms':>9}{'hospital ms':>13}{'recall@10':>11}")
+        for text in QUERIES:
+            scan_ms, truth = timed(lambda: exact(index, text, args.k), max(1, args.repeats // 4))
+            ivf_ms, found = timed(lambda: index.search(text, args.k), args.repeats)
+            hospital_ms, _ = timed(lambda: index.search(text, args.k, hospital_ids=[3]), args.repeats)
+            # Ties are common with templated text, so compare scores, not ids
+            cutoff = truth[-1][1] - 1e-6
+            recall = sum(score >= cutoff for _, score in found) / len(truth)
+            print(f"{text:<34}{scan_ms:>9.1f}{ivf_ms:>9.2f}{hospital_ms:>13.2f}{recall:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Benchmark Suite: every ETL path, chatbot intent and analysis pipeline
+---------------------------------------------------------------------
+Writes one synthetic dataset (synthetic_data.py, 100k visits by default)
+and times, without a database:
+
+- generate: writing the dataset itself
+- etl:      CSV -> Parquet conversion, the loader's row batches read from
+            Parquet and from CSV, incremental change detection (first run,
+            then a re-scan of touched but unchanged files) and the
+            neo4j-admin import export
+- graph:    building the in-process graph (graph_backend.InMemoryGraph)
+- intents:  every chatbot intent against the in-process backend (median
+            and p95 over --repeat runs)
+- analysis: every analysis.py pipeline over the Parquet cache
+
+With --neo4j the batched loader and the aggregate refresh are also timed
+against the Neo4j instance from NEO4J_URI. The database is wiped first, so
+point this at a scratch instance.
+
+Results go to a JSON report (--output). Each entry has "ms", the figure
+compared across runs, plus rows and rates where they apply. With --compare
+the run is checked against an earlier report: every benchmark's change is
+printed and the exit status is 1 if any that takes at least --min-ms got
+more than --tolerance slower.
+
+Usage:
+    python benchmarks/bench_suite.py --visits 1000000 --output bench.json
+    python benchmarks/bench_suite.py --visits 1000000 --compare bench.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import polars as pl
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import analysis  # noqa: E402
+import load_data  # noqa: E402
+from graph_backend import CHATBOT_QUERY_HANDLERS, InMemoryBackend, InMemoryGraph  # noqa: E402
+from incremental import CsvDelta, CsvManifest  # noqa: E402
+from intent_router import DEFAULT_INTENT, HOSPITAL_INTENTS, REVIEW_SEARCH_INTENT  # noqa: E402
+from parquet_cache import ParquetCache  # noqa: E402
+from response_format import page_params  # noqa: E402
+from synthetic_data import write_dataset  # noqa: E402
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+ANALYSIS_PIPELINES = {
+    "billing_per_payer": lambda frames: analysis.billing_per_payer(frames["visits"], frames["payers"]),
+    "length_of_stay_per_hospital": lambda frames: analysis.length_of_stay_per_hospital(
+        frames["visits"], frames["hospitals"]
+    ),
+    "visit_volume_per_physician": lambda frames: analysis.visit_volume_per_physician(
+        frames["visits"], frames["physicians"]
+    ),
+    "visit_volume_per_month": lambda frames: analysis.visit_volume_per_month(frames["visits"]),
+    "reviews_per_hospital": lambda frames: analysis.reviews_per_hospital(frames["reviews"]),
+}
+
+
+class Report:
+    """Benchmark results keyed "<group>.<name>", plus run metadata"""
+
+    def __init__(self, visits, seed):
+        self.meta = {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "version": version_info(),
+            "dataset": {"visits": visits, "seed": seed},
+        }
+        self.results = {}
+
+    def measure(self, name, run, rows=None):
+        """Time one call of run(); returns its result"""
+        started = time.perf_counter()
+        value = run()
+        elapsed = time.perf_counter() - started
+        result = {"ms": round(elapsed * 1000, 3)}
+        if rows is not None:
+            count = rows(value) if callable(rows) else rows
+            result.update(rows=count, rows_per_sec=round(count / elapsed) if elapsed else None)
+        self.add(name, result)
+        return value
+
+    def measure_repeated(self, name, run, repeat):
+        """Median and p95 over `repeat` calls of run()"""
+        timings = np.empty(repeat)
+        for i in range(repeat):
+            started = time.perf_counter_ns()
+            run()
+            timings[i] = (time.perf_counter_ns() - started) / 1e6
+        p50, p95 = np.percentile(timings, [50, 95])
+        self.add(name, {"ms": round(float(p50), 4), "p95_ms": round(float(p95), 4), "n": repeat})
+
+    def add(self, name, result):
+        self.results[name] = result
+        extra = f"{result['rows']:>14,} rows" if "rows" in result else ""
+        print(f"{name:<44}{result['ms']:>12,.3f} ms{extra}")
+
+    def to_dict(self):
+        return {**self.meta, "results": self.results}
+
+
+def version_info():
+    """Commit and library versions, so reports can be lined up over time"""
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "describe": git("describe", "--always", "--dirty"),
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "numpy": np.__version__,
+    }
+
+
+# ============================================================================
+# GROUPS
+# ============================================================================
+def bench_etl(report, directory):
+    cache = ParquetCache(directory, os.path.join(directory, ".parquet"))
+    report.measure("etl.parquet_convert", lambda: cache.refresh_all(force=True),
+                   rows=lambda _: sum(cache.entry(name)["rows"] for name in analysis.SCHEMAS))
+
+    def stream_batches():
+        # Typed like load_data.load_all does (column_types.RowCoercer)
+        total = 0
+        for name, filename, _ in load_data.ENTITIES:
+            coercer, rows = load_data.typed_rows(name, load_data.iter_csv(filename, directory), directory)
+            total += sum(len(batch) for batch in load_data.chunked(rows, load_data.BATCH_SIZE))
+            coercer.rejects.close()
+        return total
+
+    from_parquet = load_data.LOAD_FROM_PARQUET
+    try:
+        load_data.LOAD_FROM_PARQUET = True
+        report.measure("etl.loader_batches_parquet", stream_batches, rows=lambda rows: rows)
+        load_data.LOAD_FROM_PARQUET = False
+        report.measure("etl.loader_batches_csv", stream_batches, rows=lambda rows: rows)
+    finally:
+        load_data.LOAD_FROM_PARQUET = from_parquet
+
+    manifest = CsvManifest(os.path.join(directory, ".etl_state", "bench.json"))
+
+    def detect_changes():
+        rows = 0
+        for name, filename, _ in load_data.ENTITIES:
+            id_column = load_data.UPSERT_ENTITIES[name][0]
+            delta = CsvDelta(manifest, name, os.path.join(directory, filename), id_column)
+            for _ in delta.changed_rows():
+                pass
+            delta.commit()
+            rows += len(delta.current)
+        manifest.save()
+        return rows
+
+    report.measure("etl.incremental_first_run", detect_changes, rows=lambda rows: rows)
+    # Touched but unchanged files are re-hashed row by row
+    for _, filename, _ in load_data.ENTITIES:
+        os.utime(os.path.join(directory, filename))
+    report.measure("etl.incremental_rescan", detect_changes, rows=lambda rows: rows)
+
+    try:
+        import admin_import
+    except ImportError as e:  # the ETL service's dependencies are not installed
+        print(f"{'etl.admin_import_export':<44}skipped ({e})")
+        return
+    output_dir = os.path.join(directory, "admin_import")
+    os.makedirs(output_dir, exist_ok=True)
+
+    def export():
+        return sum(
+            sum(admin_import.export_source(os.path.join(directory, filename), outputs, output_dir).values())
+            for (_, filename, _), (_, outputs) in zip(load_data.ENTITIES, admin_import.EXPORTS)
+        )
+
+    report.measure("etl.admin_import_export", export, rows=lambda rows: rows)
+
+
+def intent_params(graph):
+    """Slot values that exist in the generated data"""
+    states = graph.hospitals["state_name"]
+    busiest = np.argsort(-graph.visits_per_physician, kind="stable")[:2]
+    return {
+        "state": str(states[0]) if len(states) else "CA",
+        "physician_ids": graph.physicians.ids[busiest].tolist(),
+        "patient_ids": graph.patients.ids[:2].tolist(),
+        "review_ids": graph.reviews.ids[:10].tolist(),
+    }
+
+
+def bench_intents(report, graph, repeat):
+    backend = InMemoryBackend(graph, CHATBOT_QUERY_HANDLERS)
+    params = intent_params(graph)
+    for intent in [*HOSPITAL_INTENTS, DEFAULT_INTENT, REVIEW_SEARCH_INTENT]:
+        slots = {slot: params[slot] for slot in intent.slots}
+        slots = page_params(slots) if intent.paged else slots
+        report.measure_repeated(f"intents.{intent.name}", lambda: backend.run(intent.cypher, slots), repeat)
+
+
+def bench_analysis(report, directory):
+    cache = ParquetCache(directory, os.path.join(directory, ".parquet"))
+    frames = {name: cache.scan(name) for name in analysis.SCHEMAS}
+    for name, pipeline in ANALYSIS_PIPELINES.items():
+        report.measure(f"analysis.{name}", lambda: analysis.collect(pipeline(frames)))
+
+
+def bench_neo4j(report, directory):
+    from neo4j import GraphDatabase
+    from aggregates import refresh_aggregates
+
+    driver = GraphDatabase.driver(load_data.URI, auth=(load_data.USER, load_data.PASSWORD))
+    try:
+        with driver.session() as session:
+            load_data.clean_database(session)
+            load_data.create_constraints(session)
+        loaded = load_data.load_all(driver, directory)
+        for name, timing in loaded.items():
+            report.add(f"neo4j.load_{name}", {
+                "ms": round(timing["seconds"] * 1000, 3),
+                "rows": timing["rows"],
+                "rows_per_sec": round(timing["rows_per_sec"]),
+            })
+        with driver.session() as session:
+            report.measure("neo4j.refresh_aggregates", lambda: refresh_aggregates(session))
+    finally:
+        driver.close()
+
+
+# ============================================================================
+# COMPARISON
+# ============================================================================
+def compare(current, baseline, tolerance, min_ms):
+    """
+    Print the change per benchmark; returns the names that regressed.
+
+    Benchmarks under `min_ms` in both runs are shown but never flagged
+    (their timings are mostly noise).
+    """
+    if current["dataset"] != baseline.get("dataset"):
+        print(f"\nWarning: baseline dataset {baseline.get('dataset')} differs from {current['dataset']}")
+    print(f"\n{'benchmark':<44}{'baseline ms':>14}{'current ms':>14}{'change':>10}")
+    regressed = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None or not before.get("ms"):
+            print(f"{name:<44}{'-':>14}{result['ms']:>14,.3f}{'new':>10}")
+            continue
+        change = result["ms"] / before["ms"] - 1
+        flag = " !" if change > tolerance and max(result["ms"], before["ms"]) >= min_ms else ""
+        if flag:
+            regressed.append(name)
+        print(f"{name:<44}{before['ms']:>14,.3f}{result['ms']:>14,.3f}{change:>+9.0%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--visits", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=200, help="runs per chatbot intent")
+    parser.add_argument("--data-dir", help="keep the generated dataset here instead of a temp folder")
+    parser.add_argument("--neo4j", action="store_true", help="also time loading into NEO4J_URI (wipes it)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown that counts as a regression (0.2 = 20%%)")
+    parser.add_argument("--min-ms", type=float, default=1.0,
+                        help="never flag benchmarks faster than this")
+    args = parser.parse_args()
+
+    report = Report(args.visits, args.seed)
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.data_dir or scratch
+        print(f"Synthetic dataset: {args.visits:,} visits (seed {args.seed}) in {directory}\n")
+        counts = report.measure("generate.write_dataset",
+                                lambda: write_dataset(directory, args.visits, args.seed),
+                                rows=lambda counts: sum(counts.values()))
+        report.meta["dataset"]["rows"] = counts
+
+        bench_etl(report, directory)
+        graph = report.measure("graph.build", lambda: InMemoryGraph.from_csv_dir(directory),
+                               rows=lambda graph: len(graph.visits))
+        bench_intents(report, graph, args.repeat)
+        bench_analysis(report, directory)
+        if args.neo4j:
+            bench_neo4j(report, directory)
+
+    result = report.to_dict()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=1)
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(result, json.load(f), args.tolerance, args.min_ms)
+        if regressed:
+            print(f"\n{len(regressed)} benchmark(s) more than {args.tolerance:.0%} slower: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
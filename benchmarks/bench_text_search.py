@@ -0,0 +1,137 @@
+"""
+Text Search Benchmark: substring scan vs trigram / full-text index
+------------------------------------------------------------------
+Times the diagnosis and review searches on a synthetic dataset (1M visits
+by default) with the in-process graph:
+
+- before: case-insensitive substring scan over every visit/review
+- after:  the TrigramIndex lookup the memory backend now uses
+
+With --neo4j the same searches are also timed against the Neo4j instance
+from NEO4J_URI (load --data-dir into it first, e.g. with load_data.py),
+comparing a CONTAINS filter with db.index.fulltext.queryNodes.
+
+Usage:
+    python benchmarks/bench_text_search.py --visits 1000000
+    python benchmarks/bench_text_search.py --data-dir data --neo4j
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from graph_backend import InMemoryGraph, Neo4jBackend  # noqa: E402
+from text_search import REVIEW_TEXT_INDEX, VISIT_TEXT_INDEX, lucene_query  # noqa: E402
+from synthetic_data import write_dataset  # noqa: E402
+
+SEARCHES = [("diagnosis", "pneumonia"), ("diagnosis", "hypertension"), ("review", "great care")]
+
+CONTAINS_QUERIES = {
+    "diagnosis": """
+        MATCH (visit:Visit)
+        WHERE toLower(visit.diagnosis) CONTAINS $text
+        RETURN visit.id AS id ORDER BY visit.admission_date DESC, visit.id LIMIT 10
+    """,
+    "review": """
+        MATCH (review:Review)
+        WHERE toLower(review.text) CONTAINS $text
+        RETURN review.id AS id ORDER BY review.id LIMIT 10
+    """,
+}
+
+FULLTEXT_QUERIES = {
+    "diagnosis": f"""
+        CALL db.index.fulltext.queryNodes('{VISIT_TEXT_INDEX}', $query) YIELD node AS visit, score
+        RETURN visit.id AS id ORDER BY score DESC, visit.admission_date DESC, visit.id LIMIT 10
+    """,
+    "review": f"""
+        CALL db.index.fulltext.queryNodes('{REVIEW_TEXT_INDEX}', $query) YIELD node AS review, score
+        RETURN review.id AS id ORDER BY score DESC, review.id LIMIT 10
+    """,
+}
+
+FIELDS = {"diagnosis": "diagnosis", "review": "text"}
+
+
+def scan_search(graph, kind, text):
+    """The previous path: substring test on every row, then sort"""
+    if kind == "diagnosis":
+        rows = np.flatnonzero(np.char.find(np.char.lower(graph.visits["diagnosis"]), text) >= 0)
+        return graph.order_visits(rows)[:10]
+    rows = np.flatnonzero(np.char.find(np.char.lower(graph.reviews["text"]), text) >= 0)
+    return rows[:10]
+
+
+def index_search(graph, kind, text):
+    if kind == "diagnosis":
+        rows, scores = graph.diagnosis_index.search(text)
+        order = np.lexsort((graph.visits.ids[rows], -graph.visit_days[rows], -scores))
+        return rows[order][:10]
+    return graph.review_index.search(text)[0][:10]
+
+
+def time_ms(function, repeat):
+    return 1e3 * timeit.timeit(function, number=repeat) / repeat
+
+
+def run(data_dir, repeat, neo4j):
+    started = time.perf_counter()
+    graph = InMemoryGraph.from_csv_dir(data_dir)
+    print(f"Built in-memory graph ({len(graph.visits):,} visits, {len(graph.reviews):,} reviews) "
+          f"in {time.perf_counter() - started:.2f}s")
+
+    results = {}
+    for kind, text in SEARCHES:
+        results[(kind, text)] = {
+            "scan": time_ms(lambda: scan_search(graph, kind, text), max(1, repeat // 10)),
+            "trigram": time_ms(lambda: index_search(graph, kind, text), repeat),
+        }
+
+    if neo4j:
+        backend = Neo4jBackend(
+            os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+            os.getenv("NEO4J_USERNAME", "neo4j"),
+            os.getenv("NEO4J_PASSWORD", "password"),
+        )
+        try:
+            for kind, text in SEARCHES:
+                query = lucene_query(text, field=FIELDS[kind])
+                results[(kind, text)]["neo4j contains"] = time_ms(
+                    lambda: backend.run(CONTAINS_QUERIES[kind], {"text": text}), max(1, repeat // 10))
+                results[(kind, text)]["neo4j fulltext"] = time_ms(
+                    lambda: backend.run(FULLTEXT_QUERIES[kind], {"query": query}), repeat)
+        finally:
+            backend.close()
+
+    columns = list(next(iter(results.values())))
+    print(f"\n{'search':<28}" + "".join(f"{name + ' (ms)':>20}" for name in columns))
+    for (kind, text), timings in results.items():
+        print(f"{kind + ': ' + text:<28}" + "".join(f"{timings[name]:>20,.2f}" for name in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--visits", type=int, default=1_000_000)
+    parser.add_argument("--data-dir", help="use these CSV files instead of a synthetic dataset")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--neo4j", action="store_true", help="also time CONTAINS vs full-text in Neo4j")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        run(args.data_dir, args.repeat, args.neo4j)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Writing synthetic dataset with {args.visits:,} visits to {directory}")
+        write_dataset(directory, args.visits)
+        run(directory, args.repeat, args.neo4j)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,243 +1,93 @@
 import streamlit as st
-from neo4j import GraphDatabase
 import os
 from dotenv import load_dotenv
 
+from graph_backend import CHATBOT_QUERY_HANDLERS, backend_from_env
+from intent_router import REVIEW_SEARCH_INTENT, build_hospital_router
+from name_index import NameIndex
+from query_cache import cache_from_env, stream_cached
+from response_format import ResponsePager, is_show_more, iter_response, page_params
+from review_search import index_from_env
+from tracing import TRACER
+from warmup import warmup_for
+
 # Load environment variables
 load_dotenv()
 
 # Neo4j Connection
 class HospitalChatbot:
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, backend):
+        # Neo4j or the in-process graph (GRAPH_BACKEND), see graph_backend.py
+        self.backend = backend
+        # Name index and intent table are built once per chatbot instance
+        self.names = NameIndex()
+        self.backend.load_names(self.names)
+        self.router = build_hospital_router(self.names)
+        self.cache = cache_from_env(self.backend.version_loader())
+        # Semantic review search, once `python review_search.py sync` has run
+        self.reviews = index_from_env()
+        # Hot intent results, preloaded and refreshed in the background
+        self.warm = warmup_for("chatbot", backend)
     
     def close(self):
-        self.driver.close()
+        self.backend.close()
+    
+    def _run_query(self, cypher_query, params):
+        return self.backend.run(cypher_query, params)
     
-    def query_database(self, cypher_query):
-        """Execute a Cypher query and return results"""
+    def query_database(self, cypher_query, params=None, intent=None):
+        """Execute a Cypher query (through the result cache) and return results"""
         try:
-            with self.driver.session() as session:
-                result = session.run(cypher_query)
-                return [dict(record) for record in result]
+            return self.cache.get_or_load(
+                cypher_query, params, lambda: self._run_query(cypher_query, params), intent=intent
+            )
         except Exception as e:
             return {"error": str(e)}
     
+    def route(self, question):
+        """Find the intent for a question and the query parameters it needs"""
+        self.backend.refresh_names(self.names)
+        intent, slots = self.router.route(question)
+        if intent.name == "reviews" and self.reviews is not None:
+            with TRACER.span("review_search"):
+                hits = self.reviews.search(question, hospital_ids=slots.get("hospital_ids"))
+            return REVIEW_SEARCH_INTENT, {"review_ids": [review_id for review_id, _ in hits]}
+        return intent, {slot: slots[slot] for slot in intent.slots}
+    
     def natural_language_to_cypher(self, question):
-        """Convert natural language question to Cypher query using pattern matching"""
-        question_lower = question.lower()
-        
-        # Pattern matching for common questions - ORDER MATTERS!
-        
-        # Statistics query - must come before generic hospital
-        if "statistics" in question_lower or "stats" in question_lower or "count" in question_lower:
-            return """
-                MATCH (h:Hospital)
-                OPTIONAL MATCH (v:Visit)-[:AT]->(h)
-                RETURN h.name AS Hospital,
-                       COUNT(DISTINCT v) AS Total_Visits
-                ORDER BY Total_Visits DESC
-            """
-        
-        # California/state-specific hospitals
-        elif "california" in question_lower or "ca" in question_lower:
-            return """
-                MATCH (h:Hospital)
-                WHERE h.state_name = 'CA'
-                RETURN h.name AS Hospital, h.state_name AS State
-            """
-        
-        # Patients treated by specific physician
-        elif ("patient" in question_lower or "treated" in question_lower) and ("sarah johnson" in question_lower):
-            return """
-                MATCH (patient:Patient)-[:HAS]->(visit:Visit)<-[:TREATS]-(physician:Physician)
-                WHERE physician.name CONTAINS 'Dr. Sarah Johnson'
-                RETURN DISTINCT patient.name AS Patient, 
-                       physician.name AS Physician,
-                       COUNT(visit) AS Visits
-                ORDER BY Visits DESC
-            """
-        
-        elif ("patient" in question_lower or "treated" in question_lower) and ("michael chen" in question_lower):
-            return """
-                MATCH (patient:Patient)-[:HAS]->(visit:Visit)<-[:TREATS]-(physician:Physician)
-                WHERE physician.name CONTAINS 'Dr. Michael Chen'
-                RETURN DISTINCT patient.name AS Patient, 
-                       physician.name AS Physician,
-                       COUNT(visit) AS Visits
-                ORDER BY Visits DESC
-            """
-        
-        # Patient medical history
-        elif "history" in question_lower and "john smith" in question_lower:
-            return """
-                MATCH (patient:Patient)-[:HAS]->(visit:Visit)
-                WHERE patient.name CONTAINS 'John Smith'
-                MATCH (visit)-[:AT]->(hospital:Hospital)
-                MATCH (visit)<-[:TREATS]-(physician:Physician)
-                RETURN patient.name AS Patient,
-                       visit.admission_date AS Date,
-                       hospital.name AS Hospital,
-                       physician.name AS Physician,
-                       visit.diagnosis AS Diagnosis
-                ORDER BY visit.admission_date DESC
-            """
-        
-        elif "history" in question_lower and "mary johnson" in question_lower:
-            return """
-                MATCH (patient:Patient)-[:HAS]->(visit:Visit)
-                WHERE patient.name CONTAINS 'Mary Johnson'
-                MATCH (visit)-[:AT]->(hospital:Hospital)
-                MATCH (visit)<-[:TREATS]-(physician:Physician)
-                RETURN patient.name AS Patient,
-                       visit.admission_date AS Date,
-                       hospital.name AS Hospital,
-                       physician.name AS Physician,
-                       visit.diagnosis AS Diagnosis
-                ORDER BY visit.admission_date DESC
-            """
-        
-        # Common diagnoses
-        # List physicians with salaries
-        elif ("physician" in question_lower or "doctor" in question_lower) and "salary" in question_lower:
-            return """
-                MATCH (p:Physician)
-                RETURN p.name AS Physician, p.school AS School, p.salary AS Salary
-                ORDER BY p.salary DESC
-            """
-        
-        # Highest paid physicians
-        elif "highest" in question_lower and ("paid" in question_lower or "salary" in question_lower):
-            return """
-                MATCH (p:Physician)
-                RETURN p.name AS Physician, p.salary AS Salary
-                ORDER BY p.salary DESC
-                LIMIT 5
-            """
-        
-        # Generic diagnosis query
-        elif "diagnosis" in question_lower or "disease" in question_lower or "condition" in question_lower:
-            return """
-                MATCH (visit:Visit)
-                RETURN visit.diagnosis AS Diagnosis, COUNT(*) AS Count
-                ORDER BY Count DESC
-                LIMIT 10
-            """
-        
-        # Patient reviews
-        elif "review" in question_lower:
-            return """
-                MATCH (visit:Visit)-[:WRITES]->(review:Review)
-                MATCH (visit)-[:AT]->(hospital:Hospital)
-                RETURN hospital.name AS Hospital,
-                       review.text AS Review,
-                       review.patient_name AS Patient
-                LIMIT 10
-            """
-        
-        # List all hospitals (default/generic)
-        elif "hospital" in question_lower and ("all" in question_lower or "show" in question_lower or "list" in question_lower):
-            return """
-                MATCH (h:Hospital)
-                RETURN h.name AS Hospital, h.state_name AS State
-                ORDER BY h.name
-            """
-        
-        # Default fallback
-        else:
-            # Default: show database summary
-            return """
-                MATCH (h:Hospital)
-                RETURN h.name AS Hospital, h.state_name AS State
-                LIMIT 5
-            """
+        """Convert natural language question to a Cypher query and its parameters"""
+        intent, params = self.route(question)
+        return intent.cypher, page_params(params) if intent.paged else params
+    
+    def stream_query(self, cypher_query, params=None, intent=None):
+        """Yield result rows as they arrive from the backend (or from the warm cache)"""
+        if self.warm.serves(intent, params):
+            return iter(self.warm.get(intent))
+        return stream_cached(self.cache, self.backend, cypher_query, params, intent=intent)
     
     def format_response(self, data, question):
         """Format the query results into a natural language response"""
-        if not data:
-            return "I couldn't find any information matching your query. Please try rephrasing your question."
-        
-        if isinstance(data, dict) and "error" in data:
-            return f"Sorry, I encountered an error: {data['error']}"
-        
-        # Format based on the type of data
-        if len(data) > 0:
-            keys = list(data[0].keys())
-            
-            if "Hospital" in keys and "State" in keys:
-                response = f"I found {len(data)} hospital(s):\n\n"
-                for item in data:
-                    response += f"• **{item['Hospital']}** - {item['State']}\n"
-                return response
-            
-            elif "Patient" in keys and "Physician" in keys:
-                response = f"Here are the patients:\n\n"
-                for item in data:
-                    response += f"• **{item['Patient']}** treated by {item['Physician']}"
-                    if 'Visits' in item:
-                        response += f" ({item['Visits']} visits)"
-                    response += "\n"
-                return response
-            
-            elif "Physician" in keys and "Salary" in keys:
-                response = f"Here are the physicians:\n\n"
-                for item in data:
-                    response += f"• **{item['Physician']}** - ${item['Salary']:,.0f}\n"
-                    if 'School' in item:
-                        response += f"   School: {item['School']}\n"
-                return response
-            
-            elif "Diagnosis" in keys:
-                if "Count" in keys:
-                    response = f"Most common diagnoses:\n\n"
-                    for item in data:
-                        response += f"• **{item['Diagnosis']}** - {item['Count']} cases\n"
-                else:
-                    response = f"Patient medical information:\n\n"
-                    for item in data:
-                        response += f"Date: {item.get('Date', 'N/A')}\n"
-                        response += f"  Diagnosis: {item['Diagnosis']}\n"
-                        response += f"  Hospital: {item.get('Hospital', 'N/A')}\n\n"
-                return response
-            
-            elif "Review" in keys:
-                response = f"Patient reviews:\n\n"
-                for item in data[:5]:
-                    response += f"• \"{item['Review']}\"\n"
-                    response += f"  - {item.get('Patient', 'Anonymous')}\n\n"
-                return response
-            
-            elif "Total_Visits" in keys:
-                response = f"Hospital statistics:\n\n"
-                for item in data:
-                    response += f"• **{item['Hospital']}** - {item['Total_Visits']} visits\n"
-                return response
-            
-            else:
-                # Generic formatting
-                response = f"Found {len(data)} result(s):\n\n"
-                for item in data:
-                    for key, value in item.items():
-                        response += f"**{key}:** {value}\n"
-                    response += "\n"
-                return response
-        
-        return "No results found."
+        return "".join(self.iter_response(data))
+    
+    def iter_response(self, data, offset=0):
+        """Yield the formatted response chunk by chunk so rows render as they arrive"""
+        return iter_response(data, offset)
 
 # Initialize chatbot
 @st.cache_resource
 def init_chatbot():
-    return HospitalChatbot(
+    return HospitalChatbot(backend_from_env(
         uri=os.getenv("NEO4J_URI", "bolt://localhost:7687"),
         user=os.getenv("NEO4J_USERNAME", "neo4j"),
-        password=os.getenv("NEO4J_PASSWORD", "password")
-    )
+        password=os.getenv("NEO4J_PASSWORD", "password"),
+        memory_handlers=CHATBOT_QUERY_HANDLERS,
+    ))
 
 try:
     bot = init_chatbot()
-    connection_status = "Connected to Neo4j"
+    connection_status = "Connected to Neo4j" if bot.backend.name == "neo4j" else "Using the in-process graph"
 except Exception as e:
-    st.error(f"Could not connect to Neo4j: {e}")
+    st.error(f"Could not connect to the graph backend: {e}")
     st.stop()
 
 # Initialize chat history
@@ -263,9 +113,48 @@ with st.sidebar:
     st.markdown("- Show me the most common diagnoses")
     st.markdown("- Which physicians have the highest salaries?")
     st.markdown("- What are the hospital statistics?")
+    st.markdown("- What is the total billing per insurance payer?")
+    st.markdown("- Who are the busiest physicians?")
     st.markdown("- Show me patient reviews")
+    st.markdown("- Any complaints about wait times at Wallace-Hamilton?")
     st.markdown("- List all available physicians")
 
+    st.header("Query Cache")
+    cache_stats = bot.cache.stats()
+    st.markdown(
+        f"- Hits: {cache_stats['hits']}\n"
+        f"- Misses: {cache_stats['misses']}\n"
+        f"- Evictions: {cache_stats['evictions']}"
+    )
+
+    st.header("Warm-Up")
+    warm_stats = bot.warm.status()
+    if warm_stats["ready"]:
+        st.markdown(
+            f"- Warm in {warm_stats['warm_seconds']:.2f} s\n"
+            f"- Refreshes: {max(warm_stats['generations'].values())}"
+        )
+    else:
+        st.markdown(f"- Warming up ({warm_stats['error'] or 'loading'})")
+
+    st.header("Connection Pool")
+    if bot.backend.gauges is None:
+        st.markdown("- In-process graph, no connections")
+    else:
+        pool_stats = bot.backend.gauges.snapshot()
+        st.markdown(
+            f"- In use: {pool_stats['in_use']} / {pool_stats['max_size']}\n"
+            f"- Idle (best-effort): {pool_stats['idle'] if pool_stats['idle'] is not None else 'unavailable'}\n"
+            f"- Avg wait: {pool_stats['avg_wait_ms']:.1f} ms"
+        )
+
+    st.header("Latency")
+    latency = TRACER.stats.summary()
+    if latency:
+        st.dataframe(latency, hide_index=True, use_container_width=True)
+    else:
+        st.markdown("- No questions answered yet")
+
 # Main UI - exactly like RealPython tutorial
 st.title("Hospital System Chatbot")
 st.info(
@@ -288,12 +177,24 @@ if prompt := st.chat_input("What do you want to know?"):
     st.chat_message("user").markdown(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
     
-    # Get bot response
-    cypher_query = bot.natural_language_to_cypher(prompt)
-    results = bot.query_database(cypher_query)
-    response = bot.format_response(results, prompt)
+    # Get bot response, rendering rows as they stream from the database
+    # ("show more" runs the previous query again for its next page)
+    pager = st.session_state.setdefault("pager", ResponsePager())
+    with TRACER.span("chat_turn") as turn:
+        with TRACER.span("route"):
+            if is_show_more(prompt) and pager.has_more:
+                intent, params, offset = pager.intent, pager.params, pager.next_offset
+            else:
+                (intent, params), offset = bot.route(prompt), 0
+        turn.set(intent=intent.name, offset=offset)
+        query_params = pager.query_params(intent, params, offset)
+        rows = TRACER.traced("query", bot.stream_query(intent.cypher, query_params, intent=intent.name))
+        with st.chat_message("assistant"):
+            with TRACER.span("render"):
+                response = st.write_stream(
+                    TRACER.traced("format", pager.iter_page(intent, params, rows, offset), counter="chunks")
+                )
     
-    # Display assistant message
-    st.chat_message("assistant").markdown(response)
+    # Remember assistant message
     st.session_state.messages.append({"role": "assistant", "content": response})
 
@@ -5,10 +5,27 @@ A conversational chatbot interface for querying hospital data from Neo4j.
 """
 
 import streamlit as st
-from neo4j import GraphDatabase
 import os
 from dotenv import load_dotenv
 
+from dashboard_queries import (
+    DASHBOARD_QUERY_HANDLERS,
+    HOSPITAL_QUERY,
+    PATIENT_HISTORY_QUERY,
+    PATIENTS_BY_PHYSICIAN_QUERY,
+    REVIEWS_BY_HOSPITAL_QUERY,
+    SEARCH_BY_DIAGNOSIS_QUERY,
+    SEARCH_REVIEWS_QUERY,
+)
+from graph_backend import backend_from_env
+from query_cache import cache_from_env, stream_cached
+from text_search import lucene_query
+from tracing import TRACER
+from warmup import warmup_for
+
+# Rows fetched per page for the long, paginated result lists
+PAGE_SIZE = 25
+
 # Load environment variables
 load_dotenv()
 
@@ -50,122 +67,126 @@ st.markdown("""
 
 # Neo4j Connection
 class HospitalChatbot:
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, backend):
+        # Neo4j (with concurrent sub-queries) or the in-process graph
+        self.backend = backend
+        self.cache = cache_from_env(self.backend.version_loader())
+        # Hospital and physician lists, preloaded and refreshed in the background
+        self.warm = warmup_for("dashboard", backend)
     
     def close(self):
-        self.driver.close()
+        self.backend.close()
+    
+    def _stream(self, intent, cypher, **params):
+        """Yield rows one at a time as they arrive (or from the result cache)"""
+        return TRACER.traced(
+            "query", stream_cached(self.cache, self.backend, cypher, params, intent=intent), intent=intent
+        )
+    
+    def _query(self, intent, cypher, **params):
+        """Run a small query through the result cache and return a list of dicts"""
+        return list(self._stream(intent, cypher, **params))
+    
+    def _query_many(self, queries):
+        """
+        Run independent queries concurrently.
+        
+        Args:
+            queries: Mapping of key -> (intent, cypher, params)
+        
+        Cached results are reused; only the misses go to the database.
+        """
+        results = {}
+        pending = {}
+        for key, (intent, cypher, params) in queries.items():
+            found, rows = self.cache.get(cypher, params)
+            if found:
+                results[key] = rows
+            else:
+                pending[key] = (intent, cypher, params)
+        
+        with TRACER.span("query", queries=len(queries), cache_hits=len(results)):
+            fetched = self.backend.run_many(
+                {key: (cypher, params) for key, (_, cypher, params) in pending.items()}
+            )
+        for key, rows in fetched.items():
+            intent, cypher, params = pending[key]
+            self.cache.put(cypher, params, rows, intent=intent)
+            results[key] = rows
+        return results
     
     def find_hospitals(self):
-        """Get all hospitals"""
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (h:Hospital)
-                RETURN h.name AS name, h.state_name AS state
-                ORDER BY h.name
-            """)
-            return [dict(record) for record in result]
+        """Get all hospitals (from the warm cache)"""
+        return self.warm.get("hospitals")
     
     def find_patients_by_physician(self, physician_name):
         """Find all patients treated by a specific physician"""
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (patient:Patient)-[:HAS]->(visit:Visit)<-[:TREATS]-(physician:Physician)
-                WHERE physician.name CONTAINS $name
-                RETURN DISTINCT patient.name AS patient, 
-                       physician.name AS physician,
-                       COUNT(visit) AS visit_count
-                ORDER BY visit_count DESC
-            """, name=physician_name)
-            return [dict(record) for record in result]
+        return self._query("patients_by_physician", PATIENTS_BY_PHYSICIAN_QUERY, name=physician_name)
     
     def get_hospital_stats(self, hospital_name):
-        """Get statistics for a specific hospital"""
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (h:Hospital {name: $name})
-                OPTIONAL MATCH (v:Visit)-[:AT]->(h)
-                OPTIONAL MATCH (h)-[:EMPLOYS]->(p:Physician)
-                RETURN h.name AS hospital,
-                       h.state_name AS state,
-                       COUNT(DISTINCT v) AS total_visits,
-                       COUNT(DISTINCT p) AS total_physicians
-            """, name=hospital_name)
-            return result.single()
-    
-    def get_patient_history(self, patient_name):
-        """Get full medical history for a patient"""
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (patient:Patient)-[:HAS]->(visit:Visit)
-                WHERE patient.name CONTAINS $name
-                MATCH (visit)-[:AT]->(hospital:Hospital)
-                MATCH (visit)<-[:TREATS]-(physician:Physician)
-                OPTIONAL MATCH (visit)-[:COVERED_BY]->(payer:Payer)
-                RETURN patient.name AS patient,
-                       visit.admission_date AS date,
-                       hospital.name AS hospital,
-                       physician.name AS physician,
-                       visit.diagnosis AS diagnosis,
-                       visit.chief_complaint AS complaint,
-                       payer.name AS insurance
-                ORDER BY visit.admission_date DESC
-            """, name=patient_name)
-            return [dict(record) for record in result]
-    
-    def search_by_diagnosis(self, diagnosis):
-        """Search visits by diagnosis"""
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (visit:Visit)-[:AT]->(hospital:Hospital)
-                MATCH (patient:Patient)-[:HAS]->(visit)
-                WHERE visit.diagnosis CONTAINS $diagnosis
-                RETURN patient.name AS patient,
-                       hospital.name AS hospital,
-                       visit.diagnosis AS diagnosis,
-                       visit.admission_date AS date
-                ORDER BY visit.admission_date DESC
-                LIMIT 10
-            """, diagnosis=diagnosis)
-            return [dict(record) for record in result]
+        """Get statistics for a specific hospital (one row of materialized counts)"""
+        rows = self._query("hospital_stats", HOSPITAL_QUERY, name=hospital_name)
+        return rows[0] if rows else None
+    
+    def get_hospital_overview(self, hospital_name):
+        """Get statistics and reviews for a hospital in one concurrent round trip"""
+        params = {"name": hospital_name}
+        results = self._query_many({
+            "hospital": ("hospital_stats", HOSPITAL_QUERY, params),
+            "reviews": ("reviews", REVIEWS_BY_HOSPITAL_QUERY, params),
+        })
+        return (results["hospital"][0] if results["hospital"] else None), results["reviews"]
+    
+    def get_patient_history(self, patient_name, skip=0, limit=PAGE_SIZE):
+        """Stream one page of the medical history for a patient"""
+        return self._stream(
+            "patient_history", PATIENT_HISTORY_QUERY, name=patient_name, skip=skip, limit=limit
+        )
+    
+    def search_by_diagnosis(self, diagnosis, skip=0, limit=10):
+        """Stream one page of visits whose diagnosis matches, best match first"""
+        query = lucene_query(diagnosis, field="diagnosis")
+        if not query:
+            return iter(())
+        return self._stream(
+            "search_by_diagnosis", SEARCH_BY_DIAGNOSIS_QUERY,
+            query=query, text=diagnosis, skip=skip, limit=limit,
+        )
+    
+    def search_reviews(self, text, skip=0, limit=10):
+        """Stream one page of reviews matching the words in text, best match first"""
+        query = lucene_query(text, field="text")
+        if not query:
+            return iter(())
+        return self._stream(
+            "search_reviews", SEARCH_REVIEWS_QUERY, query=query, text=text, skip=skip, limit=limit
+        )
     
     def get_all_physicians(self):
-        """Get all physicians"""
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (p:Physician)
-                RETURN p.name AS name, p.school AS school, p.salary AS salary
-                ORDER BY p.name
-            """)
-            return [dict(record) for record in result]
+        """Get all physicians (from the warm cache)"""
+        return self.warm.get("physicians")
     
     def get_reviews_by_hospital(self, hospital_name):
         """Get patient reviews for a hospital"""
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (visit:Visit)-[:AT]->(hospital:Hospital {name: $name})
-                MATCH (visit)-[:WRITES]->(review:Review)
-                RETURN review.text AS review,
-                       review.patient_name AS patient,
-                       review.physician_name AS physician
-                LIMIT 10
-            """, name=hospital_name)
-            return [dict(record) for record in result]
+        return self._query("reviews", REVIEWS_BY_HOSPITAL_QUERY, name=hospital_name)
 
 # Initialize chatbot
 @st.cache_resource
 def init_chatbot():
-    return HospitalChatbot(
+    return HospitalChatbot(backend_from_env(
         uri=os.getenv("NEO4J_URI", "bolt://localhost:7687"),
         user=os.getenv("NEO4J_USERNAME", "neo4j"),
-        password=os.getenv("NEO4J_PASSWORD", "password")
-    )
+        password=os.getenv("NEO4J_PASSWORD", "password"),
+        memory_handlers=DASHBOARD_QUERY_HANDLERS,
+        # One event loop for concurrent sub-queries, shared by all sessions
+        concurrent=True,
+    ))
 
 try:
     bot = init_chatbot()
-    connection_status = "✅ Connected"
+    connection_status = "✅ Connected" if bot.backend.name == "neo4j" else "✅ In-process graph"
 except Exception as e:
-    st.error(f"❌ Could not connect to Neo4j: {e}")
+    st.error(f"❌ Could not connect to the graph backend: {e}")
     st.stop()
 
 # Header
@@ -191,8 +212,46 @@ with st.sidebar:
     - Find visits for diagnosis containing pneumonia
     - List all physicians
     - Show reviews for Memorial Healthcare
+    - Search reviews mentioning waiting time
+    """)
+    
+    st.markdown("---")
+    st.subheader("⚡ Query Cache")
+    cache_stats = bot.cache.stats()
+    st.markdown(f"""
+    - Hits: {cache_stats['hits']}
+    - Misses: {cache_stats['misses']}
+    - Evictions: {cache_stats['evictions']}
     """)
     
+    st.subheader("🔥 Warm-Up")
+    warm_stats = bot.warm.status()
+    if warm_stats["ready"]:
+        st.markdown(f"""
+        - Warm in {warm_stats['warm_seconds']:.2f} s
+        - Refreshes: {max(warm_stats['generations'].values())}
+        """)
+    else:
+        st.markdown(f"- Warming up ({warm_stats['error'] or 'loading'})")
+    
+    st.subheader("🔌 Connection Pool")
+    if bot.backend.gauges is None:
+        st.markdown("- In-process graph, no connections")
+    else:
+        pool_stats = bot.backend.gauges.snapshot()
+        st.markdown(f"""
+        - In use: {pool_stats['in_use']} / {pool_stats['max_size']}
+        - Idle (best-effort): {pool_stats['idle'] if pool_stats['idle'] is not None else 'unavailable'}
+        - Avg wait: {pool_stats['avg_wait_ms']:.1f} ms
+        """)
+    
+    st.subheader("⏱️ Latency")
+    latency = TRACER.stats.summary()
+    if latency:
+        st.dataframe(latency, hide_index=True, use_container_width=True)
+    else:
+        st.markdown("- No requests yet")
+    
     st.markdown("---")
     st.subheader("📊 Database Info")
     st.info("""
@@ -204,6 +263,28 @@ with st.sidebar:
     - 10 Reviews
     """)
 
+# Patient history, shared by the chat and patients tabs
+def render_history_pages(patient_name, pages_key, render_visit):
+    """
+    Render the pages of a patient's history loaded so far (the count is kept
+    in st.session_state[pages_key]; earlier pages come from the cache).
+
+    Returns:
+        (visits shown, whether another page may follow)
+    """
+    shown = 0
+    has_more = False
+    for page in range(st.session_state[pages_key]):
+        page_rows = 0
+        for visit in bot.get_patient_history(patient_name, skip=page * PAGE_SIZE):
+            page_rows += 1
+            render_visit(visit)
+        shown += page_rows
+        has_more = page_rows == PAGE_SIZE
+        if not has_more:
+            break
+    return shown, has_more
+
 # Main Content Area
 tab1, tab2, tab3 = st.tabs(["💬 Chat", "🏥 Hospitals", "👥 Patients"])
 
@@ -215,57 +296,69 @@ with tab1:
         "What would you like to know?",
         ["Custom Query", "List Hospitals", "Find Patients by Physician", 
          "Patient History", "Hospital Statistics", "Search by Diagnosis",
-         "List Physicians", "Hospital Reviews"]
+         "List Physicians", "Hospital Reviews", "Search Reviews"]
     )
     
     result = None
     
     if query_type == "List Hospitals":
         if st.button("🏥 Show All Hospitals"):
-            result = bot.find_hospitals()
-            if result:
-                st.success(f"Found {len(result)} hospitals:")
-                for hospital in result:
-                    st.markdown(f"""
-                    <div class="query-result">
-                        <strong>{hospital['name']}</strong><br>
-                        📍 State: {hospital['state']}
-                    </div>
-                    """, unsafe_allow_html=True)
+            with TRACER.span("request", intent="all_hospitals"):
+                result = bot.find_hospitals()
+                if result:
+                    st.success(f"Found {len(result)} hospitals:")
+                    for hospital in result:
+                        st.markdown(f"""
+                        <div class="query-result">
+                            <strong>{hospital['name']}</strong><br>
+                            📍 State: {hospital['state']}
+                        </div>
+                        """, unsafe_allow_html=True)
     
     elif query_type == "Find Patients by Physician":
         physician_name = st.text_input("Enter physician name:", "Dr. Sarah Johnson")
         if st.button("🔍 Search"):
-            result = bot.find_patients_by_physician(physician_name)
-            if result:
-                st.success(f"Found {len(result)} patients:")
-                for record in result:
-                    st.markdown(f"""
-                    <div class="query-result">
-                        👤 <strong>{record['patient']}</strong><br>
-                        👨‍⚕️ Physician: {record['physician']}<br>
-                        📊 Visits: {record['visit_count']}
-                    </div>
-                    """, unsafe_allow_html=True)
-            else:
-                st.warning(f"No patients found for {physician_name}")
+            with TRACER.span("request", intent="patients_by_physician"):
+                result = bot.find_patients_by_physician(physician_name)
+                if result:
+                    st.success(f"Found {len(result)} patients:")
+                    for record in result:
+                        st.markdown(f"""
+                        <div class="query-result">
+                            👤 <strong>{record['patient']}</strong><br>
+                            👨‍⚕️ Physician: {record['physician']}<br>
+                            📊 Visits: {record['visit_count']}
+                        </div>
+                        """, unsafe_allow_html=True)
+                else:
+                    st.warning(f"No patients found for {physician_name}")
     
     elif query_type == "Patient History":
         patient_name = st.text_input("Enter patient name:", "John Smith")
+        # The button starts a search; "Load more" adds pages to it
+        pages_key = f"chat_history_pages::{patient_name}"
         if st.button("📋 Get History"):
-            result = bot.get_patient_history(patient_name)
-            if result:
-                st.success(f"Found {len(result)} visits for {patient_name}:")
-                for visit in result:
-                    st.markdown(f"""
-                    <div class="query-result">
-                        📅 <strong>{visit['date']}</strong><br>
-                        🏥 Hospital: {visit['hospital']}<br>
-                        👨‍⚕️ Physician: {visit['physician']}<br>
-                        🩺 Diagnosis: {visit['diagnosis']}<br>
-                        💼 Insurance: {visit.get('insurance', 'N/A')}
-                    </div>
-                    """, unsafe_allow_html=True)
+            st.session_state[pages_key] = 1
+        
+        def show_visit(visit):
+            st.markdown(f"""
+            <div class="query-result">
+                📅 <strong>{visit['date']}</strong><br>
+                🏥 Hospital: {visit['hospital']}<br>
+                👨‍⚕️ Physician: {visit['physician']}<br>
+                🩺 Diagnosis: {visit['diagnosis']}<br>
+                💼 Insurance: {visit.get('insurance', 'N/A')}
+            </div>
+            """, unsafe_allow_html=True)
+        
+        if pages_key in st.session_state:
+            with TRACER.span("request", intent="patient_history"):
+                shown, has_more = render_history_pages(patient_name, pages_key, show_visit)
+            if shown:
+                st.success(f"Showing {shown} visits for {patient_name}")
+                if has_more and st.button("⬇️ Load more", key="chat_history_more"):
+                    st.session_state[pages_key] += 1
+                    st.rerun()
             else:
                 st.warning(f"No history found for {patient_name}")
     
@@ -274,24 +367,25 @@ with tab1:
         hospital_names = [h['name'] for h in hospitals]
         hospital_name = st.selectbox("Select hospital:", hospital_names)
         if st.button("📊 Get Stats"):
-            result = bot.get_hospital_stats(hospital_name)
-            if result:
-                st.markdown(f"""
-                <div class="query-result">
-                    <h3>{result['hospital']}</h3>
-                    📍 State: {result['state']}<br>
-                    👥 Total Visits: {result['total_visits']}<br>
-                    👨‍⚕️ Total Physicians: {result['total_physicians']}
-                </div>
-                """, unsafe_allow_html=True)
+            with TRACER.span("request", intent="hospital_stats"):
+                result = bot.get_hospital_stats(hospital_name)
+                if result:
+                    st.markdown(f"""
+                    <div class="query-result">
+                        <h3>{result['hospital']}</h3>
+                        📍 State: {result['state']}<br>
+                        👥 Total Visits: {result['total_visits']}<br>
+                        👨‍⚕️ Total Physicians: {result['total_physicians']}
+                    </div>
+                    """, unsafe_allow_html=True)
     
     elif query_type == "Search by Diagnosis":
         diagnosis = st.text_input("Enter diagnosis keyword:", "pneumonia")
         if st.button("🔍 Search"):
-            result = bot.search_by_diagnosis(diagnosis)
-            if result:
-                st.success(f"Found {len(result)} visits:")
-                for visit in result:
+            with TRACER.span("request", intent="search_by_diagnosis"):
+                shown = 0
+                for visit in bot.search_by_diagnosis(diagnosis):
+                    shown += 1
                     st.markdown(f"""
                     <div class="query-result">
                         👤 Patient: {visit['patient']}<br>
@@ -300,41 +394,64 @@ with tab1:
                         📅 Date: {visit['date']}
                     </div>
                     """, unsafe_allow_html=True)
-            else:
-                st.warning(f"No visits found for diagnosis: {diagnosis}")
+                if shown:
+                    st.success(f"Showing {shown} visits")
+                else:
+                    st.warning(f"No visits found for diagnosis: {diagnosis}")
     
     elif query_type == "List Physicians":
         if st.button("👨‍⚕️ Show All Physicians"):
-            result = bot.get_all_physicians()
-            if result:
-                st.success(f"Found {len(result)} physicians:")
-                for physician in result:
-                    st.markdown(f"""
-                    <div class="query-result">
-                        👨‍⚕️ <strong>{physician['name']}</strong><br>
-                        🎓 School: {physician['school']}<br>
-                        💰 Salary: ${physician['salary']:,.2f}
-                    </div>
-                    """, unsafe_allow_html=True)
+            with TRACER.span("request", intent="all_physicians"):
+                result = bot.get_all_physicians()
+                if result:
+                    st.success(f"Found {len(result)} physicians:")
+                    for physician in result:
+                        st.markdown(f"""
+                        <div class="query-result">
+                            👨‍⚕️ <strong>{physician['name']}</strong><br>
+                            🎓 School: {physician['school']}<br>
+                            💰 Salary: ${physician['salary']:,.2f}
+                        </div>
+                        """, unsafe_allow_html=True)
     
     elif query_type == "Hospital Reviews":
         hospitals = bot.find_hospitals()
         hospital_names = [h['name'] for h in hospitals]
         hospital_name = st.selectbox("Select hospital:", hospital_names)
         if st.button("⭐ Show Reviews"):
-            result = bot.get_reviews_by_hospital(hospital_name)
-            if result:
-                st.success(f"Found {len(result)} reviews:")
-                for review in result:
+            with TRACER.span("request", intent="reviews"):
+                result = bot.get_reviews_by_hospital(hospital_name)
+                if result:
+                    st.success(f"Found {len(result)} reviews:")
+                    for review in result:
+                        st.markdown(f"""
+                        <div class="query-result">
+                            ⭐ <em>"{review['review']}"</em><br>
+                            👤 Patient: {review['patient']}<br>
+                            👨‍⚕️ Physician: {review['physician']}
+                        </div>
+                        """, unsafe_allow_html=True)
+                else:
+                    st.info(f"No reviews found for {hospital_name}")
+    
+    elif query_type == "Search Reviews":
+        text = st.text_input("Enter words to look for in reviews:", "waiting time")
+        if st.button("🔍 Search"):
+            with TRACER.span("request", intent="search_reviews"):
+                shown = 0
+                for review in bot.search_reviews(text):
+                    shown += 1
                     st.markdown(f"""
                     <div class="query-result">
                         ⭐ <em>"{review['review']}"</em><br>
                         👤 Patient: {review['patient']}<br>
-                        👨‍⚕️ Physician: {review['physician']}
+                        🏥 Hospital: {review['hospital']}
                     </div>
                     """, unsafe_allow_html=True)
-            else:
-                st.info(f"No reviews found for {hospital_name}")
+                if shown:
+                    st.success(f"Showing {shown} reviews")
+                else:
+                    st.warning(f"No reviews found for: {text}")
 
 with tab2:
     st.header("🏥 Hospital Directory")
@@ -346,13 +463,12 @@ with tab2:
     
     for hospital in hospitals:
         with st.expander(f"🏥 {hospital['name']} - {hospital['state']}"):
-            stats = bot.get_hospital_stats(hospital['name'])
+            with TRACER.span("request", intent="hospital_overview"):
+                stats, reviews = bot.get_hospital_overview(hospital['name'])
             if stats:
                 st.write(f"**Total Visits:** {stats['total_visits']}")
                 st.write(f"**Total Physicians:** {stats['total_physicians']}")
             
-            # Get reviews
-            reviews = bot.get_reviews_by_hospital(hospital['name'])
             if reviews:
                 st.write(f"**Patient Reviews:** {len(reviews)}")
                 for review in reviews[:3]:  # Show first 3
@@ -363,17 +479,23 @@ with tab3:
     patient_name = st.text_input("Search patient by name:", key="patient_search")
     
     if patient_name:
-        history = bot.get_patient_history(patient_name)
-        if history:
-            st.success(f"Found {len(history)} visits for patients matching '{patient_name}'")
-            
-            for visit in history:
-                with st.expander(f"📅 {visit['date']} - {visit['hospital']}"):
-                    st.write(f"**Patient:** {visit['patient']}")
-                    st.write(f"**Physician:** {visit['physician']}")
-                    st.write(f"**Diagnosis:** {visit['diagnosis']}")
-                    st.write(f"**Chief Complaint:** {visit.get('complaint', 'N/A')}")
-                    st.write(f"**Insurance:** {visit.get('insurance', 'N/A')}")
+        def show_visit(visit):
+            with st.expander(f"📅 {visit['date']} - {visit['hospital']}"):
+                st.write(f"**Patient:** {visit['patient']}")
+                st.write(f"**Physician:** {visit['physician']}")
+                st.write(f"**Diagnosis:** {visit['diagnosis']}")
+                st.write(f"**Chief Complaint:** {visit.get('complaint', 'N/A')}")
+                st.write(f"**Insurance:** {visit.get('insurance', 'N/A')}")
+        
+        pages_key = f"history_pages::{patient_name}"
+        st.session_state.setdefault(pages_key, 1)
+        shown, has_more = render_history_pages(patient_name, pages_key, show_visit)
+        
+        if shown:
+            st.success(f"Showing {shown} visits for patients matching '{patient_name}'")
+            if has_more and st.button("⬇️ Load more", key="history_more"):
+                st.session_state[pages_key] += 1
+                st.rerun()
         else:
             st.warning(f"No records found for '{patient_name}'")
     else:
@@ -0,0 +1,114 @@
+"""
+Dashboard Queries
+-----------------
+The Cypher behind the dashboard's (chatbot_app.py) buttons and tabs, and
+the in-process graph handler that answers each one when GRAPH_BACKEND=memory.
+
+Kept out of the Streamlit script so that tools such as query_plans.py can
+import them without starting the app. Incremental loads tombstone deleted
+rows (`deleted` set, label kept), so every query skips those nodes.
+"""
+
+import graph_backend
+from text_search import REVIEW_TEXT_INDEX, VISIT_TEXT_INDEX
+
+HOSPITALS_QUERY = """
+    MATCH (h:Hospital)
+    WHERE h.deleted IS NULL
+    RETURN h.name AS name, h.state_name AS state
+    ORDER BY h.name
+"""
+
+PATIENTS_BY_PHYSICIAN_QUERY = """
+    MATCH (patient:Patient)-[:HAS]->(visit:Visit)<-[:TREATS]-(physician:Physician)
+    WHERE physician.name CONTAINS $name
+      AND physician.deleted IS NULL AND patient.deleted IS NULL
+    RETURN DISTINCT patient.name AS patient, 
+           physician.name AS physician,
+           COUNT(visit) AS visit_count
+    ORDER BY visit_count DESC
+"""
+
+# Counts are materialized on the Hospital node by the loaders (aggregates.py)
+HOSPITAL_QUERY = """
+    MATCH (h:Hospital {name: $name})
+    WHERE h.deleted IS NULL
+    RETURN h.name AS hospital, h.state_name AS state,
+           coalesce(h.visit_count, 0) AS total_visits,
+           coalesce(h.physician_count, 0) AS total_physicians
+"""
+
+REVIEWS_BY_HOSPITAL_QUERY = """
+    MATCH (visit:Visit)-[:AT]->(hospital:Hospital {name: $name})
+    WHERE hospital.deleted IS NULL
+    MATCH (visit)-[:WRITES]->(review:Review)
+    WHERE review.deleted IS NULL
+    RETURN review.text AS review,
+           review.patient_name AS patient,
+           review.physician_name AS physician
+    LIMIT 10
+"""
+
+PATIENT_HISTORY_QUERY = """
+    MATCH (patient:Patient)-[:HAS]->(visit:Visit)
+    WHERE patient.name CONTAINS $name AND patient.deleted IS NULL
+    MATCH (visit)-[:AT]->(hospital:Hospital)
+    MATCH (visit)<-[:TREATS]-(physician:Physician)
+    OPTIONAL MATCH (visit)-[:COVERED_BY]->(payer:Payer)
+    RETURN patient.name AS patient,
+           toString(visit.admission_date) AS date,
+           hospital.name AS hospital,
+           physician.name AS physician,
+           visit.diagnosis AS diagnosis,
+           visit.chief_complaint AS complaint,
+           payer.name AS insurance
+    ORDER BY visit.admission_date DESC, visit.id
+    SKIP $skip LIMIT $limit
+"""
+
+# Searches go through the full-text indexes (text_search.lucene_query builds
+# $query); best matches first, then newest
+SEARCH_BY_DIAGNOSIS_QUERY = f"""
+    CALL db.index.fulltext.queryNodes('{VISIT_TEXT_INDEX}', $query) YIELD node AS visit, score
+    MATCH (visit)-[:AT]->(hospital:Hospital)
+    MATCH (patient:Patient)-[:HAS]->(visit)
+    RETURN patient.name AS patient,
+           hospital.name AS hospital,
+           visit.diagnosis AS diagnosis,
+           toString(visit.admission_date) AS date,
+           score
+    ORDER BY score DESC, visit.admission_date DESC, visit.id
+    SKIP $skip LIMIT $limit
+"""
+
+SEARCH_REVIEWS_QUERY = f"""
+    CALL db.index.fulltext.queryNodes('{REVIEW_TEXT_INDEX}', $query) YIELD node AS review, score
+    WHERE review.deleted IS NULL
+    OPTIONAL MATCH (visit:Visit)-[:WRITES]->(review)
+    OPTIONAL MATCH (visit)-[:AT]->(hospital:Hospital)
+    RETURN review.text AS review,
+           review.patient_name AS patient,
+           hospital.name AS hospital,
+           score
+    ORDER BY score DESC, review.id
+    SKIP $skip LIMIT $limit
+"""
+
+PHYSICIANS_QUERY = """
+    MATCH (p:Physician)
+    WHERE p.deleted IS NULL
+    RETURN p.name AS name, p.school AS school, p.salary AS salary
+    ORDER BY p.name
+"""
+
+# How the in-process graph backend answers each query (GRAPH_BACKEND=memory)
+DASHBOARD_QUERY_HANDLERS = {
+    HOSPITALS_QUERY: graph_backend.dashboard_hospitals,
+    PATIENTS_BY_PHYSICIAN_QUERY: graph_backend.dashboard_patients_by_physician,
+    HOSPITAL_QUERY: graph_backend.dashboard_hospital,
+    REVIEWS_BY_HOSPITAL_QUERY: graph_backend.dashboard_hospital_reviews,
+    PATIENT_HISTORY_QUERY: graph_backend.dashboard_patient_history,
+    SEARCH_BY_DIAGNOSIS_QUERY: graph_backend.dashboard_search_by_diagnosis,
+    SEARCH_REVIEWS_QUERY: graph_backend.dashboard_search_reviews,
+    PHYSICIANS_QUERY: graph_backend.dashboard_physicians,
+}
@@ -0,0 +1,662 @@
+"""
+Graph Backends
+--------------
+Query backends for the chatbot apps, selected with GRAPH_BACKEND:
+
+- "neo4j" (default): Cypher over Bolt through the pooled driver
+- "memory": an in-process graph built from the same CSV files as the ETL,
+  for small read-mostly deployments, tests and benchmarks
+
+Both expose the same interface: `run(cypher, params)`, `stream(cypher, params)`
+and `run_many({key: (cypher, params)})`. The memory backend does not parse
+Cypher; it is given a handler per known query text (the intent table's
+Cypher, the dashboard's query constants) and answers each one with NumPy
+operations on the in-memory graph. Unknown queries raise UnsupportedQuery.
+
+The in-memory graph keeps, per label, an id array, an id -> row dict
+and NumPy property columns. Visit foreign keys are stored as row-index
+columns, and the reverse edges (patient/physician/hospital -> visits) as
+CSR adjacency arrays, so a traversal is an array slice. Aggregates that only
+change with the data (visits per hospital/payer/physician, billing totals,
+diagnosis counts, salary order) are computed once at load time, mirroring
+the aggregates the loaders materialize in Neo4j.
+"""
+
+import csv
+import os
+from collections import Counter
+
+import numpy as np
+
+from async_backend import AsyncQueryRunner
+from intent_router import DEFAULT_INTENT, HOSPITAL_INTENTS, REVIEW_SEARCH_INTENT
+from neo4j_pool import (
+    PoolGauges, create_driver, pool_config_from_env, read_session, record_summary, run_read, traced_cypher,
+)
+from query_cache import STREAM_FETCH_SIZE, graph_version_loader
+from text_search import TrigramIndex
+
+# Sorts below every real admission date
+MISSING_DAY = np.iinfo(np.int64).min // 2
+
+
+class UnsupportedQuery(Exception):
+    """Raised by the memory backend for a query it has no handler for"""
+
+
+class Neo4jBackend:
+    """
+    Cypher over Bolt with a pooled driver.
+
+    Args:
+        uri: Neo4j Bolt URI
+        user: Neo4j username
+        password: Neo4j password
+        concurrent: Also start an AsyncQueryRunner so run_many() runs its
+            queries concurrently
+    """
+
+    name = "neo4j"
+
+    def __init__(self, uri, user, password, concurrent=False):
+        self.driver = create_driver(uri, user, password)
+        self.gauges = PoolGauges(self.driver)
+        self.async_runner = (
+            AsyncQueryRunner(uri, user, password, **pool_config_from_env()) if concurrent else None
+        )
+
+    def run(self, cypher, params=None):
+        return run_read(self.driver, cypher, params, self.gauges)
+
+    def stream(self, cypher, params=None, fetch_size=STREAM_FETCH_SIZE):
+        """Yield rows as the cursor pulls them, `fetch_size` records at a time"""
+        with read_session(self.driver, self.gauges, fetch_size=fetch_size) as session:
+            result = session.run(traced_cypher(cypher), params or {})
+            rows = 0
+            for record in result:
+                rows += 1
+                yield dict(record)
+            record_summary(result.consume(), rows)
+
+    def run_many(self, queries):
+        """Run {key: (cypher, params)}; concurrently when an async runner exists"""
+        if self.async_runner is not None:
+            return self.async_runner.run_many(queries)
+        return {key: self.run(cypher, params) for key, (cypher, params) in queries.items()}
+
+    def version_loader(self):
+        return graph_version_loader(self.driver)
+
+    def load_names(self, index):
+        index.load(self.driver)
+
+    def refresh_names(self, index):
+        index.refresh_if_stale(self.driver)
+
+    def close(self):
+        if self.async_runner is not None:
+            self.async_runner.close()
+        self.driver.close()
+
+
+class InMemoryBackend:
+    """
+    Answers known queries from an InMemoryGraph.
+
+    Args:
+        graph: InMemoryGraph
+        handlers: Mapping of Cypher text -> handler(graph, params) returning
+            a list of row dicts shaped like the Cypher result
+    """
+
+    name = "memory"
+    gauges = None
+
+    def __init__(self, graph, handlers):
+        self.graph = graph
+        self.handlers = handlers
+
+    def run(self, cypher, params=None):
+        handler = self.handlers.get(cypher)
+        if handler is None:
+            raise UnsupportedQuery("The in-memory graph backend has no handler for this query")
+        return handler(self.graph, params or {})
+
+    def stream(self, cypher, params=None, fetch_size=STREAM_FETCH_SIZE):
+        return iter(self.run(cypher, params))
+
+    def run_many(self, queries):
+        return {key: self.run(cypher, params) for key, (cypher, params) in queries.items()}
+
+    def version_loader(self):
+        # The graph never changes after loading, so there is nothing to check
+        return None
+
+    def load_names(self, index):
+        index.add_many(self.graph.name_entries())
+
+    def refresh_names(self, index):
+        pass
+
+    def close(self):
+        pass
+
+
+# ============================================================================
+# In-memory graph
+# ============================================================================
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_id(value):
+    """Integer id, or -1 for a missing or unparsable one"""
+    node_id = _to_int(value)
+    return -1 if node_id is None else node_id
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _values(array, rows):
+    """Python values of array[rows] (rows < 0 and missing cells become None)"""
+    rows = np.asarray(rows, dtype=np.int64)
+    values = array[rows]
+    kind = values.dtype.kind
+    if kind == "f":
+        values = [None if value != value else value for value in values.tolist()]
+    elif kind == "M":
+        values = [None if value is None else value.isoformat() for value in values.tolist()]
+    elif kind == "U":
+        values = [value or None for value in values.tolist()]
+    else:
+        values = values.tolist()
+    if len(rows) and rows.min() < 0:
+        values = [None if row < 0 else value for row, value in zip(rows.tolist(), values)]
+    return values
+
+
+def _records(**columns):
+    """Zip equally long column lists into row dicts"""
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+class NodeTable:
+    """
+    Node ids plus NumPy property columns for one label.
+
+    Args:
+        ids: Node ids in file order (rows with an unparsable id are dropped
+            by the caller)
+        columns: Mapping of property name -> ndarray aligned with ids
+    """
+
+    def __init__(self, ids, columns):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.columns = columns
+        self.row_of = {int(node_id): row for row, node_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def rows_for(self, node_ids):
+        """Row indexes of the given ids (unknown ids are skipped)"""
+        rows = (self.row_of.get(_to_int(node_id)) for node_id in node_ids or ())
+        return np.array([row for row in rows if row is not None], dtype=np.int64)
+
+    def rows_containing(self, column, text):
+        """Rows whose string column contains text (Cypher CONTAINS)"""
+        return np.flatnonzero(np.char.find(self.columns[column], text) >= 0)
+
+
+class Adjacency:
+    """CSR adjacency: for each source row, the edge rows pointing at it"""
+
+    def __init__(self, sources, size):
+        valid = np.flatnonzero(sources >= 0)
+        self.order = valid[np.argsort(sources[valid], kind="stable")]
+        counts = np.bincount(sources[valid], minlength=size)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def neighbors(self, row):
+        return self.order[self.offsets[row]:self.offsets[row + 1]]
+
+
+def _read_csv(path, spec):
+    """
+    Read a CSV into columns.
+
+    Args:
+        path: CSV file
+        spec: Mapping of output column -> (CSV column, kind) with kind one of
+            "id", "float", "str", "date"
+    """
+    values = {name: [] for name in spec}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            for name, (column, _) in spec.items():
+                values[name].append((row.get(column) or "").strip())
+    columns = {}
+    for name, (_, kind) in spec.items():
+        raw = values[name]
+        if kind == "id":
+            columns[name] = np.array([_to_id(v) for v in raw], dtype=np.int64)
+        elif kind == "float":
+            columns[name] = np.array([_to_float(v) for v in raw], dtype=np.float64)
+        elif kind == "date":
+            columns[name] = np.array([v or "NaT" for v in raw], dtype="datetime64[D]")
+        else:
+            columns[name] = np.array(raw, dtype=str)
+    return columns
+
+
+class InMemoryGraph:
+    """
+    Read-only hospital graph held in NumPy arrays.
+
+    Build with InMemoryGraph.from_csv_dir(path) (the CSV files the ETL loads).
+    """
+
+    def __init__(self, hospitals, payers, physicians, patients, visits, reviews,
+                 visit_keys, review_visit_ids):
+        self.hospitals = hospitals
+        self.payers = payers
+        self.physicians = physicians
+        self.patients = patients
+        self.visits = visits
+        self.reviews = reviews
+
+        # Visit foreign keys as row indexes (-1 when the target is missing)
+        self.visit_hospital = self._link(visit_keys["hospital_id"], hospitals)
+        self.visit_physician = self._link(visit_keys["physician_id"], physicians)
+        self.visit_patient = self._link(visit_keys["patient_id"], patients)
+        self.visit_payer = self._link(visit_keys["payer_id"], payers)
+        self.review_visit = self._link(review_visit_ids, visits)
+        self.review_hospital = np.where(
+            self.review_visit >= 0, self.visit_hospital[self.review_visit], -1
+        )
+
+        # Reverse edges as CSR arrays
+        self.visits_by_patient = Adjacency(self.visit_patient, len(patients))
+        self.visits_by_physician = Adjacency(self.visit_physician, len(physicians))
+        self.visits_by_hospital = Adjacency(self.visit_hospital, len(hospitals))
+
+        # EMPLOYS: distinct (hospital, physician) pairs seen on visits
+        both = (self.visit_hospital >= 0) & (self.visit_physician >= 0)
+        pairs = np.unique(
+            self.visit_hospital[both] * max(len(physicians), 1) + self.visit_physician[both]
+        )
+        self.physicians_per_hospital = np.bincount(
+            pairs // max(len(physicians), 1), minlength=len(hospitals)
+        )
+
+        # Aggregates that only change when the data is reloaded
+        self.visits_per_hospital = np.bincount(
+            self.visit_hospital[self.visit_hospital >= 0], minlength=len(hospitals)
+        )
+        self.diagnosis_counts = Counter(d for d in visits["diagnosis"].tolist() if d)
+        paid = self.visit_payer >= 0
+        self.visits_per_payer = np.bincount(self.visit_payer[paid], minlength=len(payers))
+        self.billing_per_payer = np.bincount(
+            self.visit_payer[paid], weights=np.nan_to_num(visits["billing_amount"][paid]),
+            minlength=len(payers),
+        )
+        treated = self.visit_physician >= 0
+        self.visits_per_physician = np.bincount(self.visit_physician[treated], minlength=len(physicians))
+        treated &= self.visit_patient >= 0
+        pairs = np.unique(
+            self.visit_physician[treated] * max(len(patients), 1) + self.visit_patient[treated]
+        )
+        self.patients_per_physician = np.bincount(
+            pairs // max(len(patients), 1), minlength=len(physicians)
+        )
+        self.hospitals_by_name = np.argsort(hospitals["name"], kind="stable")
+        self.physicians_by_name = np.argsort(physicians["name"], kind="stable")
+        salaries = physicians["salary"]
+        self.physicians_by_salary = np.argsort(-np.nan_to_num(salaries, nan=-np.inf), kind="stable")
+        self.hospital_rows_by_name = {}
+        for row, name in enumerate(hospitals["name"].tolist()):
+            self.hospital_rows_by_name.setdefault(name, row)
+
+        # Trigram indexes standing in for the Neo4j full-text indexes
+        self.diagnosis_index = TrigramIndex(visits["diagnosis"])
+        self.review_index = TrigramIndex(reviews["text"])
+
+        # Sort keys for "ORDER BY admission_date DESC, id"
+        days = visits["admission_date"].astype(np.int64)
+        days[np.isnat(visits["admission_date"])] = MISSING_DAY
+        self.visit_days = days
+
+    @staticmethod
+    def _link(ids, table):
+        return np.fromiter(
+            (table.row_of.get(int(node_id), -1) for node_id in ids), dtype=np.int64, count=len(ids)
+        )
+
+    @classmethod
+    def from_csv_dir(cls, data_dir):
+        """Load hospitals/payers/physicians/patients/visits/reviews CSV files"""
+
+        def table(filename, id_column, spec):
+            columns = _read_csv(os.path.join(data_dir, filename), {"id": (id_column, "id"), **spec})
+            keep = columns["id"] >= 0
+            ids = columns.pop("id")[keep]
+            return NodeTable(ids, {name: column[keep] for name, column in columns.items()})
+
+        hospitals = table("hospitals.csv", "hospital_id", {
+            "name": ("hospital_name", "str"),
+            "state_name": ("hospital_state", "str"),
+        })
+        payers = table("payers.csv", "payer_id", {"name": ("payer_name", "str")})
+        physicians = table("physicians.csv", "physician_id", {
+            "name": ("physician_name", "str"),
+            "school": ("medical_school", "str"),
+            "salary": ("salary", "float"),
+        })
+        patients = table("patients.csv", "patient_id", {"name": ("patient_name", "str")})
+        visit_key_spec = {
+            key: (key, "id") for key in ("hospital_id", "physician_id", "patient_id", "payer_id")
+        }
+        visits = table("visits.csv", "visit_id", {
+            "admission_date": ("date_of_admission", "date"),
+            "diagnosis": ("primary_diagnosis", "str"),
+            "chief_complaint": ("chief_complaint", "str"),
+            "billing_amount": ("billing_amount", "float"),
+            **visit_key_spec,
+        })
+        visit_keys = {key: visits.columns.pop(key) for key in visit_key_spec}
+        reviews = table("reviews.csv", "review_id", {
+            "text": ("review", "str"),
+            "patient_name": ("patient_name", "str"),
+            "physician_name": ("physician_name", "str"),
+            "visit_id": ("visit_id", "id"),
+        })
+        review_visit_ids = reviews.columns.pop("visit_id")
+        return cls(hospitals, payers, physicians, patients, visits, reviews, visit_keys, review_visit_ids)
+
+    def name_entries(self):
+        """(label, id, name) rows for the NameIndex"""
+        for label, table in (("Patient", self.patients), ("Physician", self.physicians),
+                             ("Hospital", self.hospitals), ("Payer", self.payers)):
+            for node_id, name in zip(table.ids.tolist(), table["name"].tolist()):
+                if name:
+                    yield label, node_id, name
+
+    def order_visits(self, visit_rows):
+        """Sort visit rows by admission date (newest first), then visit id"""
+        visit_rows = np.asarray(visit_rows, dtype=np.int64)
+        order = np.lexsort((self.visits.ids[visit_rows], -self.visit_days[visit_rows]))
+        return visit_rows[order]
+
+    def linked_visits(self, visit_rows, *links):
+        """Keep visits whose given link columns all point at a node"""
+        mask = np.ones(len(visit_rows), dtype=bool)
+        for link in links:
+            mask &= link[visit_rows] >= 0
+        return visit_rows[mask]
+
+
+# ============================================================================
+# Handlers for the chatbot intent table (intent_router.HOSPITAL_INTENTS)
+# ============================================================================
+
+def _page(rows, params):
+    """The rows a query ending in SKIP $skip LIMIT $limit returns"""
+    skip = int(params.get("skip", 0))
+    return rows[skip:skip + int(params.get("limit", len(rows)))]
+
+
+def hospital_visit_counts(graph, params):
+    rows = _page(np.argsort(-graph.visits_per_hospital, kind="stable"), params)
+    return _records(Hospital=_values(graph.hospitals["name"], rows),
+                    Total_Visits=graph.visits_per_hospital[rows].tolist())
+
+
+def _hospital_rows(graph, rows):
+    return _records(Hospital=_values(graph.hospitals["name"], rows),
+                    State=_values(graph.hospitals["state_name"], rows))
+
+
+def hospitals_in_state(graph, params):
+    rows = graph.hospitals_by_name
+    rows = rows[graph.hospitals["state_name"][rows] == params.get("state")]
+    return _hospital_rows(graph, _page(rows, params))
+
+
+def _patients_per_physician(graph, physician_rows):
+    """(patient rows, physician rows, visit counts), most visits first"""
+    patients, physicians, counts = [], [], []
+    for physician in physician_rows:
+        treated = graph.visit_patient[graph.visits_by_physician.neighbors(physician)]
+        treated, visits = np.unique(treated[treated >= 0], return_counts=True)
+        patients.append(treated)
+        physicians.append(np.full(len(treated), physician, dtype=np.int64))
+        counts.append(visits)
+    if not patients:
+        return [], [], []
+    patients, physicians, counts = (np.concatenate(parts) for parts in (patients, physicians, counts))
+    order = np.argsort(-counts, kind="stable")
+    return patients[order], physicians[order], counts[order]
+
+
+def patients_of_physicians(graph, params):
+    patients, physicians, counts = (_page(rows, params) for rows in _patients_per_physician(
+        graph, graph.physicians.rows_for(params.get("physician_ids"))
+    ))
+    return _records(Patient=_values(graph.patients["name"], patients),
+                    Physician=_values(graph.physicians["name"], physicians),
+                    Visits=list(map(int, counts)))
+
+
+def _patient_visits(graph, patient_rows):
+    """Visits of the given patients that have a hospital and a physician"""
+    visits = [graph.visits_by_patient.neighbors(patient) for patient in patient_rows]
+    visits = np.concatenate(visits) if visits else np.empty(0, dtype=np.int64)
+    return graph.linked_visits(visits, graph.visit_hospital, graph.visit_physician)
+
+
+def patient_visit_history(graph, params):
+    visits = graph.order_visits(_patient_visits(graph, graph.patients.rows_for(params.get("patient_ids"))))
+    visits = _page(visits, params)
+    return _records(Patient=_values(graph.patients["name"], graph.visit_patient[visits]),
+                    Date=_values(graph.visits["admission_date"], visits),
+                    Hospital=_values(graph.hospitals["name"], graph.visit_hospital[visits]),
+                    Physician=_values(graph.physicians["name"], graph.visit_physician[visits]),
+                    Diagnosis=_values(graph.visits["diagnosis"], visits))
+
+
+def physicians_by_salary(graph, params):
+    rows = _page(graph.physicians_by_salary, params)
+    return _records(Physician=_values(graph.physicians["name"], rows),
+                    School=_values(graph.physicians["school"], rows),
+                    Salary=_values(graph.physicians["salary"], rows))
+
+
+def top_paid_physicians(graph, params):
+    rows = graph.physicians_by_salary[:5]
+    return _records(Physician=_values(graph.physicians["name"], rows),
+                    Salary=_values(graph.physicians["salary"], rows))
+
+
+def payer_billing_totals(graph, params):
+    rows = _page(np.argsort(-graph.billing_per_payer, kind="stable"), params)
+    return _records(Payer=_values(graph.payers["name"], rows),
+                    Visits=graph.visits_per_payer[rows].tolist(),
+                    Total_Billing=graph.billing_per_payer[rows].tolist())
+
+
+def busiest_physicians(graph, params):
+    rows = np.lexsort((-graph.visits_per_physician, -graph.patients_per_physician))[:10]
+    return _records(Physician=_values(graph.physicians["name"], rows),
+                    Patients=graph.patients_per_physician[rows].tolist(),
+                    Visits=graph.visits_per_physician[rows].tolist())
+
+
+def diagnosis_counts(graph, params):
+    return [{"Diagnosis": diagnosis, "Count": count}
+            for diagnosis, count in graph.diagnosis_counts.most_common(10)]
+
+
+def visit_reviews(graph, params):
+    reviews = _page(np.flatnonzero(graph.review_hospital >= 0), params)
+    return _records(Hospital=_values(graph.hospitals["name"], graph.review_hospital[reviews]),
+                    Review=_values(graph.reviews["text"], reviews),
+                    Patient=_values(graph.reviews["patient_name"], reviews))
+
+
+def ranked_reviews(graph, params):
+    reviews = _page(graph.reviews.rows_for(params.get("review_ids")), params)
+    return _records(Hospital=_values(graph.hospitals["name"], graph.review_hospital[reviews]),
+                    Review=_values(graph.reviews["text"], reviews),
+                    Patient=_values(graph.reviews["patient_name"], reviews))
+
+
+def hospital_directory(graph, params):
+    return _hospital_rows(graph, _page(graph.hospitals_by_name, params))
+
+
+def hospital_sample(graph, params):
+    return _hospital_rows(graph, np.arange(min(5, len(graph.hospitals))))
+
+
+INTENT_HANDLERS = {
+    "hospital_stats": hospital_visit_counts,
+    "payer_billing": payer_billing_totals,
+    "busiest_physicians": busiest_physicians,
+    "hospitals_by_state": hospitals_in_state,
+    "patients_by_physician": patients_of_physicians,
+    "patient_history": patient_visit_history,
+    "physician_salaries": physicians_by_salary,
+    "highest_paid_physicians": top_paid_physicians,
+    "common_diagnoses": diagnosis_counts,
+    "reviews": visit_reviews,
+    "review_search": ranked_reviews,
+    "all_hospitals": hospital_directory,
+    "summary": hospital_sample,
+}
+
+# Cypher text -> handler, as InMemoryBackend expects
+CHATBOT_QUERY_HANDLERS = {
+    intent.cypher: INTENT_HANDLERS[intent.name]
+    for intent in [*HOSPITAL_INTENTS, DEFAULT_INTENT, REVIEW_SEARCH_INTENT]
+}
+
+
+# ============================================================================
+# Handlers for the dashboard queries (chatbot_app.py)
+# ============================================================================
+
+def dashboard_hospitals(graph, params):
+    rows = graph.hospitals_by_name
+    return _records(name=_values(graph.hospitals["name"], rows),
+                    state=_values(graph.hospitals["state_name"], rows))
+
+
+def dashboard_patients_by_physician(graph, params):
+    patients, physicians, counts = _patients_per_physician(
+        graph, graph.physicians.rows_containing("name", params["name"])
+    )
+    return _records(patient=_values(graph.patients["name"], patients),
+                    physician=_values(graph.physicians["name"], physicians),
+                    visit_count=list(map(int, counts)))
+
+
+def _hospital_row(graph, params):
+    return graph.hospital_rows_by_name.get(params["name"])
+
+
+def dashboard_hospital(graph, params):
+    row = _hospital_row(graph, params)
+    if row is None:
+        return []
+    return [{
+        **_records(hospital=_values(graph.hospitals["name"], [row]),
+                   state=_values(graph.hospitals["state_name"], [row]))[0],
+        "total_visits": int(graph.visits_per_hospital[row]),
+        "total_physicians": int(graph.physicians_per_hospital[row]),
+    }]
+
+
+def dashboard_hospital_reviews(graph, params):
+    row = _hospital_row(graph, params)
+    if row is None:
+        return []
+    reviews = np.flatnonzero(graph.review_hospital == row)[:10]
+    return _records(review=_values(graph.reviews["text"], reviews),
+                    patient=_values(graph.reviews["patient_name"], reviews),
+                    physician=_values(graph.reviews["physician_name"], reviews))
+
+
+def dashboard_patient_history(graph, params):
+    visits = _patient_visits(graph, graph.patients.rows_containing("name", params["name"]))
+    visits = _page(graph.order_visits(visits), params)
+    return _records(patient=_values(graph.patients["name"], graph.visit_patient[visits]),
+                    date=_values(graph.visits["admission_date"], visits),
+                    hospital=_values(graph.hospitals["name"], graph.visit_hospital[visits]),
+                    physician=_values(graph.physicians["name"], graph.visit_physician[visits]),
+                    diagnosis=_values(graph.visits["diagnosis"], visits),
+                    complaint=_values(graph.visits["chief_complaint"], visits),
+                    insurance=_values(graph.payers["name"], graph.visit_payer[visits]))
+
+
+def dashboard_search_by_diagnosis(graph, params):
+    visits, scores = graph.diagnosis_index.search(params["text"])
+    linked = (graph.visit_hospital[visits] >= 0) & (graph.visit_patient[visits] >= 0)
+    visits, scores = visits[linked], scores[linked]
+    # ORDER BY score DESC, admission_date DESC, id
+    order = np.lexsort((graph.visits.ids[visits], -graph.visit_days[visits], -scores))
+    visits, scores = _page(visits[order], params), _page(scores[order], params)
+    return _records(patient=_values(graph.patients["name"], graph.visit_patient[visits]),
+                    hospital=_values(graph.hospitals["name"], graph.visit_hospital[visits]),
+                    diagnosis=_values(graph.visits["diagnosis"], visits),
+                    date=_values(graph.visits["admission_date"], visits),
+                    score=scores.tolist())
+
+
+def dashboard_search_reviews(graph, params):
+    reviews, scores = graph.review_index.search(params["text"])
+    order = np.lexsort((graph.reviews.ids[reviews], -scores))
+    reviews, scores = _page(reviews[order], params), _page(scores[order], params)
+    return _records(review=_values(graph.reviews["text"], reviews),
+                    patient=_values(graph.reviews["patient_name"], reviews),
+                    hospital=_values(graph.hospitals["name"], graph.review_hospital[reviews]),
+                    score=scores.tolist())
+
+
+def dashboard_physicians(graph, params):
+    rows = graph.physicians_by_name
+    return _records(name=_values(graph.physicians["name"], rows),
+                    school=_values(graph.physicians["school"], rows),
+                    salary=_values(graph.physicians["salary"], rows))
+
+
+# ============================================================================
+# Backend selection
+# ============================================================================
+
+def backend_from_env(uri, user, password, memory_handlers, concurrent=False):
+    """
+    Create the backend named by GRAPH_BACKEND ("neo4j" or "memory").
+
+    The memory backend loads the CSV files from GRAPH_DATA_DIR (default
+    "data") and answers the queries in `memory_handlers`.
+    """
+    kind = os.getenv("GRAPH_BACKEND", "neo4j")
+    if kind == "neo4j":
+        return Neo4jBackend(uri, user, password, concurrent=concurrent)
+    if kind == "memory":
+        graph = InMemoryGraph.from_csv_dir(os.getenv("GRAPH_DATA_DIR", "data"))
+        return InMemoryBackend(graph, memory_handlers)
+    raise ValueError(f"Unknown GRAPH_BACKEND '{kind}' (use 'neo4j' or 'memory')")
@@ -0,0 +1,294 @@
+"""
+Offline Bulk Import Exporter
+----------------------------
+Turns the hospital CSV files into `neo4j-admin database import full` input
+files for first-time or disaster-recovery loads.
+
+Every source CSV is streamed once and fanned out into node and relationship
+files with typed headers (`id:ID(Visit)`, `:START_ID(Visit)`, `:END_ID(Payer)`,
+`billing_amount:float`, ...). Rows are written as they are read, so memory
+use does not grow with the file size (only the distinct EMPLOYS pairs are
+kept). Output can be gzip-compressed; neo4j-admin reads .csv.gz directly.
+
+An `import.sh` next to the files holds the matching neo4j-admin command.
+neo4j-admin writes the store files directly, so it must run inside the
+Neo4j container while the database is stopped:
+
+    docker compose stop neo4j
+    docker compose run --rm neo4j sh /import/data/admin_import/import.sh
+    docker compose up -d neo4j
+
+Usage (or ETL_MODE=admin-import in the ETL container):
+    python admin_import.py
+"""
+
+import csv
+import gzip
+import logging
+import os
+import shlex
+import time
+
+from neo4j import GraphDatabase
+
+from hospital_bulk_csv_write import (
+    HOSPITALS_CSV_PATH,
+    NEO4J_PASSWORD,
+    NEO4J_URI,
+    NEO4J_USERNAME,
+    PATIENTS_CSV_PATH,
+    PAYERS_CSV_PATH,
+    PHYSICIANS_CSV_PATH,
+    REVIEWS_CSV_PATH,
+    VISITS_CSV_PATH,
+)
+from column_types import import_header
+from incremental import local_csv_path
+
+LOGGER = logging.getLogger(__name__)
+
+# Where the import files are written (as seen from the ETL container)
+ETL_IMPORT_DIR = os.getenv("ETL_IMPORT_DIR", "/data/admin_import")
+
+# Write .csv.gz instead of .csv
+ETL_IMPORT_GZIP = os.getenv("ETL_IMPORT_GZIP", "true").lower() in ("1", "true", "yes")
+
+# Database that import.sh (re)creates
+ETL_IMPORT_DATABASE = os.getenv("ETL_IMPORT_DATABASE", "neo4j")
+
+
+class ImportFile:
+    """
+    One neo4j-admin input file fed from a source CSV.
+
+    Args:
+        kind: "nodes" or "relationships"
+        name: Node label or relationship type
+        columns: List of (typed header, source CSV column)
+        distinct: Drop repeated rows (for relationships implied many times)
+    """
+
+    def __init__(self, kind, name, columns, distinct=False):
+        self.kind = kind
+        self.name = name
+        self.columns = columns
+        self.distinct = distinct
+
+    @property
+    def filename(self):
+        suffix = ".csv.gz" if ETL_IMPORT_GZIP else ".csv"
+        return f"{self.kind}_{self.name.lower()}{suffix}"
+
+
+def _typed(entity, columns):
+    """Add the neo4j-admin type from column_types.py to plain property headers"""
+    return [
+        (header if ":" in header else import_header(entity, column, header), column)
+        for header, column in columns
+    ]
+
+
+# Source CSV -> the import files it feeds. Ids are written as-is and imported
+# with --id-type=integer, so `id` ends up an integer like in the Cypher ETL.
+EXPORTS = [
+    (HOSPITALS_CSV_PATH, [
+        ImportFile("nodes", "Hospital", _typed("hospitals", [
+            ("id:ID(Hospital)", "hospital_id"),
+            ("name", "hospital_name"),
+            ("state_name", "hospital_state"),
+        ])),
+    ]),
+    (PAYERS_CSV_PATH, [
+        ImportFile("nodes", "Payer", _typed("payers", [
+            ("id:ID(Payer)", "payer_id"),
+            ("name", "payer_name"),
+        ])),
+    ]),
+    (PHYSICIANS_CSV_PATH, [
+        ImportFile("nodes", "Physician", _typed("physicians", [
+            ("id:ID(Physician)", "physician_id"),
+            ("name", "physician_name"),
+            ("dob", "physician_dob"),
+            ("grad_year", "physician_grad_year"),
+            ("school", "medical_school"),
+            ("salary", "salary"),
+        ])),
+    ]),
+    (PATIENTS_CSV_PATH, [
+        ImportFile("nodes", "Patient", _typed("patients", [
+            ("id:ID(Patient)", "patient_id"),
+            ("name", "patient_name"),
+            ("sex", "patient_sex"),
+            ("dob", "patient_dob"),
+            ("blood_type", "patient_blood_type"),
+        ])),
+    ]),
+    (VISITS_CSV_PATH, [
+        ImportFile("nodes", "Visit", _typed("visits", [
+            ("id:ID(Visit)", "visit_id"),
+            ("room_number", "room_number"),
+            ("admission_type", "admission_type"),
+            ("admission_date", "date_of_admission"),
+            ("test_results", "test_results"),
+            ("status", "visit_status"),
+            ("chief_complaint", "chief_complaint"),
+            ("treatment_description", "treatment_description"),
+            ("diagnosis", "primary_diagnosis"),
+            ("discharge_date", "discharge_date"),
+        ])),
+        ImportFile("relationships", "AT", [
+            (":START_ID(Visit)", "visit_id"),
+            (":END_ID(Hospital)", "hospital_id"),
+        ]),
+        ImportFile("relationships", "TREATS", [
+            (":START_ID(Physician)", "physician_id"),
+            (":END_ID(Visit)", "visit_id"),
+        ]),
+        ImportFile("relationships", "COVERED_BY", _typed("visits", [
+            (":START_ID(Visit)", "visit_id"),
+            (":END_ID(Payer)", "payer_id"),
+            ("service_date", "discharge_date"),
+            ("billing_amount", "billing_amount"),
+        ])),
+        ImportFile("relationships", "HAS", [
+            (":START_ID(Patient)", "patient_id"),
+            (":END_ID(Visit)", "visit_id"),
+        ]),
+        ImportFile("relationships", "EMPLOYS", [
+            (":START_ID(Hospital)", "hospital_id"),
+            (":END_ID(Physician)", "physician_id"),
+        ], distinct=True),
+    ]),
+    (REVIEWS_CSV_PATH, [
+        ImportFile("nodes", "Review", _typed("reviews", [
+            ("id:ID(Review)", "review_id"),
+            ("text", "review"),
+            ("patient_name", "patient_name"),
+            ("physician_name", "physician_name"),
+            ("hospital_name", "hospital_name"),
+        ])),
+        ImportFile("relationships", "WRITES", [
+            (":START_ID(Visit)", "visit_id"),
+            (":END_ID(Review)", "review_id"),
+        ]),
+    ]),
+]
+
+
+def _open_output(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", newline="", compresslevel=5)
+    return open(path, "w", newline="")
+
+
+def export_source(source_path, outputs, output_dir):
+    """
+    Stream one source CSV into its import files.
+
+    Returns:
+        Dict of import file name -> rows written
+    """
+    handles, writers, seen = [], [], []
+    try:
+        for output in outputs:
+            handle = _open_output(os.path.join(output_dir, output.filename))
+            handles.append(handle)
+            writer = csv.writer(handle)
+            writer.writerow([header for header, _ in output.columns])
+            writers.append(writer)
+            seen.append(set() if output.distinct else None)
+        counts = [0] * len(outputs)
+        with open(source_path, newline="") as f:
+            for row in csv.DictReader(f):
+                for index, output in enumerate(outputs):
+                    values = tuple((row.get(column) or "").strip() for _, column in output.columns)
+                    if seen[index] is not None:
+                        if values in seen[index]:
+                            continue
+                        seen[index].add(values)
+                    writers[index].writerow(values)
+                    counts[index] += 1
+    finally:
+        for handle in handles:
+            handle.close()
+    return {output.filename: count for output, count in zip(outputs, counts)}
+
+
+def import_command(database=ETL_IMPORT_DATABASE):
+    """neo4j-admin arguments for the files written by export_all"""
+    args = [
+        "neo4j-admin", "database", "import", "full", database,
+        "--overwrite-destination=true",
+        "--id-type=integer",
+        "--skip-duplicate-nodes=true",
+        "--skip-bad-relationships=true",
+    ]
+    for _, outputs in EXPORTS:
+        for output in outputs:
+            args.append(f"--{output.kind}={output.name}={output.filename}")
+    return args
+
+
+def _write_import_script(output_dir):
+    path = os.path.join(output_dir, "import.sh")
+    with open(path, "w") as f:
+        f.write("#!/bin/sh\n")
+        f.write("# Run inside the Neo4j container with the database stopped\n")
+        f.write("set -e\n")
+        f.write('cd "$(dirname "$0")"\n')
+        args = [shlex.quote(arg) for arg in import_command()]
+        f.write(" ".join(args[:5]) + " \\\n    " + " \\\n    ".join(args[5:]) + "\n")
+    return path
+
+
+def export_all(output_dir=ETL_IMPORT_DIR):
+    """Write every import file plus import.sh; returns {file: rows}"""
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {}
+    for source_uri, outputs in EXPORTS:
+        started = time.perf_counter()
+        source_path = local_csv_path(source_uri)
+        written = export_source(source_path, outputs, output_dir)
+        counts.update(written)
+        LOGGER.info(
+            "%s -> %s in %.2fs", os.path.basename(source_path),
+            ", ".join(f"{name} ({rows})" for name, rows in written.items()),
+            time.perf_counter() - started,
+        )
+    script = _write_import_script(output_dir)
+    LOGGER.info("Wrote %s", script)
+    return counts
+
+
+def _database_is_empty():
+    """True when the running database has no nodes (or cannot be reached)"""
+    if not NEO4J_URI:
+        return True
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+    try:
+        with driver.session(database=ETL_IMPORT_DATABASE) as session:
+            return session.run("MATCH (n) RETURN count(n) = 0 AS empty").single()["empty"]
+    except Exception as error:
+        LOGGER.warning("Could not check whether the database is empty: %s", error)
+        return True
+    finally:
+        driver.close()
+
+
+def main():
+    if not _database_is_empty():
+        LOGGER.error(
+            "Database '%s' already has data; neo4j-admin import is for empty "
+            "databases. Use ETL_MODE=full or ETL_MODE=incremental instead.",
+            ETL_IMPORT_DATABASE,
+        )
+        raise SystemExit(1)
+    export_all()
+    LOGGER.info(
+        "Import files ready. Stop Neo4j and run import.sh from %s inside the Neo4j container",
+        ETL_IMPORT_DIR,
+    )
+
+
+if __name__ == "__main__":
+    main()
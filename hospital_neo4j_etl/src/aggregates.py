@@ -0,0 +1,187 @@
+"""
+Materialized Aggregates
+-----------------------
+Counts the chatbots ask for on every request, stored on the graph so that
+reading them is a property lookup instead of a scan over every Visit:
+
+- (:Hospital)   visit_count, physician_count
+- (:Payer)      visit_count, total_billing
+- (:Physician)  visit_count, patient_count
+- (:DiagnosisStat {name})  visit_count, one node per distinct diagnosis
+
+A full load recomputes everything once at the end. Incremental loads mark
+the nodes a changed or deleted visit touched (before and after the change)
+with `stats_dirty`, in the same transaction as the write, and only those
+are recomputed afterwards. Used by both the bulk ETL and load_data.py.
+"""
+
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+# Nodes recomputed per transaction
+AGGREGATE_BATCH_SIZE = 1000
+
+SCHEMA_QUERIES = [
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (d:DiagnosisStat) REQUIRE d.name IS UNIQUE",
+    # Lets a dirty diagnosis be recounted from its own visits only
+    "CREATE INDEX visit_diagnosis IF NOT EXISTS FOR (v:Visit) ON (v.diagnosis)",
+]
+
+# ============================================================================
+# DIRTY MARKING: Run in the same transaction as the visit writes
+# ============================================================================
+# Neighbours a visit points at *before* it is re-pointed or tombstoned
+MARK_CURRENT_NEIGHBOURS_QUERY = """
+    UNWIND $ids AS id
+    MATCH (v:Visit {id: toInteger(id)})
+    OPTIONAL MATCH (v)-[:AT|COVERED_BY|TREATS]-(n)
+    SET n.stats_dirty = true
+    WITH DISTINCT v
+    WHERE v.diagnosis IS NOT NULL
+    MERGE (d:DiagnosisStat {name: v.diagnosis})
+    SET d.stats_dirty = true
+"""
+
+# Neighbours a changed visit row is about to point at
+MARK_ROW_NEIGHBOURS_QUERY = """
+    UNWIND $rows AS row
+    OPTIONAL MATCH (h:Hospital {id: toInteger(row.hospital_id)})
+    OPTIONAL MATCH (py:Payer {id: toInteger(row.payer_id)})
+    OPTIONAL MATCH (ph:Physician {id: toInteger(row.physician_id)})
+    SET h.stats_dirty = true, py.stats_dirty = true, ph.stats_dirty = true
+    WITH row
+    WHERE row.primary_diagnosis IS NOT NULL AND row.primary_diagnosis <> ''
+    MERGE (d:DiagnosisStat {name: row.primary_diagnosis})
+    SET d.stats_dirty = true
+"""
+
+
+def mark_visit_rows(tx, rows):
+    """Mark what the given visit rows touch now and will touch once written"""
+    tx.run(MARK_CURRENT_NEIGHBOURS_QUERY, ids=[row["visit_id"] for row in rows]).consume()
+    tx.run(MARK_ROW_NEIGHBOURS_QUERY, rows=rows).consume()
+
+
+def mark_visit_ids(tx, ids):
+    """Mark what the given visits touch before they are tombstoned"""
+    tx.run(MARK_CURRENT_NEIGHBOURS_QUERY, ids=ids).consume()
+
+
+# ============================================================================
+# RECOMPUTE: Per-node counts ({where} selects all nodes or the dirty ones)
+# ============================================================================
+# COUNT { (n)-[:TYPE]->() } without a label on the far end is answered from
+# the node's stored relationship degree, without expanding the edges
+HOSPITAL_AGGREGATES_QUERY = """
+    MATCH (h:Hospital) {where}
+    CALL {{
+        WITH h
+        SET h.visit_count = COUNT {{ (h)<-[:AT]-() }},
+            h.physician_count = COUNT {{ (h)-[:EMPLOYS]->() }}
+        REMOVE h.stats_dirty
+    }} IN TRANSACTIONS OF {batch_size} ROWS
+"""
+
+PAYER_AGGREGATES_QUERY = """
+    MATCH (p:Payer) {where}
+    CALL {{
+        WITH p
+        OPTIONAL MATCH (p)<-[covered:COVERED_BY]-()
+        WITH p, count(covered) AS visits, sum(coalesce(covered.billing_amount, 0.0)) AS billing
+        SET p.visit_count = visits, p.total_billing = billing
+        REMOVE p.stats_dirty
+    }} IN TRANSACTIONS OF {batch_size} ROWS
+"""
+
+PHYSICIAN_AGGREGATES_QUERY = """
+    MATCH (p:Physician) {where}
+    CALL {{
+        WITH p
+        OPTIONAL MATCH (p)-[:TREATS]->()<-[:HAS]-(patient:Patient)
+        WITH p, count(DISTINCT patient) AS patients
+        SET p.visit_count = COUNT {{ (p)-[:TREATS]->() }},
+            p.patient_count = patients
+        REMOVE p.stats_dirty
+    }} IN TRANSACTIONS OF {batch_size} ROWS
+"""
+
+# Nodes never counted (new rows, or a graph loaded before aggregates existed)
+# are picked up by the dirty refresh as well
+DIRTY_FILTER = "WHERE {var}.stats_dirty OR {var}.visit_count IS NULL"
+
+NODE_AGGREGATE_QUERIES = [
+    ("Hospital", "h", HOSPITAL_AGGREGATES_QUERY),
+    ("Payer", "p", PAYER_AGGREGATES_QUERY),
+    ("Physician", "p", PHYSICIAN_AGGREGATES_QUERY),
+]
+
+# A full refresh rebuilds the DiagnosisStat nodes in one transaction
+DELETE_DIAGNOSIS_STATS_QUERY = "MATCH (d:DiagnosisStat) DELETE d"
+
+CREATE_DIAGNOSIS_STATS_QUERY = """
+    MATCH (v:Visit)
+    WHERE v.deleted IS NULL AND v.diagnosis IS NOT NULL
+    WITH v.diagnosis AS name, count(*) AS visits
+    CREATE (:DiagnosisStat {name: name, visit_count: visits})
+"""
+
+# A dirty diagnosis is recounted through the Visit.diagnosis index and
+# dropped once no live visit has it
+DIRTY_DIAGNOSIS_STATS_QUERY = """
+    MATCH (d:DiagnosisStat)
+    WHERE d.stats_dirty
+    CALL {
+        WITH d
+        MATCH (v:Visit {diagnosis: d.name})
+        WHERE v.deleted IS NULL
+        RETURN count(v) AS visits
+    }
+    SET d.visit_count = visits
+    REMOVE d.stats_dirty
+    WITH d
+    WHERE d.visit_count = 0
+    DELETE d
+"""
+
+RECORD_REFRESH_QUERY = """
+    MERGE (m:GraphMeta {key: 'graph'})
+    SET m.aggregates_refreshed_at = datetime()
+"""
+
+
+def _rebuild_diagnosis_stats(tx):
+    tx.run(DELETE_DIAGNOSIS_STATS_QUERY).consume()
+    tx.run(CREATE_DIAGNOSIS_STATS_QUERY).consume()
+
+
+def _refresh_dirty_diagnosis_stats(tx):
+    tx.run(DIRTY_DIAGNOSIS_STATS_QUERY).consume()
+
+
+def create_aggregate_schema(session):
+    for query in SCHEMA_QUERIES:
+        session.run(query).consume()
+
+
+def refresh_aggregates(session, dirty_only=False, batch_size=AGGREGATE_BATCH_SIZE):
+    """
+    Recompute the materialized aggregates.
+
+    Args:
+        session: Neo4j session (the node updates use CALL ... IN TRANSACTIONS,
+            so this must not run inside an explicit transaction)
+        dirty_only: Only recompute nodes marked by mark_visit_rows/mark_visit_ids
+            (incremental loads); otherwise recompute everything
+        batch_size: Nodes updated per transaction
+    """
+    create_aggregate_schema(session)
+    for label, var, query in NODE_AGGREGATE_QUERIES:
+        where = DIRTY_FILTER.format(var=var) if dirty_only else ""
+        session.run(query.format(where=where, batch_size=int(batch_size))).consume()
+        LOGGER.info("%s aggregates refreshed (%s)", label, "changed nodes" if dirty_only else "all nodes")
+    if dirty_only:
+        session.execute_write(_refresh_dirty_diagnosis_stats)
+    else:
+        session.execute_write(_rebuild_diagnosis_stats)
+    session.run(RECORD_REFRESH_QUERY).consume()
@@ -0,0 +1,355 @@
+"""
+Column Types
+------------
+One declared type per CSV column, shared by the bulk ETL and load_data.py,
+so ids, amounts and dates reach Neo4j as integers, floats and `date`
+values instead of strings.
+
+- Integer / Float: numbers
+- Date: ISO dates (2023-01-31), stored as Cypher dates so ORDER BY, date
+  ranges and `duration.inDays(v.admission_date, v.discharge_date)` work
+  natively and can use range indexes
+- Enum: one of a fixed set of strings
+- ColumnType: text, kept as-is
+
+Blank values become null unless the column is required (ids and foreign
+keys). Python loaders convert each row with RowCoercer while batching, so
+the UNWIND queries receive typed values. The LOAD CSV steps convert inside
+Cypher with cypher_value(); validate_csv() first checks the file with the
+same rules and returns the ids of the rows to skip.
+
+Rows that fail are not loaded. Each one is written to
+<rejects dir>/<entity>.rejects.csv with its row number, id, column, value,
+reason and the raw row as JSON.
+"""
+
+import csv
+import datetime
+import json
+import logging
+import os
+import threading
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ColumnType:
+    """
+    How one CSV column is parsed (the base class keeps text as-is).
+
+    Args:
+        required: Reject rows where the column is blank
+    """
+
+    # Cypher that converts a LOAD CSV string ({} is the column expression)
+    cypher = "{}"
+    # Header type for neo4j-admin import files ("" for strings)
+    import_type = ""
+
+    def __init__(self, required=False):
+        self.required = required
+
+    def parse(self, value):
+        """Typed value, or None for a blank; raises ValueError when invalid"""
+        if value is None or value == "":
+            if self.required:
+                raise ValueError("missing value")
+            return None
+        return self.convert(value)
+
+    def convert(self, value):
+        return value
+
+
+class Integer(ColumnType):
+    cypher = "toInteger({})"
+    import_type = "int"
+
+    def convert(self, value):
+        if isinstance(value, int):
+            return value
+        return int(value)
+
+
+class Float(ColumnType):
+    cypher = "toFloat({})"
+    import_type = "float"
+
+    def convert(self, value):
+        if isinstance(value, float):
+            return value
+        return float(value)
+
+
+class Date(ColumnType):
+    cypher = "date({})"
+    import_type = "date"
+
+    def convert(self, value):
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        return datetime.date.fromisoformat(value)
+
+
+class Enum(ColumnType):
+    """Text restricted to `values` (checked in Python; Cypher keeps the string)"""
+
+    def __init__(self, *values, required=False):
+        super().__init__(required)
+        self.values = frozenset(values)
+
+    def convert(self, value):
+        if value not in self.values:
+            raise ValueError(f"not one of {', '.join(sorted(self.values))}")
+        return value
+
+
+# ============================================================================
+# SCHEMA: Column types of the hospital CSV files
+# ============================================================================
+COLUMN_TYPES = {
+    "hospitals": {
+        "hospital_id": Integer(required=True),
+        "hospital_name": ColumnType(),
+        "hospital_state": ColumnType(),
+    },
+    "payers": {
+        "payer_id": Integer(required=True),
+        "payer_name": ColumnType(),
+    },
+    "physicians": {
+        "physician_id": Integer(required=True),
+        "physician_name": ColumnType(),
+        "physician_dob": Date(),
+        "physician_grad_year": Date(),
+        "medical_school": ColumnType(),
+        "salary": Float(),
+    },
+    "patients": {
+        "patient_id": Integer(required=True),
+        "patient_name": ColumnType(),
+        "patient_sex": Enum("Female", "Male"),
+        "patient_dob": Date(),
+        "patient_blood_type": Enum("A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"),
+    },
+    "visits": {
+        "visit_id": Integer(required=True),
+        "patient_id": Integer(required=True),
+        "date_of_admission": Date(),
+        "billing_amount": Float(),
+        "room_number": Integer(),
+        "admission_type": Enum("Elective", "Emergency", "Urgent"),
+        "discharge_date": Date(),
+        "test_results": Enum("Normal", "Abnormal", "Inconclusive"),
+        "visit_status": Enum("DISCHARGED", "OPEN"),
+        "physician_id": Integer(required=True),
+        "payer_id": Integer(required=True),
+        "hospital_id": Integer(required=True),
+        "chief_complaint": ColumnType(),
+        "treatment_description": ColumnType(),
+        "primary_diagnosis": ColumnType(),
+    },
+    "reviews": {
+        "review_id": Integer(required=True),
+        "visit_id": Integer(required=True),
+        "review": ColumnType(),
+        "physician_name": ColumnType(),
+        "hospital_name": ColumnType(),
+        "patient_name": ColumnType(),
+    },
+}
+
+# Column identifying a row of each file
+ID_COLUMNS = {
+    "hospitals": "hospital_id",
+    "payers": "payer_id",
+    "physicians": "physician_id",
+    "patients": "patient_id",
+    "visits": "visit_id",
+    "reviews": "review_id",
+}
+
+# Optional row key holding the row's number in its CSV file (set by
+# parquet_cache.py, whose rows are no longer in file order); rows without
+# it are numbered by position
+ROW_COLUMN = "__row"
+
+# Graph properties stored as dates: (label or relationship type, property, is relationship)
+DATE_PROPERTIES = [
+    ("Physician", "dob", False),
+    ("Physician", "grad_year", False),
+    ("Patient", "dob", False),
+    ("Visit", "admission_date", False),
+    ("Visit", "discharge_date", False),
+    ("COVERED_BY", "service_date", True),
+]
+
+
+def cypher_value(entity, column, row=None):
+    """Cypher converting a LOAD CSV/UNWIND string column, e.g. date(visits.date_of_admission)"""
+    return COLUMN_TYPES[entity][column].cypher.format(f"{row or entity}.{column}")
+
+
+def import_header(entity, column, prop):
+    """neo4j-admin header for a property fed by `column` (e.g. admission_date:date)"""
+    import_type = COLUMN_TYPES[entity][column].import_type
+    return f"{prop}:{import_type}" if import_type else prop
+
+
+# ============================================================================
+# ROW CONVERSION AND REJECTS
+# ============================================================================
+class RejectsFile:
+    """
+    <directory>/<entity>.rejects.csv for one run (a stale file is removed,
+    the new one is only created on the first reject). Thread-safe.
+    """
+
+    FIELDS = ["row", "id", "column", "value", "error", "data"]
+
+    def __init__(self, directory, entity):
+        self.path = os.path.join(directory, f"{entity}.rejects.csv")
+        self.count = 0
+        self._lock = threading.Lock()
+        self._handle = self._writer = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write(self, number, row_id, column, value, error, row):
+        with self._lock:
+            if self._writer is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._handle = open(self.path, "w", newline="")
+                self._writer = csv.writer(self._handle)
+                self._writer.writerow(self.FIELDS)
+            self._writer.writerow([number, row_id, column, value, error, json.dumps(row, default=str)])
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = self._writer = None
+
+
+class RowCoercer:
+    """
+    Converts rows of one CSV file to the types in COLUMN_TYPES.
+
+    Columns missing from the schema pass through unchanged. Rows with an
+    invalid value are dropped, written to `rejects` (if given) and passed
+    to `on_reject(row)`.
+
+    Args:
+        entity: COLUMN_TYPES key (e.g. "visits")
+        rejects: RejectsFile, or None to only count rejects
+        on_reject: Optional callback for each rejected (raw) row
+    """
+
+    def __init__(self, entity, rejects=None, on_reject=None):
+        self.entity = entity
+        self.id_column = ID_COLUMNS[entity]
+        self.columns = list(COLUMN_TYPES[entity].items())
+        self.rejects = rejects
+        self.on_reject = on_reject
+        self.accepted = self.rejected = 0
+
+    def coerce(self, row):
+        """
+        Typed copy of `row`.
+
+        Raises:
+            ValueError: (column, message) of the first invalid value
+        """
+        typed = dict(row)
+        for column, column_type in self.columns:
+            try:
+                typed[column] = column_type.parse(row.get(column))
+            except (TypeError, ValueError) as error:
+                raise ValueError(column, str(error)) from None
+        return typed
+
+    def rows(self, rows, keep_raw=False):
+        """
+        Yield the typed rows, rejecting the invalid ones. With keep_raw the
+        valid rows are yielded unchanged (for Cypher that converts them).
+        """
+        coerce = self.coerce
+        for position, row in enumerate(rows, start=1):
+            number = row.pop(ROW_COLUMN, position)
+            try:
+                typed = coerce(row)
+            except ValueError as error:
+                column, message = error.args
+                self.rejected += 1
+                if self.rejects is not None:
+                    self.rejects.write(number, row.get(self.id_column), column, row.get(column), message, row)
+                if self.on_reject is not None:
+                    self.on_reject(row)
+                continue
+            self.accepted += 1
+            yield row if keep_raw else typed
+
+    def log_summary(self):
+        if self.rejected:
+            where = f" (see {self.rejects.path})" if self.rejects is not None else ""
+            LOGGER.warning("%s: %d rows rejected%s", self.entity, self.rejected, where)
+
+
+def validate_csv(entity, path, rejects=None):
+    """
+    Check a CSV file against COLUMN_TYPES without loading it.
+
+    Returns:
+        Set of the raw id values of the rejected rows
+    """
+    rejected = set()
+    coercer = RowCoercer(entity, rejects, on_reject=lambda row: rejected.add(row.get(ID_COLUMNS[entity])))
+    with open(path, newline="") as f:
+        for _ in coercer.rows(csv.DictReader(f)):
+            pass
+    coercer.log_summary()
+    return rejected
+
+
+# ============================================================================
+# MIGRATION: Date properties written as strings by earlier loads
+# ============================================================================
+def migrate_date_properties(session, batch_size=5000):
+    """
+    Convert DATE_PROPERTIES values still stored as ISO strings to dates
+    (blank strings become null; anything else is left for inspection).
+
+    Each pass scans every node/relationship of the listed types, so this is
+    a one-off: the first pass that finds nothing left to convert records
+    GraphMeta.dates_migrated, and later calls return without scanning.
+
+    Returns:
+        Number of values converted (0 once the graph is migrated)
+    """
+    record = session.run("MATCH (m:GraphMeta {key: 'graph'}) RETURN m.dates_migrated AS done").single()
+    if record is not None and record["done"]:
+        return 0
+    total = 0
+    for name, prop, relationship in DATE_PROPERTIES:
+        pattern = f"()-[n:{name}]->()" if relationship else f"(n:{name})"
+        record = session.run(f"""
+            MATCH {pattern}
+            WHERE n.{prop} IS :: STRING
+              AND (trim(n.{prop}) = '' OR n.{prop} =~ '[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}')
+            CALL {{
+                WITH n
+                SET n.{prop} = CASE WHEN trim(n.{prop}) = '' THEN null ELSE date(n.{prop}) END
+            }} IN TRANSACTIONS OF {int(batch_size)} ROWS
+            RETURN count(n) AS converted
+        """).single()
+        converted = record["converted"] if record else 0
+        if converted:
+            LOGGER.info("Converted %d string %s.%s values to dates", converted, name, prop)
+        total += converted
+    if total == 0:
+        session.run("MERGE (m:GraphMeta {key: 'graph'}) SET m.dates_migrated = true").consume()
+        LOGGER.info("Date properties migrated; later runs skip the check")
+    return total
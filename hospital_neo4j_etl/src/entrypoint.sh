@@ -3,5 +3,10 @@
 # Run any setup steps or pre-processing tasks here
 echo "Running ETL to move hospital data from csvs to Neo4j..."
 
-# Run the ETL script
-python hospital_bulk_csv_write.py
\ No newline at end of file
+# ETL_MODE=admin-import only writes neo4j-admin import files (empty databases);
+# full and incremental load through Cypher
+if [ "$ETL_MODE" = "admin-import" ]; then
+    python admin_import.py
+else
+    python hospital_bulk_csv_write.py
+fi
\ No newline at end of file
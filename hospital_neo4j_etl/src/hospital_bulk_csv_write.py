@@ -11,10 +11,26 @@ Graph Structure:
 
 import logging
 import os
+import threading
+import time
 
 from neo4j import GraphDatabase
 from retry import retry
 
+from aggregates import mark_visit_ids, mark_visit_rows, refresh_aggregates
+from column_types import (
+    ID_COLUMNS,
+    RejectsFile,
+    RowCoercer,
+    cypher_value,
+    migrate_date_properties,
+    validate_csv,
+)
+from etl_scheduler import EtlScheduler, EtlStep
+from incremental import CsvDelta, CsvManifest, chunked, local_csv_path, summary_table
+from schema_indexes import await_indexes, create_secondary_indexes
+from search_indexes import create_fulltext_indexes
+
 # ============================================================================
 # CONFIGURATION: Load paths and credentials from environment variables
 # ============================================================================
@@ -26,11 +42,44 @@ PATIENTS_CSV_PATH = os.getenv("PATIENTS_CSV_PATH")
 VISITS_CSV_PATH = os.getenv("VISITS_CSV_PATH")
 REVIEWS_CSV_PATH = os.getenv("REVIEWS_CSV_PATH")
 
+CSV_PATHS = {
+    "hospitals": HOSPITALS_CSV_PATH,
+    "payers": PAYERS_CSV_PATH,
+    "physicians": PHYSICIANS_CSV_PATH,
+    "patients": PATIENTS_CSV_PATH,
+    "visits": VISITS_CSV_PATH,
+    "reviews": REVIEWS_CSV_PATH,
+}
+
 # Neo4j database connection settings
 NEO4J_URI = os.getenv("NEO4J_URI")  # e.g., bolt://localhost:7687
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")  # e.g., neo4j
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")  # your secure password
 
+# Maximum number of ETL steps (LOAD CSV passes) running at the same time
+ETL_MAX_WORKERS = int(os.getenv("ETL_MAX_WORKERS", 4))
+
+# How visits.csv is loaded:
+# - "fanout":    parse it once, writing each Visit plus its 5 relationships
+# - "multipass": one LOAD CSV pass for the nodes and one per relationship type
+ETL_VISITS_MODE = os.getenv("ETL_VISITS_MODE", "fanout")
+
+# Rows committed per transaction by CALL { ... } IN TRANSACTIONS
+ETL_BATCH_SIZE = int(os.getenv("ETL_BATCH_SIZE", 5000))
+
+# What each run loads:
+# - "full":        every CSV row goes through LOAD CSV (hash-skipped in Neo4j)
+# - "incremental": only rows that are new/changed since the last run are sent,
+#                  rows missing from the CSV become tombstones
+ETL_MODE = os.getenv("ETL_MODE", "full")
+
+# Where the incremental row-hash manifest is kept between runs
+ETL_STATE_DIR = os.getenv("ETL_STATE_DIR", "/data/.etl_state")
+
+# Rows failing their column types (column_types.py) are written here, one
+# <entity>.rejects.csv per CSV file, and not loaded
+ETL_REJECTS_DIR = os.getenv("ETL_REJECTS_DIR", os.path.join(ETL_STATE_DIR, "rejects"))
+
 # ============================================================================
 # LOGGING SETUP: Configure logging format and level
 # ============================================================================
@@ -71,230 +120,780 @@ def _set_uniqueness_constraints(tx, node):
     _ = tx.run(query, {})
 
 
+def _set_all_uniqueness_constraints(driver):
+    """Create uniqueness constraints for all 6 node types to ensure unique IDs"""
+    LOGGER.info("Setting uniqueness constraints on nodes")
+    with driver.session(database="neo4j") as session:
+        for node in NODES:
+            session.execute_write(_set_uniqueness_constraints, node)
+
+
 # ============================================================================
-# MAIN ETL FUNCTION: Load all hospital data into Neo4j
+# HELPER FUNCTION: Typed columns and rejected rows
 # ============================================================================
-@retry(tries=100, delay=10)  # Retry up to 100 times with 10 sec delay (waits for Neo4j to start)
-def load_hospital_graph_from_csv() -> None:
+# entity -> raw ids of the rows that failed validation in this run
+_REJECTED_IDS = {}
+_REJECTED_LOCKS = {entity: threading.Lock() for entity in CSV_PATHS}
+
+
+def _rejected_ids(entity):
     """
-    Load structured hospital CSV data into Neo4j graph database.
+    Validate <entity>.csv against column_types.py once per run (by the first
+    step that reads it) and return the ids of the rows to skip.
+    """
+    with _REJECTED_LOCKS[entity]:
+        if entity not in _REJECTED_IDS:
+            try:
+                path = local_csv_path(CSV_PATHS[entity])
+            except ValueError as error:
+                LOGGER.warning("%s: rows not validated (%s)", entity, error)
+                _REJECTED_IDS[entity] = []
+            else:
+                rejects = RejectsFile(ETL_REJECTS_DIR, entity)
+                try:
+                    _REJECTED_IDS[entity] = list(validate_csv(entity, path, rejects))
+                finally:
+                    rejects.close()
+        return _REJECTED_IDS[entity]
+
+
+def _load_csv(entity, row=None):
+    """LOAD CSV clause for an entity's file that skips its rejected rows ($rejected)"""
+    row = row or entity
+    return f"""LOAD CSV WITH HEADERS FROM '{CSV_PATHS[entity]}' AS {row}
+        WITH {row} WHERE NOT {row}.{ID_COLUMNS[entity]} IN $rejected"""
+
+
+def _typed_properties(entity, columns):
+    """Property -> Cypher converting its CSV column to the type in column_types.py"""
+    return {prop: cypher_value(entity, column) for prop, column in columns.items()}
+
+
+# ============================================================================
+# HELPER FUNCTION: Full-text indexes for diagnosis/complaint/review search
+# ============================================================================
+def _create_fulltext_indexes(driver):
+    """Lucene indexes the chatbots search with (see search_indexes.py)"""
+    with driver.session(database="neo4j") as session:
+        create_fulltext_indexes(session)
+
+
+# ============================================================================
+# HELPER FUNCTION: Range/text indexes for name, state, salary and date lookups
+# ============================================================================
+def _create_secondary_indexes(driver):
+    """Index catalogue for the chatbots' non-id lookups (see schema_indexes.py)"""
+    with driver.session(database="neo4j") as session:
+        create_secondary_indexes(session)
+
+
+def _migrate_date_properties(driver):
+    """Earlier loads stored dates as strings; the hash skips those rows"""
+    with driver.session(database="neo4j") as session:
+        migrate_date_properties(session, ETL_BATCH_SIZE)
+
+
+def _await_indexes(driver):
+    """Block until every index is ONLINE so the graph is reported ready only once usable"""
+    LOGGER.info("Waiting for indexes to come online")
+    with driver.session(database="neo4j") as session:
+        await_indexes(session)
+
+
+# ============================================================================
+# HELPER FUNCTION: Key-only upsert with content-hash skipping
+# ============================================================================
+def _row_hash(properties, hash_extra=()):
+    """Cypher expression for a row's content hash, as stored in `row_hash`"""
+    hashed = ", ".join(
+        f"coalesce(toString({expr}), '')" for expr in [*properties.values(), *hash_extra]
+    )
+    return f"apoc.util.md5([{hashed}])"
+
+
+def _upsert_node(row, var, label, id_expr, properties, hash_extra=(), defer_hash=False):
+    """
+    Build Cypher that upserts one node per CSV row.
     
-    Process:
-    1. Connect to Neo4j database
-    2. Set uniqueness constraints on all node types
-    3. Load nodes (hospitals, patients, physicians, payers, visits, reviews)
-    4. Create relationships between nodes
+    The node is MERGEd on `id` alone, so the lookup is served by the
+    uniqueness-constraint index and a changed property updates the existing
+    node instead of creating a duplicate. The remaining properties are
+    applied with SET, but only when the row's content hash differs from the
+    `row_hash` stored on the node, so unchanged rows cost one index lookup.
+    Requires APOC (apoc.util.md5), which docker-compose installs.
     
-    The @retry decorator handles cases where Neo4j isn't ready yet (e.g., Docker startup).
+    Args:
+        row: LOAD CSV row variable (e.g. "hospitals")
+        var: Node variable (e.g. "h")
+        label: Node label (e.g. "Hospital")
+        id_expr: Cypher expression for the node id
+        properties: Mapping of property name -> Cypher expression
+        hash_extra: Expressions hashed but not stored (e.g. foreign keys), so
+            a row whose relationships changed is reprocessed too
+        defer_hash: Leave `row_hash` in scope instead of storing it; the
+            caller sets `<var>.row_hash = row_hash` once the row's
+            relationships are written, so a row that fails there is retried
+    
+    Rows whose hash is unchanged are filtered out after the clause. A row
+    that reappears after being tombstoned is written again and revived.
+    """
+    prop_map = ",\n                 ".join(f"{name}: {expr}" for name, expr in properties.items())
+    return f"""
+        WITH {row}, {{{prop_map}}} AS props,
+             {_row_hash(properties, hash_extra)} AS row_hash
+        MERGE ({var}:{label} {{id: {id_expr}}})
+        WITH {row}, {var}, props, row_hash
+        WHERE {var}.row_hash IS NULL OR {var}.row_hash <> row_hash
+        SET {var} += props{"" if defer_hash else f", {var}.row_hash = row_hash"}
+        REMOVE {var}.deleted, {var}.deleted_at
     """
 
-    # ========================================================================
-    # STEP 1: Connect to Neo4j Database
-    # ========================================================================
-    driver = GraphDatabase.driver(
-        NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD)
-    )
 
-    # ========================================================================
-    # STEP 2: Set Uniqueness Constraints
-    # ========================================================================
-    # Create constraints for all 6 node types to ensure unique IDs
-    LOGGER.info("Setting uniqueness constraints on nodes")
+def _run_upsert(driver, label, query, params=None):
+    """Run a node upsert query and log how many rows actually changed"""
     with driver.session(database="neo4j") as session:
-        for node in NODES:
-            session.execute_write(_set_uniqueness_constraints, node)
+        record = session.run(query + "\nRETURN count(*) AS changed", params or {}).single()
+        LOGGER.info("%s: %d new or changed rows written", label, record["changed"])
 
-    # ========================================================================
-    # STEP 3: Load Node Data from CSV Files
-    # ========================================================================
-    
-    # --- Load Hospital Nodes ---
-    # Creates nodes like: (:Hospital {id: 1, name: "City General", state_name: "CA"})
+
+# ============================================================================
+# STEP FUNCTIONS: Load node data from CSV files
+# ============================================================================
+
+# --- Load Hospital Nodes ---
+# Creates nodes like: (:Hospital {id: 1, name: "City General", state_name: "CA"})
+HOSPITAL_PROPERTIES = _typed_properties("hospitals", {
+    "name": "hospital_name",
+    "state_name": "hospital_state",
+})
+
+
+def _load_hospital_nodes(driver):
     LOGGER.info("Loading hospital nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{HOSPITALS_CSV_PATH}' AS hospitals
-        MERGE (h:Hospital {{id: toInteger(hospitals.hospital_id),
-                            name: hospitals.hospital_name,
-                            state_name: hospitals.hospital_state}});
-        """
-        _ = session.run(query, {})
+    query = f"""
+        {_load_csv("hospitals")}
+        {_upsert_node("hospitals", "h", "Hospital", "toInteger(hospitals.hospital_id)", HOSPITAL_PROPERTIES)}
+    """
+    _run_upsert(driver, "Hospital", query, {"rejected": _rejected_ids("hospitals")})
+
+
+# --- Load Payer Nodes (Insurance Companies) ---
+# Creates nodes like: (:Payer {id: 1, name: "Blue Cross"})
+PAYER_PROPERTIES = _typed_properties("payers", {
+    "name": "payer_name",
+})
+
 
-    # --- Load Payer Nodes (Insurance Companies) ---
-    # Creates nodes like: (:Payer {id: 1, name: "Blue Cross"})
+def _load_payer_nodes(driver):
     LOGGER.info("Loading payer nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PAYERS_CSV_PATH}' AS payers
-        MERGE (p:Payer {{id: toInteger(payers.payer_id),
-        name: payers.payer_name}});
-        """
-        _ = session.run(query, {})
+    query = f"""
+        {_load_csv("payers")}
+        {_upsert_node("payers", "p", "Payer", "toInteger(payers.payer_id)", PAYER_PROPERTIES)}
+    """
+    _run_upsert(driver, "Payer", query, {"rejected": _rejected_ids("payers")})
+
+
+# --- Load Physician Nodes ---
+# Creates nodes with physician details (name, DOB, school, salary, etc.)
+PHYSICIAN_PROPERTIES = _typed_properties("physicians", {
+    "name": "physician_name",
+    "dob": "physician_dob",
+    "grad_year": "physician_grad_year",
+    "school": "medical_school",
+    "salary": "salary",
+})
+
 
-    # --- Load Physician Nodes ---
-    # Creates nodes with physician details (name, DOB, school, salary, etc.)
+def _load_physician_nodes(driver):
     LOGGER.info("Loading physician nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PHYSICIANS_CSV_PATH}' AS physicians
-        MERGE (p:Physician {{id: toInteger(physicians.physician_id),
-                            name: physicians.physician_name,
-                            dob: physicians.physician_dob,
-                            grad_year: physicians.physician_grad_year,
-                            school: physicians.medical_school,
-                            salary: toFloat(physicians.salary)
-                            }});
-        """
-        _ = session.run(query, {})
+    query = f"""
+        {_load_csv("physicians")}
+        {_upsert_node("physicians", "p", "Physician", "toInteger(physicians.physician_id)", PHYSICIAN_PROPERTIES)}
+    """
+    _run_upsert(driver, "Physician", query, {"rejected": _rejected_ids("physicians")})
+
+
+# --- Load Visit Nodes ---
+# Visit = a patient's hospital visit record
+VISIT_PROPERTIES = _typed_properties("visits", {
+    "room_number": "room_number",
+    "admission_type": "admission_type",
+    "admission_date": "date_of_admission",
+    "test_results": "test_results",
+    "status": "visit_status",
+    "chief_complaint": "chief_complaint",
+    "treatment_description": "treatment_description",
+    "diagnosis": "primary_diagnosis",
+    "discharge_date": "discharge_date",
+})
+# Columns that only feed relationships; hashed so a re-pointed visit is reloaded
+VISIT_RELATIONSHIP_COLUMNS = [
+    "visits.hospital_id",
+    "visits.physician_id",
+    "visits.patient_id",
+    "visits.payer_id",
+    "visits.billing_amount",
+]
+
 
-    # --- Load Visit Nodes ---
-    # Visit = a patient's hospital visit record
-    # ON CREATE/MATCH SET allows updating properties if visit already exists
+def _load_visit_nodes(driver):
     LOGGER.info("Loading visit nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS FROM '{VISITS_CSV_PATH}' AS visits
-        MERGE (v:Visit {{id: toInteger(visits.visit_id),
-                            room_number: toInteger(visits.room_number),
-                            admission_type: visits.admission_type,
-                            admission_date: visits.date_of_admission,
-                            test_results: visits.test_results,
-                            status: visits.visit_status
-        }})
-            ON CREATE SET v.chief_complaint = visits.chief_complaint
-            ON MATCH SET v.chief_complaint = visits.chief_complaint
-            ON CREATE SET v.treatment_description =
-            visits.treatment_description
-            ON MATCH SET v.treatment_description = visits.treatment_description
-            ON CREATE SET v.diagnosis = visits.primary_diagnosis
-            ON MATCH SET v.diagnosis = visits.primary_diagnosis
-            ON CREATE SET v.discharge_date = visits.discharge_date
-            ON MATCH SET v.discharge_date = visits.discharge_date
-         """
-        _ = session.run(query, {})
-
-    # --- Load Patient Nodes ---
-    # Creates nodes with patient demographics (name, sex, DOB, blood type)
+    query = f"""
+        {_load_csv("visits")}
+        {_upsert_node(
+            "visits", "v", "Visit", "toInteger(visits.visit_id)",
+            VISIT_PROPERTIES, hash_extra=VISIT_RELATIONSHIP_COLUMNS,
+        )}
+    """
+    _run_upsert(driver, "Visit", query, {"rejected": _rejected_ids("visits")})
+
+
+# --- Load Patient Nodes ---
+# Creates nodes with patient demographics (name, sex, DOB, blood type)
+PATIENT_PROPERTIES = _typed_properties("patients", {
+    "name": "patient_name",
+    "sex": "patient_sex",
+    "dob": "patient_dob",
+    "blood_type": "patient_blood_type",
+})
+
+
+def _load_patient_nodes(driver):
     LOGGER.info("Loading patient nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PATIENTS_CSV_PATH}' AS patients
-        MERGE (p:Patient {{id: toInteger(patients.patient_id),
-                        name: patients.patient_name,
-                        sex: patients.patient_sex,
-                        dob: patients.patient_dob,
-                        blood_type: patients.patient_blood_type
-                        }});
-        """
-        _ = session.run(query, {})
+    query = f"""
+        {_load_csv("patients")}
+        {_upsert_node("patients", "p", "Patient", "toInteger(patients.patient_id)", PATIENT_PROPERTIES)}
+    """
+    _run_upsert(driver, "Patient", query, {"rejected": _rejected_ids("patients")})
+
+
+# --- Load Review Nodes ---
+# Patient reviews/feedback about their hospital experience
+REVIEW_PROPERTIES = _typed_properties("reviews", {
+    "text": "review",
+    "patient_name": "patient_name",
+    "physician_name": "physician_name",
+    "hospital_name": "hospital_name",
+})
 
-    # --- Load Review Nodes ---
-    # Patient reviews/feedback about their hospital experience
+
+def _load_review_nodes(driver):
     LOGGER.info("Loading review nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{REVIEWS_CSV_PATH}' AS reviews
-        MERGE (r:Review {{id: toInteger(reviews.review_id),
-                         text: reviews.review,
-                         patient_name: reviews.patient_name,
-                         physician_name: reviews.physician_name,
-                         hospital_name: reviews.hospital_name
-                        }});
-        """
-        _ = session.run(query, {})
+    query = f"""
+        {_load_csv("reviews")}
+        {_upsert_node("reviews", "r", "Review", "toInteger(reviews.review_id)", REVIEW_PROPERTIES)}
+    """
+    _run_upsert(driver, "Review", query, {"rejected": _rejected_ids("reviews")})
 
-    # ========================================================================
-    # STEP 4: Create Relationships Between Nodes
-    # ========================================================================
-    # This is where we build the graph structure by connecting related nodes
-    
-    # --- AT Relationship: Visit -> Hospital ---
-    # Connects each visit to the hospital where it occurred
-    # Graph: (Visit)-[:AT]->(Hospital)
+
+# ============================================================================
+# STEP FUNCTIONS: Create relationships between nodes
+# ============================================================================
+# This is where we build the graph structure by connecting related nodes.
+# A visit has one hospital, physician, patient and payer, so each pass first
+# drops the visit's edge to any other node (the row was re-pointed) and then
+# MERGEs the current one.
+
+# --- AT Relationship: Visit -> Hospital ---
+# Connects each visit to the hospital where it occurred
+# Graph: (Visit)-[:AT]->(Hospital)
+def _load_at_relationships(driver):
     LOGGER.info("Loading 'AT' relationships")
     with driver.session(database="neo4j") as session:
         query = f"""
-        LOAD CSV WITH HEADERS FROM '{VISITS_CSV_PATH}' AS row
+        {_load_csv("visits", "row")}
         MATCH (source: `Visit` {{ `id`: toInteger(trim(row.`visit_id`)) }})
         MATCH (target: `Hospital` {{ `id`:
         toInteger(trim(row.`hospital_id`))}})
+        OPTIONAL MATCH (source)-[stale: `AT`]->(other)
+        WHERE other <> target
+        DELETE stale
+        WITH DISTINCT source, target
         MERGE (source)-[r: `AT`]->(target)
         """
-        _ = session.run(query, {})
+        _ = session.run(query, {"rejected": _rejected_ids("visits")}).consume()
 
-    # --- WRITES Relationship: Visit -> Review ---
-    # Links a visit to any reviews written about that visit
-    # Graph: (Visit)-[:WRITES]->(Review)
+
+# --- WRITES Relationship: Visit -> Review ---
+# Links a visit to any reviews written about that visit
+# Graph: (Visit)-[:WRITES]->(Review)
+def _load_writes_relationships(driver):
     LOGGER.info("Loading 'WRITES' relationships")
     with driver.session(database="neo4j") as session:
         query = f"""
-        LOAD CSV WITH HEADERS FROM '{REVIEWS_CSV_PATH}' AS reviews
+        {_load_csv("reviews")}
             MATCH (v:Visit {{id: toInteger(reviews.visit_id)}})
             MATCH (r:Review {{id: toInteger(reviews.review_id)}})
             MERGE (v)-[writes:WRITES]->(r)
         """
-        _ = session.run(query, {})
+        _ = session.run(query, {"rejected": _rejected_ids("reviews")}).consume()
+
 
-    # --- TREATS Relationship: Physician -> Visit ---
-    # Shows which physician treated each visit
-    # Graph: (Physician)-[:TREATS]->(Visit)
+# --- TREATS Relationship: Physician -> Visit ---
+# Shows which physician treated each visit
+# Graph: (Physician)-[:TREATS]->(Visit)
+def _load_treats_relationships(driver):
     LOGGER.info("Loading 'TREATS' relationships")
     with driver.session(database="neo4j") as session:
         query = f"""
-        LOAD CSV WITH HEADERS FROM '{VISITS_CSV_PATH}' AS visits
+        {_load_csv("visits")}
             MATCH (p:Physician {{id: toInteger(visits.physician_id)}})
             MATCH (v:Visit {{id: toInteger(visits.visit_id)}})
+            OPTIONAL MATCH (other)-[stale:TREATS]->(v)
+            WHERE other <> p
+            DELETE stale
+            WITH DISTINCT p, v
             MERGE (p)-[treats:TREATS]->(v)
         """
-        _ = session.run(query, {})
+        _ = session.run(query, {"rejected": _rejected_ids("visits")}).consume()
 
-    # --- COVERED_BY Relationship: Visit -> Payer ---
-    # Links visits to insurance payers, with billing information
-    # Graph: (Visit)-[:COVERED_BY {service_date, billing_amount}]->(Payer)
-    # Note: This relationship has properties (service_date and billing_amount)
+
+# --- COVERED_BY Relationship: Visit -> Payer ---
+# Links visits to insurance payers, with billing information
+# Graph: (Visit)-[:COVERED_BY {service_date, billing_amount}]->(Payer)
+# Note: This relationship has properties (service_date and billing_amount)
+def _load_covered_by_relationships(driver):
     LOGGER.info("Loading 'COVERED_BY' relationships")
     with driver.session(database="neo4j") as session:
         query = f"""
-        LOAD CSV WITH HEADERS FROM '{VISITS_CSV_PATH}' AS visits
+        {_load_csv("visits")}
             MATCH (v:Visit {{id: toInteger(visits.visit_id)}})
             MATCH (p:Payer {{id: toInteger(visits.payer_id)}})
+            OPTIONAL MATCH (v)-[stale:COVERED_BY]->(other)
+            WHERE other <> p
+            DELETE stale
+            WITH DISTINCT visits, v, p
             MERGE (v)-[covered_by:COVERED_BY]->(p)
-            ON CREATE SET
-                covered_by.service_date = visits.discharge_date,
-                covered_by.billing_amount = toFloat(visits.billing_amount)
+            SET covered_by.service_date = {cypher_value("visits", "discharge_date")},
+                covered_by.billing_amount = {cypher_value("visits", "billing_amount")}
         """
-        _ = session.run(query, {})
+        _ = session.run(query, {"rejected": _rejected_ids("visits")}).consume()
+
 
-    # --- HAS Relationship: Patient -> Visit ---
-    # Connects patients to their hospital visits
-    # Graph: (Patient)-[:HAS]->(Visit)
+# --- HAS Relationship: Patient -> Visit ---
+# Connects patients to their hospital visits
+# Graph: (Patient)-[:HAS]->(Visit)
+def _load_has_relationships(driver):
     LOGGER.info("Loading 'HAS' relationships")
     with driver.session(database="neo4j") as session:
         query = f"""
-        LOAD CSV WITH HEADERS FROM '{VISITS_CSV_PATH}' AS visits
+        {_load_csv("visits")}
             MATCH (p:Patient {{id: toInteger(visits.patient_id)}})
             MATCH (v:Visit {{id: toInteger(visits.visit_id)}})
+            OPTIONAL MATCH (other)-[stale:HAS]->(v)
+            WHERE other <> p
+            DELETE stale
+            WITH DISTINCT p, v
             MERGE (p)-[has:HAS]->(v)
         """
-        _ = session.run(query, {})
+        _ = session.run(query, {"rejected": _rejected_ids("visits")}).consume()
+
 
-    # --- EMPLOYS Relationship: Hospital -> Physician ---
-    # Shows which hospitals employ which physicians
-    # Graph: (Hospital)-[:EMPLOYS]->(Physician)
+# --- EMPLOYS Relationship: Hospital -> Physician ---
+# Shows which hospitals employ which physicians
+# Graph: (Hospital)-[:EMPLOYS]->(Physician)
+def _load_employs_relationships(driver):
     LOGGER.info("Loading 'EMPLOYS' relationships")
     with driver.session(database="neo4j") as session:
         query = f"""
-        LOAD CSV WITH HEADERS FROM '{VISITS_CSV_PATH}' AS visits
+        {_load_csv("visits")}
             MATCH (h:Hospital {{id: toInteger(visits.hospital_id)}})
             MATCH (p:Physician {{id: toInteger(visits.physician_id)}})
             MERGE (h)-[employs:EMPLOYS]->(p)
         """
-        _ = session.run(query, {})
+        _ = session.run(query, {"rejected": _rejected_ids("visits")}).consume()
+
+
+# --- Single-Pass Visit Fan-Out ---
+# Parses visits.csv ONCE and, per row, writes the Visit node together with its
+# AT, TREATS, COVERED_BY, HAS and EMPLOYS relationships. Rows are committed in
+# batches of ETL_BATCH_SIZE, so the id lookups run once per row instead of
+# once per row per relationship type. Rows whose content hash is unchanged
+# skip both the property writes and the relationship MERGEs. The hash is
+# stored last: a visit whose hospital, physician, patient or payer is missing
+# (e.g. rejected, or not loaded yet) keeps its old relationships and no new
+# hash, so the next run retries it.
+def _visit_fanout_body():
+    """Per-row Cypher for the `visits` row variable (LOAD CSV or UNWIND)"""
+    return f"""
+            {_upsert_node(
+                "visits", "v", "Visit", "toInteger(visits.visit_id)",
+                VISIT_PROPERTIES, hash_extra=VISIT_RELATIONSHIP_COLUMNS, defer_hash=True,
+            )}
+            WITH v, visits, row_hash
+            MATCH (h:Hospital {{id: toInteger(visits.hospital_id)}})
+            MATCH (ph:Physician {{id: toInteger(visits.physician_id)}})
+            MATCH (pt:Patient {{id: toInteger(visits.patient_id)}})
+            MATCH (py:Payer {{id: toInteger(visits.payer_id)}})
+            // A changed row may point at a different hospital/physician/
+            // patient/payer, so its old visit relationships are replaced
+            OPTIONAL MATCH (v)-[old_out:AT|COVERED_BY]->()
+            DELETE old_out
+            WITH DISTINCT v, visits, row_hash, h, ph, pt, py
+            OPTIONAL MATCH (v)<-[old_in:TREATS|HAS]-()
+            DELETE old_in
+            WITH DISTINCT v, visits, row_hash, h, ph, pt, py
+            MERGE (v)-[:AT]->(h)
+            MERGE (ph)-[:TREATS]->(v)
+            MERGE (v)-[covered_by:COVERED_BY]->(py)
+            SET covered_by.service_date = {cypher_value("visits", "discharge_date")},
+                covered_by.billing_amount = {cypher_value("visits", "billing_amount")}
+            MERGE (pt)-[:HAS]->(v)
+            MERGE (h)-[:EMPLOYS]->(ph)
+            SET v.row_hash = row_hash
+    """
+
+
+def _load_visits_fanout(driver):
+    LOGGER.info("Loading visit nodes and relationships in a single pass")
+    with driver.session(database="neo4j") as session:
+        query = f"""
+        {_load_csv("visits")}
+        CALL {{
+            WITH visits
+            {_visit_fanout_body()}
+        }} IN TRANSACTIONS OF {ETL_BATCH_SIZE} ROWS
+        """
+        _ = session.run(query, {"rejected": _rejected_ids("visits")}).consume()
+
+
+# --- Record Run Timing ---
+# Keeps the last wall-clock time per visits mode on the GraphMeta node so each
+# run can be compared with the previous run of the other mode
+def _record_run_timing(driver, mode, seconds):
+    """Store this run's duration and return the previous {mode: seconds} timings"""
+    with driver.session(database="neo4j") as session:
+        query = """
+        MERGE (m:GraphMeta {key: 'graph'})
+        WITH m, {fanout: m.etl_seconds_fanout,
+                 multipass: m.etl_seconds_multipass} AS previous
+        SET m += $timing
+        RETURN previous
+        """
+        record = session.run(query, {"timing": {f"etl_seconds_{mode}": seconds}}).single()
+        return record["previous"]
+
+
+# --- Refresh Aggregates ---
+# Visit counts, diagnosis counts, payer billing and physician patient counts
+# read by the chatbots (see aggregates.py). A full load recomputes all of
+# them; an incremental load only the nodes its visit changes touched.
+def _refresh_aggregates(driver, dirty_only=False):
+    LOGGER.info("Refreshing materialized aggregates")
+    with driver.session(database="neo4j") as session:
+        refresh_aggregates(session, dirty_only=dirty_only)
+
+
+# --- Bump Graph Version ---
+# The chatbot result caches drop their entries when this counter changes
+def _bump_graph_version(driver):
+    LOGGER.info("Bumping graph version")
+    with driver.session(database="neo4j") as session:
+        query = """
+        MERGE (m:GraphMeta {key: 'graph'})
+        SET m.version = coalesce(m.version, 0) + 1,
+            m.updated_at = datetime()
+        """
+        _ = session.run(query, {}).consume()
+
+
+# ============================================================================
+# INCREMENTAL MODE: Send only the CSV rows that changed since the last run
+# ============================================================================
+# A row-hash manifest (see incremental.py) decides which rows are new, changed
+# or gone. Changed rows go through the same upsert Cypher as the full load,
+# fed by `UNWIND $rows AS <entity>` instead of LOAD CSV.
+
+# Reviews carry their visit id, so a re-pointed review gets a new WRITES edge
+# (stored with its hash only once the visit exists, as in the visit fan-out)
+REVIEW_FANOUT_BODY = f"""
+    {_upsert_node(
+        "reviews", "r", "Review", "toInteger(reviews.review_id)",
+        REVIEW_PROPERTIES, hash_extra=["reviews.visit_id"], defer_hash=True,
+    )}
+    WITH r, reviews, row_hash
+    MATCH (v:Visit {{id: toInteger(reviews.visit_id)}})
+    OPTIONAL MATCH (r)<-[old:WRITES]-()
+    DELETE old
+    WITH DISTINCT r, reviews, row_hash, v
+    MERGE (v)-[:WRITES]->(r)
+    SET r.row_hash = row_hash
+"""
+
+# entity -> (CSV URI, id column, label, node variable, per-row upsert Cypher,
+# row hash). The upsert returns the ids it wrote; a visit or review whose
+# neighbours are missing drops out at the MATCH and is retried next run.
+INCREMENTAL_FEEDS = {
+    "hospitals": (HOSPITALS_CSV_PATH, "hospital_id", "Hospital", "h",
+                  _upsert_node("hospitals", "h", "Hospital", "toInteger(hospitals.hospital_id)",
+                               HOSPITAL_PROPERTIES),
+                  _row_hash(HOSPITAL_PROPERTIES)),
+    "payers": (PAYERS_CSV_PATH, "payer_id", "Payer", "p",
+               _upsert_node("payers", "p", "Payer", "toInteger(payers.payer_id)", PAYER_PROPERTIES),
+               _row_hash(PAYER_PROPERTIES)),
+    "physicians": (PHYSICIANS_CSV_PATH, "physician_id", "Physician", "p",
+                   _upsert_node("physicians", "p", "Physician", "toInteger(physicians.physician_id)",
+                                PHYSICIAN_PROPERTIES),
+                   _row_hash(PHYSICIAN_PROPERTIES)),
+    "patients": (PATIENTS_CSV_PATH, "patient_id", "Patient", "p",
+                 _upsert_node("patients", "p", "Patient", "toInteger(patients.patient_id)",
+                              PATIENT_PROPERTIES),
+                 _row_hash(PATIENT_PROPERTIES)),
+    "visits": (VISITS_CSV_PATH, "visit_id", "Visit", "v", _visit_fanout_body(),
+               _row_hash(VISIT_PROPERTIES, VISIT_RELATIONSHIP_COLUMNS)),
+    "reviews": (REVIEWS_CSV_PATH, "review_id", "Review", "r", REVIEW_FANOUT_BODY,
+                _row_hash(REVIEW_PROPERTIES, ["reviews.visit_id"])),
+}
+
+# Rows the upsert skipped because the node already carries their hash (e.g.
+# written by a run whose manifest was never saved) count as written too
+CURRENT_IDS_QUERY = """
+    UNWIND $rows AS {entity}
+    MATCH (n:{label} {{id: toInteger({entity}.{id_column})}})
+    WHERE n.row_hash = {row_hash}
+    RETURN n.id AS id
+"""
+
+# Tombstones keep the node (and its id) for auditing but drop its
+# relationships, so graph traversals no longer reach the deleted row
+TOMBSTONE_QUERY = """
+    UNWIND $ids AS id
+    MATCH (n:{label} {{id: toInteger(id)}})
+    WHERE n.deleted IS NULL
+    OPTIONAL MATCH (n)-[rel]-()
+    DELETE rel
+    WITH DISTINCT n
+    SET n.deleted = true, n.deleted_at = datetime(), n.row_hash = null
+"""
+
+
+def _write_rows(tx, query, rows):
+    return tx.run(query, rows=rows).value("id")
+
+
+def _write_visit_rows(tx, query, rows):
+    """Visit rows also mark the aggregates they change, in the same transaction"""
+    mark_visit_rows(tx, rows)
+    return tx.run(query, rows=rows).value("id")
+
+
+def _read_ids(tx, query, rows):
+    return tx.run(query, rows=rows).value("id")
+
+
+def _defer_unwritten(session, delta, current_query, rows, ids):
+    """Hand the rows the upsert neither wrote nor found current back to `delta`"""
+    written = set(ids)
+    unwritten = [row for row in rows if int(row[delta.id_column]) not in written]
+    if unwritten:
+        written.update(session.execute_read(_read_ids, current_query, unwritten))
+    for row in unwritten:
+        if int(row[delta.id_column]) not in written:
+            delta.defer(row[delta.id_column])
+
+
+def _write_tombstones(tx, label, ids):
+    if label == "Visit":
+        mark_visit_ids(tx, ids)
+    tx.run(TOMBSTONE_QUERY.format(label=label), ids=ids).consume()
+
+
+def _load_incremental(driver, entity, manifest, summaries):
+    """
+    Upsert the new/changed rows of one CSV and tombstone its deleted rows.
+    Rows that were not written keep their old manifest entry (pending).
+    """
+    uri, id_column, label, var, body, row_hash = INCREMENTAL_FEEDS[entity]
+    delta = CsvDelta(manifest, entity, local_csv_path(uri), id_column)
+    if delta.unchanged_file:
+        LOGGER.info("%s: file unchanged since last run, skipping", entity)
+    query = f"UNWIND $rows AS {entity}\n{body}\nRETURN {var}.id AS id"
+    current_query = CURRENT_IDS_QUERY.format(
+        entity=entity, label=label, id_column=id_column, row_hash=row_hash
+    )
+    # Rows are checked in Python and converted by the same Cypher as LOAD CSV
+    rejects = RejectsFile(ETL_REJECTS_DIR, entity)
+    coercer = RowCoercer(entity, rejects, on_reject=delta.reject)
+    with driver.session(database="neo4j") as session:
+        # LOAD CSV reads empty fields as null; match that for UNWIND rows
+        rows = (
+            {key: value or None for key, value in row.items()}
+            for row in coercer.rows(delta.changed_rows(), keep_raw=True)
+        )
+        write = _write_visit_rows if entity == "visits" else _write_rows
+        for batch in chunked(rows, ETL_BATCH_SIZE):
+            ids = session.execute_write(write, query, batch)
+            _defer_unwritten(session, delta, current_query, batch, ids)
+        for ids in chunked(delta.deleted_ids, ETL_BATCH_SIZE):
+            session.execute_write(_write_tombstones, label, ids)
+    rejects.close()
+    coercer.log_summary()
+    delta.commit()
+    summaries[entity] = delta.summary()
+
+
+def build_incremental_steps(manifest, summaries):
+    """Step table for ETL_MODE=incremental; fills `summaries` per entity"""
+
+    def step(entity):
+        return lambda driver: _load_incremental(driver, entity, manifest, summaries)
+
+    def bump_if_changed(driver):
+        if any(counts["inserted"] or counts["updated"] or counts["deleted"]
+               for counts in summaries.values()):
+            _bump_graph_version(driver)
+        else:
+            LOGGER.info("No changes, graph version left as is")
+
+    dimensions = ["hospitals", "payers", "physicians", "patients"]
+    steps = [
+        EtlStep("constraints", _set_all_uniqueness_constraints),
+        EtlStep("fulltext_indexes", _create_fulltext_indexes),
+        EtlStep("secondary_indexes", _create_secondary_indexes),
+    ]
+    steps += [EtlStep(entity, step(entity), requires=["constraints"]) for entity in dimensions]
+    steps += [
+        EtlStep("visits", step("visits"), requires=dimensions),
+        EtlStep("reviews", step("reviews"), requires=["visits"]),
+        EtlStep("aggregates", lambda driver: _refresh_aggregates(driver, dirty_only=True), requires=["visits"]),
+        EtlStep(
+            "indexes_online",
+            _await_indexes,
+            requires=["fulltext_indexes", "secondary_indexes", "reviews"],
+        ),
+        EtlStep("graph_version", bump_if_changed, requires=["aggregates", "indexes_online"]),
+    ]
+    return steps
+
+
+def _run_incremental(driver):
+    """Run the incremental step table and persist the manifest on success"""
+    manifest = CsvManifest(os.path.join(ETL_STATE_DIR, "manifest.json"))
+    summaries = {}
+    scheduler = EtlScheduler(build_incremental_steps(manifest, summaries), max_workers=ETL_MAX_WORKERS)
+    scheduler.run(driver)
+    # Only saved once every step succeeded, so a failed run is fully retried
+    manifest.save()
+    ordered = {entity: summaries[entity] for entity in INCREMENTAL_FEEDS if entity in summaries}
+    LOGGER.info("Incremental load summary\n%s", summary_table(ordered))
+
+
+# ============================================================================
+# ETL STEP TABLE: Each step lists the steps it depends on
+# ============================================================================
+# Node loads only need the constraints. Each relationship step needs the two
+# node types it connects, so independent relationship types can load while
+# other node types are still being written.
+def build_etl_steps(visits_mode=ETL_VISITS_MODE):
+    """Step table for the chosen visits mode ("fanout" or "multipass")"""
+    steps = [
+        EtlStep("constraints", _set_all_uniqueness_constraints),
+        EtlStep("fulltext_indexes", _create_fulltext_indexes),
+        EtlStep("secondary_indexes", _create_secondary_indexes),
+        EtlStep("hospital_nodes", _load_hospital_nodes, requires=["constraints"]),
+        EtlStep("payer_nodes", _load_payer_nodes, requires=["constraints"]),
+        EtlStep("physician_nodes", _load_physician_nodes, requires=["constraints"]),
+        EtlStep("patient_nodes", _load_patient_nodes, requires=["constraints"]),
+        EtlStep("review_nodes", _load_review_nodes, requires=["constraints"]),
+    ]
+    if visits_mode == "fanout":
+        visit_steps = ["visits_fanout"]
+        steps += [
+            EtlStep(
+                "visits_fanout",
+                _load_visits_fanout,
+                requires=["hospital_nodes", "physician_nodes", "patient_nodes", "payer_nodes"],
+            ),
+            EtlStep("writes_rels", _load_writes_relationships, requires=["visits_fanout", "review_nodes"]),
+        ]
+    elif visits_mode == "multipass":
+        visit_steps = ["at_rels", "treats_rels", "covered_by_rels", "has_rels", "employs_rels"]
+        steps += [
+            EtlStep("visit_nodes", _load_visit_nodes, requires=["constraints"]),
+            EtlStep("at_rels", _load_at_relationships, requires=["visit_nodes", "hospital_nodes"]),
+            EtlStep("writes_rels", _load_writes_relationships, requires=["visit_nodes", "review_nodes"]),
+            EtlStep("treats_rels", _load_treats_relationships, requires=["physician_nodes", "visit_nodes"]),
+            EtlStep("covered_by_rels", _load_covered_by_relationships, requires=["visit_nodes", "payer_nodes"]),
+            EtlStep("has_rels", _load_has_relationships, requires=["patient_nodes", "visit_nodes"]),
+            EtlStep("employs_rels", _load_employs_relationships, requires=["hospital_nodes", "physician_nodes"]),
+        ]
+    else:
+        raise ValueError(f"Unknown ETL_VISITS_MODE '{visits_mode}' (use 'fanout' or 'multipass')")
+    steps += [
+        EtlStep("aggregates", _refresh_aggregates, requires=visit_steps),
+        EtlStep(
+            "date_migration",
+            _migrate_date_properties,
+            requires=[*visit_steps, "physician_nodes", "patient_nodes"],
+        ),
+        EtlStep(
+            "indexes_online",
+            _await_indexes,
+            requires=["fulltext_indexes", "secondary_indexes", "date_migration", "writes_rels"],
+        ),
+        EtlStep("graph_version", _bump_graph_version, requires=["aggregates", "indexes_online"]),
+    ]
+    return steps
+
+
+# ============================================================================
+# MAIN ETL FUNCTION: Load all hospital data into Neo4j
+# ============================================================================
+@retry(tries=100, delay=10)  # Retry up to 100 times with 10 sec delay (waits for Neo4j to start)
+def load_hospital_graph_from_csv() -> None:
+    """
+    Load structured hospital CSV data into Neo4j graph database.
+    
+    Process:
+    1. Connect to Neo4j database
+    2. Set uniqueness constraints on all node types
+    3. Load nodes (hospitals, patients, physicians, payers, visits, reviews)
+    4. Create relationships between nodes
+    5. Refresh the materialized aggregates read by the chatbots
+    6. Wait until every index (see schema_indexes.py) is online
+    
+    Steps run on a worker pool of ETL_MAX_WORKERS threads as soon as their
+    prerequisites are done; deadlocks between concurrent steps are retried.
+    With ETL_VISITS_MODE=fanout (default) visits.csv is parsed only once.
+    With ETL_MODE=incremental only rows changed since the last run are sent.
+    The @retry decorator handles cases where Neo4j isn't ready yet (e.g., Docker startup).
+    """
+
+    # ========================================================================
+    # STEP 1: Connect to Neo4j Database
+    # ========================================================================
+    driver = GraphDatabase.driver(
+        NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD)
+    )
+
+    # ========================================================================
+    # STEPS 2-4: Run the dependency-aware step table
+    # ========================================================================
+    try:
+        if ETL_MODE == "incremental":
+            _run_incremental(driver)
+            return
+        if ETL_MODE != "full":
+            raise ValueError(f"Unknown ETL_MODE '{ETL_MODE}' (use 'full' or 'incremental')")
+        started = time.perf_counter()
+        _REJECTED_IDS.clear()  # validate the files again on a retried run
+        scheduler = EtlScheduler(build_etl_steps(ETL_VISITS_MODE), max_workers=ETL_MAX_WORKERS)
+        scheduler.run(driver)
+        elapsed = time.perf_counter() - started
+
+        # ====================================================================
+        # STEP 5: Compare wall-clock time with the last run of the other mode
+        # ====================================================================
+        previous = _record_run_timing(driver, ETL_VISITS_MODE, elapsed)
+        LOGGER.info("ETL (%s visits mode) took %.2fs", ETL_VISITS_MODE, elapsed)
+        for mode, seconds in previous.items():
+            if mode != ETL_VISITS_MODE and seconds:
+                LOGGER.info(
+                    "Last %s run took %.2fs (%.1fx the %s run)",
+                    mode, seconds, seconds / elapsed if elapsed else 0, ETL_VISITS_MODE,
+                )
+    finally:
+        driver.close()
 
 
 # ============================================================================
@@ -0,0 +1,203 @@
+"""
+Incremental (CDC) Loading Helpers
+---------------------------------
+Change detection for CSV feeds using a row-hash manifest.
+
+For every CSV file the manifest stores the file's size/mtime and an md5 hash
+per row id. On the next run:
+- an unchanged file (same size and mtime) is skipped without being parsed
+- rows with a new id are INSERTED
+- rows whose hash changed are UPDATED
+- rows whose hash matches are SKIPPED
+- ids that disappeared from the file are DELETED (written as tombstones)
+- rows that fail their column types (column_types.py) are REJECTED and
+  stay out of the manifest, so they are retried on the next run
+- rows that were sent but not written (e.g. a visit whose patient is
+  missing) are PENDING and retried the same way
+
+Only inserted and updated rows are sent to Neo4j, so a nightly run costs
+time proportional to the delta instead of the whole history. Used by both
+the bulk ETL (ETL_MODE=incremental) and load_data.py --incremental.
+"""
+
+import csv
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+from urllib.parse import unquote, urlparse
+
+LOGGER = logging.getLogger(__name__)
+
+
+def local_csv_path(uri):
+    """Turn a LOAD CSV URI such as file:///data/visits.csv into a local path"""
+    parsed = urlparse(uri)
+    if parsed.scheme in ("", "file"):
+        return unquote(parsed.path) if parsed.scheme else uri
+    raise ValueError(f"Incremental mode needs local CSV files, got '{uri}'")
+
+
+def row_hash(row):
+    """Stable md5 of a CSV row (column order independent)"""
+    payload = "\x1f".join(f"{key}={row[key] or ''}" for key in sorted(row))
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+def chunked(rows, size):
+    """Group an iterable of rows into lists of at most `size` rows"""
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+class CsvManifest:
+    """
+    Per-file row-hash manifest persisted as JSON.
+
+    Updates are staged in memory and only written by save(), so a failed
+    run leaves the previous manifest in place and is fully retried.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                self._files = json.load(f)
+        else:
+            self._files = {}
+
+    def get(self, key):
+        with self._lock:
+            return self._files.get(key, {"size": None, "mtime": None, "rows": {}})
+
+    def put(self, key, entry):
+        with self._lock:
+            self._files[key] = entry
+
+    def save(self):
+        """Atomically replace the manifest file"""
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self._files, f)
+            os.replace(temp_path, self.path)
+
+
+class CsvDelta:
+    """
+    Compare a CSV file with its manifest entry.
+
+    Iterate changed_rows() to stream inserted/updated rows; once it is
+    exhausted, deleted_ids and the counters are final and commit() stages
+    the new manifest entry.
+
+    Args:
+        manifest: CsvManifest
+        key: Manifest key for this file (e.g. "visits")
+        path: Local CSV path
+        id_column: Column holding the row id (e.g. "visit_id")
+    """
+
+    def __init__(self, manifest, key, path, id_column):
+        self.manifest = manifest
+        self.key = key
+        self.path = path
+        self.id_column = id_column
+        self.previous = manifest.get(key)
+        stat = os.stat(path)
+        self.size, self.mtime = stat.st_size, stat.st_mtime
+        self.unchanged_file = (self.size, self.mtime) == (
+            self.previous["size"], self.previous["mtime"]
+        )
+        self.current = {}
+        self.deleted_ids = []
+        self.inserted = self.updated = self.skipped = self.rejected = self.pending = 0
+
+    def changed_rows(self):
+        """Yield rows that are new or whose content changed"""
+        previous_rows = self.previous["rows"]
+        if self.unchanged_file:
+            self.current = previous_rows
+            self.skipped = len(previous_rows)
+            return
+        with open(self.path, newline="") as f:
+            for row in csv.DictReader(f):
+                row_id = row[self.id_column].strip()
+                digest = row_hash(row)
+                self.current[row_id] = digest
+                old = previous_rows.get(row_id)
+                if old == digest:
+                    self.skipped += 1
+                    continue
+                if old is None:
+                    self.inserted += 1
+                else:
+                    self.updated += 1
+                yield row
+        self.deleted_ids = [row_id for row_id in previous_rows if row_id not in self.current]
+
+    def _forget(self, row_id):
+        # Keep the old hash (if any): the row is neither tombstoned nor
+        # marked as loaded, so the next run retries it
+        old = self.previous["rows"].get(row_id)
+        if old is None:
+            self.current.pop(row_id, None)
+            self.inserted -= 1
+        else:
+            self.current[row_id] = old
+            self.updated -= 1
+
+    def reject(self, row):
+        """Forget a yielded row that failed type conversion (see column_types.py)"""
+        self._forget((row.get(self.id_column) or "").strip())
+        self.rejected += 1
+
+    def defer(self, row_id):
+        """
+        Forget a row that was sent but not written, e.g. because the visit,
+        hospital or payer it points at does not exist yet
+        """
+        self._forget(str(row_id).strip())
+        self.pending += 1
+
+    def commit(self):
+        """Stage the new manifest entry (written by CsvManifest.save)"""
+        # With rows left to retry the file must be parsed again next run,
+        # even if it is unchanged
+        retry = self.rejected or self.pending
+        self.manifest.put(self.key, {
+            "size": None if retry else self.size,
+            "mtime": None if retry else self.mtime,
+            "rows": self.current,
+        })
+
+    def summary(self):
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "deleted": len(self.deleted_ids),
+            "rejected": self.rejected,
+            "pending": self.pending,
+        }
+
+
+def summary_table(summaries):
+    """Format {entity: summary} as a log-friendly table"""
+    lines = [
+        f"{'entity':<12}{'inserted':>10}{'updated':>10}{'skipped':>10}"
+        f"{'deleted':>10}{'rejected':>10}{'pending':>10}"
+    ]
+    for entity, counts in summaries.items():
+        lines.append(
+            f"{entity:<12}{counts['inserted']:>10}{counts['updated']:>10}"
+            f"{counts['skipped']:>10}{counts['deleted']:>10}{counts['rejected']:>10}{counts['pending']:>10}"
+        )
+    return "\n".join(lines)
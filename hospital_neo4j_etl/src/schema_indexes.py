@@ -0,0 +1,88 @@
+"""
+Secondary Indexes
+-----------------
+The range and text indexes behind the chatbots' name, state, salary and
+date lookups. Without them `h.state_name = $state`, `{name: $name}`,
+`p.name CONTAINS $name` and `ORDER BY p.salary` read every node of the
+label; the uniqueness constraints only cover `id`.
+
+- RANGE indexes serve equality, ranges, `IS NOT NULL` and ordered scans
+- TEXT indexes serve CONTAINS / ENDS WITH on strings
+
+Index names follow the suggestions printed by query_plans.py, so a missing
+index it reports is the one created here. Indexes populate in the
+background; await_indexes() blocks until every index (including the
+full-text ones) is ONLINE, so the ETL only reports completion once the
+queries can actually use them. Used by both the bulk ETL and load_data.py.
+"""
+
+import logging
+import os
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds to wait for every index to come ONLINE before failing the run
+INDEX_AWAIT_TIMEOUT = int(os.getenv("INDEX_AWAIT_TIMEOUT", 600))
+
+# Seconds between index state checks while waiting
+INDEX_POLL_INTERVAL = float(os.getenv("INDEX_POLL_INTERVAL", 2))
+
+# index name -> (index type, label, property)
+SECONDARY_INDEXES = {
+    "hospital_name": ("RANGE", "Hospital", "name"),
+    "hospital_state_name": ("RANGE", "Hospital", "state_name"),
+    "physician_name": ("RANGE", "Physician", "name"),
+    "physician_salary": ("RANGE", "Physician", "salary"),
+    "patient_name": ("RANGE", "Patient", "name"),
+    "visit_admission_date": ("RANGE", "Visit", "admission_date"),
+    "physician_name_text": ("TEXT", "Physician", "name"),
+    "patient_name_text": ("TEXT", "Patient", "name"),
+}
+
+
+def index_cypher(name, kind, label, prop):
+    """CREATE statement for one catalogue entry"""
+    return f"CREATE {kind} INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"
+
+
+def create_secondary_indexes(session):
+    """Create any missing index from SECONDARY_INDEXES (they populate in the background)"""
+    for name, (kind, label, prop) in SECONDARY_INDEXES.items():
+        session.run(index_cypher(name, kind, label, prop)).consume()
+        LOGGER.info("%s index %s on :%s(%s)", kind.title(), name, label, prop)
+
+
+def await_indexes(session, timeout=INDEX_AWAIT_TIMEOUT, poll_interval=INDEX_POLL_INTERVAL):
+    """
+    Wait until every index is ONLINE.
+
+    Raises:
+        RuntimeError: An index FAILED to populate
+        TimeoutError: Indexes still populating after `timeout` seconds
+
+    Returns:
+        Number of online indexes
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        rows = session.run(
+            "SHOW INDEXES YIELD name, state, populationPercent, failureMessage"
+        ).data()
+        failed = [row for row in rows if row["state"] == "FAILED"]
+        if failed:
+            raise RuntimeError("Index population failed: " + "; ".join(
+                f"{row['name']}: {row['failureMessage']}" for row in failed
+            ))
+        pending = [row for row in rows if row["state"] != "ONLINE"]
+        if not pending:
+            LOGGER.info("All %d indexes online", len(rows))
+            return len(rows)
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Indexes not online after {timeout}s: " + ", ".join(
+                row["name"] for row in pending
+            ))
+        LOGGER.info("Waiting for indexes: %s", ", ".join(
+            f"{row['name']} {row['populationPercent'] or 0:.0f}%" for row in pending
+        ))
+        time.sleep(poll_interval)
@@ -0,0 +1,31 @@
+"""
+Full-Text Search Indexes
+------------------------
+Lucene full-text indexes over the free-text visit and review properties, so
+the chatbots can search them with `db.index.fulltext.queryNodes` (ranked,
+word-prefix and fuzzy matching) instead of a CONTAINS filter that reads
+every Visit or Review node.
+
+Index names are shared with the query side (text_search.py). Used by both
+the bulk ETL and load_data.py.
+"""
+
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+# index name -> (label, properties)
+FULLTEXT_INDEXES = {
+    "visit_text": ("Visit", ["diagnosis", "chief_complaint", "treatment_description"]),
+    "review_text": ("Review", ["text"]),
+}
+
+
+def create_fulltext_indexes(session):
+    """Create any missing full-text index (they populate in the background)"""
+    for name, (label, properties) in FULLTEXT_INDEXES.items():
+        fields = ", ".join(f"n.{prop}" for prop in properties)
+        session.run(
+            f"CREATE FULLTEXT INDEX {name} IF NOT EXISTS FOR (n:{label}) ON EACH [{fields}]"
+        ).consume()
+        LOGGER.info("Full-text index %s on :%s(%s)", name, label, ", ".join(properties))
@@ -0,0 +1,341 @@
+"""
+Intent Router
+-------------
+Compiles a declarative intent table into a single-pass keyword matcher.
+
+The question is tokenized once and every token position is looked up in a
+phrase dictionary (a token-level Aho-Corasick: the automaton never needs to
+backtrack because phrases are bounded by word boundaries). The cost of routing
+a question therefore depends on the length of the question, not on the number
+of intents in the table.
+"""
+
+import re
+
+# Words are runs of letters/digits, so "ca" never matches inside "cardiology"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class Intent:
+    """
+    One row of the intent table.
+
+    Args:
+        name: Intent identifier (e.g. "hospital_stats")
+        keywords: Sequence of keyword groups. Every group must match for the
+            intent to win; any phrase inside a group is enough to match it.
+        cypher: Cypher template executed when the intent wins
+        slots: Slot names that must be extracted for the intent to win
+        paged: The Cypher ends in SKIP $skip LIMIT $limit, so each page of
+            the answer is its own query (see response_format.ResponsePager)
+    """
+
+    def __init__(self, name, keywords, cypher, slots=(), paged=False):
+        self.name = name
+        self.keywords = [tuple(group) for group in keywords]
+        self.cypher = cypher
+        self.slots = tuple(slots)
+        self.paged = paged
+
+    def __repr__(self):
+        return f"Intent({self.name!r})"
+
+
+class IntentRouter:
+    """
+    Route a question to the first intent (in table order) whose keyword
+    groups and required slots are all satisfied.
+
+    Args:
+        intents: Intent table, highest priority first
+        default: Intent returned when nothing matches
+        slot_phrases: Mapping of phrase -> (slot name, slot value)
+        slot_extractor: Optional callable taking the question tokens and
+            returning extra slots (e.g. NameIndex.find_in_tokens)
+    """
+
+    def __init__(self, intents, default, slot_phrases=None, slot_extractor=None):
+        self.intents = list(intents)
+        self.default = default
+        self.slot_extractor = slot_extractor
+        self._phrases = {}
+        self._postings = {}
+        self._max_phrase_len = 1
+
+        for priority, intent in enumerate(self.intents):
+            for group in intent.keywords:
+                for phrase in group:
+                    key = self._add_phrase(phrase, ("keyword", phrase))
+                    self._postings.setdefault(key, set()).add(priority)
+
+        for phrase, (slot, value) in (slot_phrases or {}).items():
+            self._add_phrase(phrase, ("slot", slot, value))
+
+    def _add_phrase(self, phrase, entry):
+        """Register a phrase in the lookup table and return its normalized key"""
+        tokens = TOKEN_PATTERN.findall(phrase.lower())
+        key = " ".join(tokens)
+        self._phrases.setdefault(key, []).append(entry)
+        self._max_phrase_len = max(self._max_phrase_len, len(tokens))
+        return key
+
+    def _scan(self, tokens):
+        """Single pass over the tokens collecting matched keywords and slots"""
+        matched = set()
+        slots = {}
+        candidates = set()
+        for start in range(len(tokens)):
+            phrase = None
+            for end in range(start, min(start + self._max_phrase_len, len(tokens))):
+                phrase = tokens[end] if phrase is None else f"{phrase} {tokens[end]}"
+                entries = self._phrases.get(phrase)
+                if entries is None:
+                    continue
+                for entry in entries:
+                    if entry[0] == "keyword":
+                        matched.add(entry[1])
+                    else:
+                        slots.setdefault(entry[1], entry[2])
+                candidates |= self._postings.get(phrase, set())
+        return matched, slots, candidates
+
+    def route(self, question):
+        """
+        Find the winning intent for a question.
+
+        Returns:
+            (intent, slots) tuple; slots maps slot names to extracted values
+        """
+        tokens = TOKEN_PATTERN.findall(question.lower())
+        matched, slots, candidates = self._scan(tokens)
+        if self.slot_extractor is not None:
+            slots.update(self.slot_extractor(tokens))
+        for priority in sorted(candidates):
+            intent = self.intents[priority]
+            if all(matched.intersection(group) for group in intent.keywords) and all(
+                slot in slots for slot in intent.slots
+            ):
+                return intent, slots
+        return self.default, slots
+
+
+# ============================================================================
+# HOSPITAL INTENT TABLE - ORDER MATTERS (first match wins)
+# ============================================================================
+# Tombstoned nodes (`deleted` set by incremental loads) keep their label, so
+# every query skips them
+HOSPITAL_INTENTS = [
+    # Statistics query - must come before generic hospital
+    Intent(
+        "hospital_stats",
+        [("statistics", "stats", "count", "counts")],
+        # visit_count is materialized by the loaders (aggregates.py)
+        """
+            MATCH (h:Hospital)
+            WHERE h.deleted IS NULL
+            RETURN h.name AS Hospital,
+                   coalesce(h.visit_count, 0) AS Total_Visits
+            ORDER BY Total_Visits DESC
+            SKIP $skip LIMIT $limit
+        """,
+        paged=True,
+    ),
+    # Billing totals per insurance payer (materialized)
+    Intent(
+        "payer_billing",
+        [("payer", "payers", "insurance", "insurer", "insurers"),
+         ("billing", "billed", "bill", "bills", "revenue")],
+        """
+            MATCH (p:Payer)
+            WHERE p.deleted IS NULL
+            RETURN p.name AS Payer,
+                   coalesce(p.visit_count, 0) AS Visits,
+                   coalesce(p.total_billing, 0.0) AS Total_Billing
+            ORDER BY Total_Billing DESC
+            SKIP $skip LIMIT $limit
+        """,
+        paged=True,
+    ),
+    # Physicians with the most distinct patients (materialized)
+    Intent(
+        "busiest_physicians",
+        [("physician", "physicians", "doctor", "doctors"), ("busiest", "workload", "caseload")],
+        """
+            MATCH (p:Physician)
+            WHERE p.deleted IS NULL
+            RETURN p.name AS Physician,
+                   coalesce(p.patient_count, 0) AS Patients,
+                   coalesce(p.visit_count, 0) AS Visits
+            ORDER BY Patients DESC, Visits DESC
+            LIMIT 10
+        """,
+    ),
+    # California/state-specific hospitals
+    Intent(
+        "hospitals_by_state",
+        [("california", "ca")],
+        """
+            MATCH (h:Hospital)
+            WHERE h.state_name = $state AND h.deleted IS NULL
+            RETURN h.name AS Hospital, h.state_name AS State
+            ORDER BY h.name
+            SKIP $skip LIMIT $limit
+        """,
+        slots=("state",),
+        paged=True,
+    ),
+    # Patients treated by specific physician
+    Intent(
+        "patients_by_physician",
+        [("patient", "patients", "treated")],
+        """
+            MATCH (physician:Physician)
+            WHERE physician.id IN $physician_ids AND physician.deleted IS NULL
+            MATCH (patient:Patient)-[:HAS]->(visit:Visit)<-[:TREATS]-(physician)
+            WHERE patient.deleted IS NULL
+            RETURN DISTINCT patient.name AS Patient,
+                   physician.name AS Physician,
+                   COUNT(visit) AS Visits
+            ORDER BY Visits DESC
+            SKIP $skip LIMIT $limit
+        """,
+        slots=("physician_ids",),
+        paged=True,
+    ),
+    # Patient medical history
+    Intent(
+        "patient_history",
+        [("history",)],
+        """
+            MATCH (patient:Patient)
+            WHERE patient.id IN $patient_ids AND patient.deleted IS NULL
+            MATCH (patient)-[:HAS]->(visit:Visit)
+            MATCH (visit)-[:AT]->(hospital:Hospital)
+            MATCH (visit)<-[:TREATS]-(physician:Physician)
+            RETURN patient.name AS Patient,
+                   toString(visit.admission_date) AS Date,
+                   hospital.name AS Hospital,
+                   physician.name AS Physician,
+                   visit.diagnosis AS Diagnosis
+            ORDER BY visit.admission_date DESC
+            SKIP $skip LIMIT $limit
+        """,
+        slots=("patient_ids",),
+        paged=True,
+    ),
+    # List physicians with salaries
+    Intent(
+        "physician_salaries",
+        [("physician", "physicians", "doctor", "doctors"), ("salary", "salaries")],
+        """
+            MATCH (p:Physician)
+            WHERE p.deleted IS NULL
+            RETURN p.name AS Physician, p.school AS School, p.salary AS Salary
+            ORDER BY p.salary DESC
+            SKIP $skip LIMIT $limit
+        """,
+        paged=True,
+    ),
+    # Highest paid physicians
+    Intent(
+        "highest_paid_physicians",
+        [("highest",), ("paid", "salary", "salaries")],
+        """
+            MATCH (p:Physician)
+            WHERE p.salary IS NOT NULL AND p.deleted IS NULL
+            RETURN p.name AS Physician, p.salary AS Salary
+            ORDER BY p.salary DESC
+            LIMIT 5
+        """,
+    ),
+    # Generic diagnosis query
+    Intent(
+        "common_diagnoses",
+        [("diagnosis", "diagnoses", "disease", "diseases", "condition", "conditions")],
+        # One DiagnosisStat node per distinct diagnosis, kept by the loaders
+        """
+            MATCH (d:DiagnosisStat)
+            RETURN d.name AS Diagnosis, d.visit_count AS Count
+            ORDER BY Count DESC
+            LIMIT 10
+        """,
+    ),
+    # Patient reviews
+    # (replaced by REVIEW_SEARCH_INTENT when a review index is available)
+    Intent(
+        "reviews",
+        [("review", "reviews", "complaint", "complaints", "complain", "complained", "feedback")],
+        """
+            MATCH (visit:Visit)-[:WRITES]->(review:Review)
+            WHERE review.deleted IS NULL
+            MATCH (visit)-[:AT]->(hospital:Hospital)
+            RETURN hospital.name AS Hospital,
+                   review.text AS Review,
+                   review.patient_name AS Patient
+            SKIP $skip LIMIT $limit
+        """,
+        paged=True,
+    ),
+    # List all hospitals
+    Intent(
+        "all_hospitals",
+        [("hospital", "hospitals"), ("all", "show", "list")],
+        """
+            MATCH (h:Hospital)
+            WHERE h.deleted IS NULL
+            RETURN h.name AS Hospital, h.state_name AS State
+            ORDER BY h.name
+            SKIP $skip LIMIT $limit
+        """,
+        paged=True,
+    ),
+]
+
+# Default fallback: show database summary
+DEFAULT_INTENT = Intent(
+    "summary",
+    [],
+    """
+        MATCH (h:Hospital)
+        WHERE h.deleted IS NULL
+        RETURN h.name AS Hospital, h.state_name AS State
+        LIMIT 5
+    """,
+)
+
+# Reviews ranked by semantic search (review_search.py): $review_ids is
+# already in rank order, the query only fetches what the answer shows
+REVIEW_SEARCH_INTENT = Intent(
+    "review_search",
+    [],
+    """
+        UNWIND range(0, size($review_ids) - 1) AS rank
+        MATCH (review:Review {id: $review_ids[rank]})
+        WHERE review.deleted IS NULL
+        OPTIONAL MATCH (visit:Visit)-[:WRITES]->(review)
+        OPTIONAL MATCH (visit)-[:AT]->(hospital:Hospital)
+        RETURN hospital.name AS Hospital,
+               review.text AS Review,
+               review.patient_name AS Patient
+        ORDER BY rank
+        SKIP $skip LIMIT $limit
+    """,
+    slots=("review_ids",),
+    paged=True,
+)
+
+# Fixed slot values; people and places are resolved by the name index
+HOSPITAL_SLOT_PHRASES = {
+    "california": ("state", "CA"),
+    "ca": ("state", "CA"),
+}
+
+
+def build_hospital_router(name_index=None):
+    """Compile the hospital intent table (done once at startup)"""
+    return IntentRouter(
+        HOSPITAL_INTENTS,
+        DEFAULT_INTENT,
+        HOSPITAL_SLOT_PHRASES,
+        slot_extractor=name_index.find_in_tokens if name_index is not None else None,
+    )
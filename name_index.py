@@ -0,0 +1,227 @@
+"""
+Entity Name Index
+-----------------
+In-memory index of Patient, Physician, Hospital and Payer names.
+
+Names are kept in a sorted array of normalized keys (lowercase tokens with
+titles such as "Dr." removed) plus an exact-match dictionary. This gives:
+- exact lookup of every name mentioned in a question (one dict probe per
+  token window)
+- prefix lookup via binary search (autocomplete, partial names)
+- fuzzy lookup restricted to names sharing a rare token, so typos stay cheap
+
+The index is loaded once from the graph. A refresh first reads the ETL's
+graph version (GraphMeta): when it is unchanged there is nothing to fetch,
+when it changed the index is reloaded in full, so renamed nodes get their
+new name and deleted ones drop out. Graphs without a version fall back to
+fetching only nodes with an id above the highest id seen so far.
+"""
+
+import bisect
+import difflib
+import time
+
+from intent_router import TOKEN_PATTERN
+from neo4j_pool import read_session
+from query_cache import GRAPH_VERSION_QUERY
+
+# Labels indexed, mapped to the slot name the intent table expects
+INDEXED_LABELS = {
+    "Patient": "patient_ids",
+    "Physician": "physician_ids",
+    "Hospital": "hospital_ids",
+    "Payer": "payer_ids",
+}
+
+# Honorifics ignored when matching ("Dr. Sarah Johnson" == "sarah johnson")
+TITLES = {"dr", "mr", "mrs", "ms", "miss", "prof"}
+
+# One index-backed lookup per label; $max_ids[label] is null on a full load.
+# Tombstoned nodes (deleted set by incremental loads) are not resolvable.
+LOAD_QUERY = "\nUNION ALL\n".join(
+    f"""
+    MATCH (n:{label})
+    WHERE ($max_ids.{label} IS NULL OR n.id > $max_ids.{label})
+      AND n.deleted IS NULL
+    RETURN '{label}' AS label, n.id AS id, n.name AS name
+    """
+    for label in INDEXED_LABELS
+)
+
+
+def normalize_name(name):
+    """Lowercase, tokenize and strip leading titles from a name"""
+    tokens = TOKEN_PATTERN.findall(str(name).lower())
+    while tokens and tokens[0] in TITLES:
+        tokens = tokens[1:]
+    return " ".join(tokens)
+
+
+class NameIndex:
+    """
+    Sorted-array name index with exact, prefix and fuzzy lookup.
+
+    Args:
+        refresh_interval: Seconds between incremental refreshes
+        fuzzy_cutoff: Minimum similarity ratio for fuzzy matches (0-1)
+        fuzzy_max_candidates: Tokens shared by more names than this are too
+            common to drive a fuzzy lookup (e.g. "john")
+    """
+
+    def __init__(self, refresh_interval=60.0, fuzzy_cutoff=0.85, fuzzy_max_candidates=50):
+        self.refresh_interval = refresh_interval
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.fuzzy_max_candidates = fuzzy_max_candidates
+        self._reset()
+        self._version = None
+        self._last_refresh = 0.0
+
+    def _reset(self):
+        self._exact = {}
+        self._keys = []
+        self._entries = []
+        self._max_ids = {}
+        self._max_tokens = 1
+        self._token_postings = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, label, node_id, name):
+        """Insert a single name into the index"""
+        key = self._register(label, node_id, name)
+        if key is not None:
+            position = bisect.bisect_right(self._keys, key)
+            self._keys.insert(position, key)
+            self._entries.insert(position, (label, node_id, name))
+
+    def add_many(self, rows):
+        """Insert (label, id, name) rows, re-sorting the array once at the end"""
+        pairs = list(zip(self._keys, self._entries))
+        for label, node_id, name in rows:
+            key = self._register(label, node_id, name)
+            if key is not None:
+                pairs.append((key, (label, node_id, name)))
+        pairs.sort(key=lambda pair: pair[0])
+        self._keys = [key for key, _ in pairs]
+        self._entries = [entry for _, entry in pairs]
+
+    def _register(self, label, node_id, name):
+        """Update the exact, token and max-id tables; return the sort key"""
+        key = normalize_name(name)
+        if not key:
+            return None
+        entry = (label, node_id, name)
+        self._exact.setdefault(key, []).append(entry)
+        self._max_tokens = max(self._max_tokens, key.count(" ") + 1)
+        for token in set(key.split()):
+            self._token_postings.setdefault(token, []).append(entry)
+        if node_id is not None and (
+            label not in self._max_ids or node_id > self._max_ids[label]
+        ):
+            self._max_ids[label] = node_id
+        return key
+
+    def load(self, driver):
+        """
+        Fetch every name on the first call. Later calls fetch nothing while
+        the graph version is unchanged, everything when it changed, and only
+        new nodes when the graph has no version.
+        """
+        with read_session(driver) as session:
+            record = session.run(GRAPH_VERSION_QUERY).single()
+            version = record["version"] if record else None
+            full = version != self._version or not self._keys
+            if full or version is None:
+                max_ids = {} if full else self._max_ids
+                result = session.run(
+                    LOAD_QUERY,
+                    max_ids={label: max_ids.get(label) for label in INDEXED_LABELS},
+                )
+                rows = [(record["label"], record["id"], record["name"]) for record in result]
+                if full:
+                    self._reset()
+                self.add_many(rows)
+        self._version = version
+        self._last_refresh = time.monotonic()
+
+    def refresh_if_stale(self, driver):
+        """Pick up graph changes once the refresh interval elapsed"""
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.load(driver)
+
+    def prefix(self, text, label=None, limit=10):
+        """Return up to `limit` (label, id, name) entries whose name starts with text"""
+        key = normalize_name(text)
+        matches = []
+        position = bisect.bisect_left(self._keys, key)
+        while position < len(self._keys) and self._keys[position].startswith(key):
+            entry = self._entries[position]
+            if label is None or entry[0] == label:
+                matches.append(entry)
+                if len(matches) >= limit:
+                    break
+            position += 1
+        return matches
+
+    def _fuzzy_candidates(self, key):
+        """Names sharing at least one rare token with key"""
+        candidates = {}
+        for token in key.split():
+            postings = self._token_postings.get(token, ())
+            if len(postings) <= self.fuzzy_max_candidates:
+                for entry in postings:
+                    candidates[entry] = None
+        return list(candidates)
+
+    def fuzzy(self, text, label=None):
+        """Closest entries to text among names sharing one of its rare tokens"""
+        key = normalize_name(text)
+        best, best_ratio = [], self.fuzzy_cutoff
+        for entry in self._fuzzy_candidates(key):
+            if label is not None and entry[0] != label:
+                continue
+            ratio = difflib.SequenceMatcher(None, key, normalize_name(entry[2])).ratio()
+            if ratio > best_ratio:
+                best, best_ratio = [entry], ratio
+            elif ratio == best_ratio:
+                best.append(entry)
+        return best
+
+    def find_in_tokens(self, tokens):
+        """
+        Find every indexed name mentioned in a tokenized question.
+
+        Longest exact matches win; two-token windows that match nothing
+        exactly but contain a known name token (e.g. "john smiht") fall back
+        to fuzzy lookup.
+
+        Returns:
+            Dict of slot name (e.g. "physician_ids") -> list of node ids
+        """
+        slots = {}
+        start = 0
+        while start < len(tokens):
+            matched = None
+            window = 1
+            for window in range(min(self._max_tokens, len(tokens) - start), 0, -1):
+                matched = self._exact.get(" ".join(tokens[start:start + window]))
+                if matched:
+                    break
+            if (
+                not matched
+                and start + 1 < len(tokens)
+                and tokens[start] not in TITLES
+                and any(token in self._token_postings for token in tokens[start:start + 2])
+            ):
+                window = 2
+                matched = self.fuzzy(" ".join(tokens[start:start + 2]))
+            if matched:
+                for label, node_id, _ in matched:
+                    ids = slots.setdefault(INDEXED_LABELS[label], [])
+                    if node_id not in ids:
+                        ids.append(node_id)
+                start += window
+            else:
+                start += 1
+        return slots
@@ -0,0 +1,170 @@
+"""
+Neo4j Connection Pool Helpers
+-----------------------------
+Explicit connection pool configuration and pool gauges for the chatbot apps.
+
+Pool settings come from environment variables:
+- NEO4J_MAX_POOL_SIZE                  max connections per server (default 100)
+- NEO4J_CONNECTION_ACQUISITION_TIMEOUT seconds to wait for a free connection (default 60)
+- NEO4J_LIVENESS_CHECK_TIMEOUT         idle seconds before a connection is
+                                       health-checked on borrow (default: never)
+- NEO4J_MAX_CONNECTION_LIFETIME        seconds before a connection is recycled (default 3600)
+
+Reads go through read-routed sessions: materialized results use managed
+`execute_read` transactions (retried on transient errors), streamed results
+use a READ_ACCESS session. Gauges report sessions in use and the time spent
+waiting to acquire a connection, both counted by read_session itself. Open
+and idle connections are best-effort: the driver has no public pool API,
+so they are read from its private pool and reported as None
+("unavailable") whenever that does not look as expected.
+
+Every read records the server's timings (and db hits under TRACE_PROFILE)
+on the current tracing span.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from neo4j import READ_ACCESS, GraphDatabase
+
+from tracing import TRACE_PROFILE, annotate
+
+
+def _env_number(name, default, cast=float):
+    value = os.getenv(name)
+    return default if value in (None, "") else cast(value)
+
+
+def pool_config_from_env():
+    """Driver keyword arguments for the connection pool"""
+    config = {
+        "max_connection_pool_size": _env_number("NEO4J_MAX_POOL_SIZE", 100, int),
+        "connection_acquisition_timeout": _env_number("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", 60.0),
+        "max_connection_lifetime": _env_number("NEO4J_MAX_CONNECTION_LIFETIME", 3600.0),
+    }
+    liveness_check_timeout = _env_number("NEO4J_LIVENESS_CHECK_TIMEOUT", None)
+    if liveness_check_timeout is not None:
+        config["liveness_check_timeout"] = liveness_check_timeout
+    return config
+
+
+def create_driver(uri, user, password):
+    """Create a driver with the pool configured from the environment"""
+    return GraphDatabase.driver(uri, auth=(user, password), **pool_config_from_env())
+
+
+class PoolGauges:
+    """Thread-safe in-use / wait-time gauges for one driver"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.max_size = pool_config_from_env()["max_connection_pool_size"]
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.acquisitions = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, wait):
+        """Record how long a caller waited for a connection"""
+        with self._lock:
+            self.acquisitions += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    @contextmanager
+    def track(self):
+        """Count a session as in use while the block runs"""
+        with self._lock:
+            self.in_use += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_use -= 1
+
+    def _pool_counts(self):
+        """
+        Best-effort (open, idle) connections from the driver's private pool;
+        (None, None) unless it has the layout of the neo4j 5.x driver
+        """
+        pool = getattr(self.driver, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if not isinstance(connections, dict):
+            return None, None
+        try:
+            open_connections = [
+                connection for queue in list(connections.values()) for connection in list(queue)
+            ]
+            idle = sum(1 for connection in open_connections if not connection.in_use)
+        except (AttributeError, TypeError, RuntimeError):  # other layout, or changed while counting
+            return None, None
+        return len(open_connections), idle
+
+    def snapshot(self):
+        """Current gauge values"""
+        open_connections, idle = self._pool_counts()
+        with self._lock:
+            return {
+                "in_use": self.in_use,
+                "idle": idle,
+                "open": open_connections,
+                "max_size": self.max_size,
+                "acquisitions": self.acquisitions,
+                "avg_wait_ms": 1000 * self.total_wait / self.acquisitions if self.acquisitions else 0.0,
+                "max_wait_ms": 1000 * self.max_wait,
+            }
+
+
+@contextmanager
+def read_session(driver, gauges=None, **session_config):
+    """Open a read-routed session, counted by the gauges while open"""
+    if gauges is None:
+        with driver.session(default_access_mode=READ_ACCESS, **session_config) as session:
+            yield session
+        return
+    with gauges.track():
+        with driver.session(default_access_mode=READ_ACCESS, **session_config) as session:
+            yield session
+
+
+def traced_cypher(cypher):
+    """The query as sent to the server (under PROFILE when TRACE_PROFILE is on)"""
+    return f"PROFILE {cypher}" if TRACE_PROFILE else cypher
+
+
+def _db_hits(plan):
+    return plan.get("dbHits", 0) + sum(_db_hits(child) for child in plan.get("children", ()))
+
+
+def record_summary(summary, rows):
+    """Annotate the current span with a result summary's timings and rows"""
+    attributes = {
+        "rows": rows,
+        "server_available_ms": summary.result_available_after,
+        "server_consumed_ms": summary.result_consumed_after,
+    }
+    if summary.profile:
+        attributes["db_hits"] = _db_hits(summary.profile)
+    annotate(**attributes)
+
+
+def run_read(driver, cypher, params=None, gauges=None):
+    """Run a read query in a managed transaction and return a list of dicts"""
+    requested_at = time.perf_counter()
+    attempts = []
+
+    def work(tx):
+        # First call happens once a connection has been acquired
+        if not attempts and gauges is not None:
+            gauges.record_wait(time.perf_counter() - requested_at)
+        attempts.append(None)
+        result = tx.run(traced_cypher(cypher), params or {})
+        rows = [dict(record) for record in result]
+        record_summary(result.consume(), len(rows))
+        return rows
+
+    with read_session(driver, gauges) as session:
+        return session.execute_read(work)
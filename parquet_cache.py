@@ -0,0 +1,450 @@
+"""
+Parquet Cache
+-------------
+Typed, compressed Parquet copies of the hospital CSV files.
+
+Each CSV in the data folder is converted once into Parquet under
+`<data_dir>/.parquet/` (or PARQUET_CACHE_DIR) using the column types declared
+in column_types.py (integers, floats and real dates; text and enums stay
+strings). Visits are partitioned by admission month, one directory per month:
+
+    .parquet/
+    ├── manifest.json
+    ├── hospitals.parquet
+    ├── hospitals.invalid.parquet
+    ├── ...
+    └── visits/
+        ├── month=2023-01/part-00000.parquet
+        ├── month=2023-02/part-00000.parquet
+        └── month=unknown/part-00000.parquet
+
+Rows with a value that fails its column type (a date like 2021-13-45, a
+billing_amount of "n/a") are kept out of the typed files and stored as raw
+strings in <name>.invalid.parquet, so load_data.py can still reject them
+with the reason. Every row carries its CSV row number in ROW_COLUMN.
+
+manifest.json records the size, mtime and SHA-256 of every source CSV at
+conversion time. A cached file is reused while size and mtime match; when
+only the mtime changed (e.g. the file was copied or touched) the SHA-256
+decides, so unchanged content is never converted twice. A changed column
+type also forces a rebuild.
+
+Readers get the data without CSV parsing or type inference:
+
+    cache = ParquetCache("data")
+    visits = cache.scan("visits")           # LazyFrame over all partitions
+    payers = cache.read("payers")           # memory-mapped DataFrame
+
+Run as a script to convert (or refresh) every file:
+    python parquet_cache.py [--force]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import polars as pl
+
+# The column types live with the ETL service (see load_data.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "hospital_neo4j_etl", "src"))
+
+from column_types import COLUMN_TYPES, ROW_COLUMN, Date, Float, Integer  # noqa: E402
+
+# ============================================================================
+# CONFIGURATION: Column types of the CSV data files and cache settings
+# ============================================================================
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+# Defaults to <data_dir>/.parquet so every data folder gets its own cache
+PARQUET_CACHE_DIR = os.getenv("PARQUET_CACHE_DIR")
+
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", 250_000))
+
+# CSV rows parsed per batch while partitioning, and how many rows may be
+# buffered across all partitions before they are flushed to part files
+CSV_BATCH_ROWS = 250_000
+PARTITION_BUFFER_ROWS = 2_000_000
+
+# Per-column Parquet types, from the declared CSV column types. Integer,
+# float and date columns are typed; text and enum columns stay strings.
+_POLARS_TYPES = {Integer: pl.Int64, Float: pl.Float64, Date: pl.Date}
+
+COLUMN_DTYPES = {
+    name: {column: _POLARS_TYPES.get(type(column_type), pl.Utf8) for column, column_type in columns.items()}
+    for name, columns in COLUMN_TYPES.items()
+}
+
+# Types for reading the CSVs directly: dates are read as strings and parsed
+# to pl.Date afterwards (see DATE_COLUMNS)
+SCHEMAS = {
+    name: {column: pl.Utf8 if dtype == pl.Date else dtype for column, dtype in columns.items()}
+    for name, columns in COLUMN_DTYPES.items()
+}
+
+# Columns parsed from ISO strings into pl.Date
+DATE_COLUMNS = {
+    name: [column for column, dtype in columns.items() if dtype == pl.Date]
+    for name, columns in COLUMN_DTYPES.items()
+    if pl.Date in columns.values()
+}
+
+# Tables written as one directory per month of this date column
+PARTITION_COLUMNS = {
+    "visits": "date_of_admission",
+}
+
+# Partition for rows whose partition date is missing or unparsable
+UNKNOWN_PARTITION = "unknown"
+
+MANIFEST_FILE = "manifest.json"
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+def file_sha256(path, chunk_size=1 << 20):
+    """Hex SHA-256 of a file, read in 1 MiB chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def schema_fingerprint(name):
+    """Changes whenever the types used to convert `name` change"""
+    spec = {
+        "schema": {column: str(dtype) for column, dtype in COLUMN_DTYPES[name].items()},
+        "partition": PARTITION_COLUMNS.get(name),
+        "row_column": ROW_COLUMN,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _csv_columns(path):
+    with open(path, newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def _split(frame, name, first_row=1):
+    """
+    Type the string columns of `frame` per COLUMN_DTYPES, numbering rows
+    from `first_row` in ROW_COLUMN.
+
+    Returns:
+        (typed rows, raw rows holding a value that fails its column type)
+    """
+    frame = frame.with_row_count(ROW_COLUMN, offset=first_row)
+    typed, failed = [], []
+    for column, dtype in COLUMN_DTYPES[name].items():
+        if dtype == pl.Utf8 or column not in frame.columns:
+            continue
+        raw = pl.col(column)
+        value = raw.str.to_date("%Y-%m-%d", strict=False) if dtype == pl.Date else raw.cast(dtype, strict=False)
+        typed.append(value)
+        failed.append(raw.is_not_null() & value.is_null())
+    if not typed:
+        return frame, frame.clear()
+    frame = frame.with_columns(pl.any_horizontal(failed).alias("__invalid"))
+    return (
+        frame.filter(~pl.col("__invalid")).drop("__invalid").with_columns(typed),
+        frame.filter(pl.col("__invalid")).drop("__invalid"),
+    )
+
+
+def _replace_path(staging, target):
+    """Move a freshly written file or directory over the previous version"""
+    if os.path.isdir(target):
+        retired = f"{target}.old-{os.getpid()}"
+        os.replace(target, retired)
+        os.replace(staging, target)
+        shutil.rmtree(retired, ignore_errors=True)
+    else:
+        os.replace(staging, target)
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+class ParquetCache:
+    """
+    Parquet copies of the CSV files in one data folder.
+
+    Args:
+        data_dir: Folder holding hospitals.csv, visits.csv, ... (default DATA_DIR)
+        cache_dir: Output folder (default PARQUET_CACHE_DIR or <data_dir>/.parquet)
+    """
+
+    def __init__(self, data_dir=None, cache_dir=None):
+        self.data_dir = data_dir or DATA_DIR
+        self.cache_dir = cache_dir or PARQUET_CACHE_DIR or os.path.join(self.data_dir, ".parquet")
+        self._manifest_path = os.path.join(self.cache_dir, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self._entries = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        staging = f"{self._manifest_path}.tmp-{os.getpid()}"
+        with open(staging, "w") as f:
+            json.dump(self._entries, f, indent=1, sort_keys=True)
+        os.replace(staging, self._manifest_path)
+
+    def entry(self, name):
+        """Manifest entry (size, mtime_ns, sha256, schema, rows, converted_at) or None"""
+        return self._entries.get(name)
+
+    def source_path(self, name):
+        return os.path.join(self.data_dir, f"{name}.csv")
+
+    def output_path(self, name):
+        """Parquet file, or partition directory for partitioned tables"""
+        if name in PARTITION_COLUMNS:
+            return os.path.join(self.cache_dir, name)
+        return os.path.join(self.cache_dir, f"{name}.parquet")
+
+    def invalid_path(self, name):
+        """Raw (string) rows of `name` whose values fail their column type"""
+        return os.path.join(self.cache_dir, f"{name}.invalid.parquet")
+
+    # ------------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------------
+    def is_fresh(self, name):
+        """
+        True when the cached Parquet still matches the source CSV.
+
+        Size and mtime are compared first; if only the mtime moved, the
+        SHA-256 of the source decides and the manifest adopts the new mtime.
+        """
+        entry = self._entries.get(name)
+        source = self.source_path(name)
+        if entry is None or not all(map(os.path.exists, [self.output_path(name), self.invalid_path(name)])):
+            return False
+        if entry.get("schema") != schema_fingerprint(name):
+            return False
+        stat = os.stat(source)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        if file_sha256(source) != entry["sha256"]:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        self._save_manifest()
+        return True
+
+    def refresh(self, name, force=False):
+        """
+        Convert `name` if its cache is missing or stale.
+
+        Returns:
+            True if the file was (re)converted
+        """
+        with self._lock:
+            if not force and self.is_fresh(name):
+                return False
+            source = self.source_path(name)
+            stat = os.stat(source)
+            sha256 = file_sha256(source)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if name in PARTITION_COLUMNS:
+                rows, invalid = self._convert_partitioned(name, source)
+            else:
+                rows, invalid = self._convert(name, source)
+            self._entries[name] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": sha256,
+                "schema": schema_fingerprint(name),
+                "rows": rows,
+                "invalid": invalid,
+                "converted_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            self._save_manifest()
+            return True
+
+    def refresh_all(self, force=False):
+        """Refresh every CSV present in the data folder; returns the converted names"""
+        return [
+            name for name in SCHEMAS
+            if os.path.exists(self.source_path(name)) and self.refresh(name, force)
+        ]
+
+    # ------------------------------------------------------------------------
+    # Conversion
+    # ------------------------------------------------------------------------
+    def _dtypes(self, source):
+        # Every column as a string so one bad value can't fail the whole read
+        # (_split() types them). In file order: read_csv_batched (0.19)
+        # applies a dtypes dict by position.
+        return {column: pl.Utf8 for column in _csv_columns(source)}
+
+    def _write_invalid(self, name, frame):
+        path = self.invalid_path(name)
+        staging = f"{path}.tmp-{os.getpid()}"
+        frame.write_parquet(staging, compression=PARQUET_COMPRESSION)
+        os.replace(staging, path)
+        return frame.height
+
+    def _convert(self, name, source):
+        """
+        Single file, written by the streaming engine (constant memory); the
+        rows failing their column types are collected in a second pass.
+        """
+        target = self.output_path(name)
+        staging = f"{target}.tmp-{os.getpid()}"
+        frame, invalid = _split(pl.scan_csv(source, dtypes=self._dtypes(source)), name)
+        try:
+            frame.sink_parquet(
+                staging,
+                compression=PARQUET_COMPRESSION,
+                row_group_size=PARQUET_ROW_GROUP_SIZE,
+                statistics=True,
+            )
+        except BaseException:
+            if os.path.exists(staging):
+                os.remove(staging)
+            raise
+        _replace_path(staging, target)
+        rows = pl.scan_parquet(target).select(pl.count()).collect().item()
+        return rows, self._write_invalid(name, invalid.collect(streaming=True))
+
+    def _convert_partitioned(self, name, source):
+        """
+        One pass over the CSV in batches; rows are buffered per month and
+        flushed to numbered part files whenever PARTITION_BUFFER_ROWS are held.
+        """
+        target = self.output_path(name)
+        staging = f"{target}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        month = (
+            pl.col(PARTITION_COLUMNS[name]).dt.strftime("%Y-%m")
+            .fill_null(UNKNOWN_PARTITION).alias("__month")
+        )
+        buffers, parts, invalid = {}, {}, []
+        buffered = rows = 0
+
+        def flush():
+            for key, frames in buffers.items():
+                directory = os.path.join(staging, f"month={key}")
+                os.makedirs(directory, exist_ok=True)
+                part = parts.get(key, 0)
+                pl.concat(frames).write_parquet(
+                    os.path.join(directory, f"part-{part:05d}.parquet"),
+                    compression=PARQUET_COMPRESSION,
+                    row_group_size=PARQUET_ROW_GROUP_SIZE,
+                    statistics=True,
+                )
+                parts[key] = part + 1
+            buffers.clear()
+
+        try:
+            reader = pl.read_csv_batched(source, dtypes=self._dtypes(source), batch_size=CSV_BATCH_ROWS)
+            while batches := reader.next_batches(1):
+                for batch in batches:
+                    typed, failed = _split(batch, name, first_row=rows + 1)
+                    rows += batch.height
+                    invalid.append(failed)
+                    typed = typed.with_columns(month)
+                    for key, frame in typed.partition_by("__month", as_dict=True).items():
+                        buffers.setdefault(key, []).append(frame.drop("__month"))
+                    buffered += typed.height
+                if buffered >= PARTITION_BUFFER_ROWS:
+                    flush()
+                    buffered = 0
+            flush()
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        _replace_path(staging, target)
+        invalid = pl.concat(invalid) if invalid else pl.DataFrame(schema=self._raw_schema(source))
+        invalid = self._write_invalid(name, invalid)
+        return rows - invalid, invalid
+
+    # ------------------------------------------------------------------------
+    # Readers
+    # ------------------------------------------------------------------------
+    def files(self, name):
+        """Parquet files for `name`, refreshing the cache first"""
+        self.refresh(name)
+        target = self.output_path(name)
+        if name not in PARTITION_COLUMNS:
+            return [target]
+        return sorted(
+            os.path.join(root, filename)
+            for root, _, filenames in os.walk(target)
+            for filename in filenames
+            if filename.endswith(".parquet")
+        )
+
+    def scan(self, name):
+        """
+        LazyFrame over the cached Parquet. Filters on the partition column
+        skip whole month files using the Parquet min/max statistics.
+        """
+        files = self.files(name)
+        if not files:
+            return pl.LazyFrame(schema=self._empty_schema(name))
+        return pl.scan_parquet(files, hive_partitioning=False)
+
+    def read(self, name, columns=None):
+        """Eager, memory-mapped DataFrame (optionally only some columns)"""
+        frames = [pl.read_parquet(path, columns=columns, memory_map=True) for path in self.files(name)]
+        if not frames:
+            return pl.DataFrame(schema=self._empty_schema(name))
+        return frames[0] if len(frames) == 1 else pl.concat(frames, rechunk=False)
+
+    def invalid(self, name):
+        """
+        Rows left out of the typed cache because a value fails its column
+        type, as strings with their CSV row number in ROW_COLUMN (RowCoercer
+        rejects them with the reason)
+        """
+        self.refresh(name)
+        return pl.read_parquet(self.invalid_path(name))
+
+    def _raw_schema(self, source):
+        return {ROW_COLUMN: pl.UInt32, **self._dtypes(source)}
+
+    def _empty_schema(self, name):
+        dtypes = COLUMN_DTYPES[name]
+        return {
+            column: dtypes.get(column, dtype)
+            for column, dtype in self._raw_schema(self.source_path(name)).items()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the hospital CSV files to Parquet")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--force", action="store_true", help="convert even if the cache is fresh")
+    args = parser.parse_args()
+
+    cache = ParquetCache(args.data_dir)
+    for name in SCHEMAS:
+        if not os.path.exists(cache.source_path(name)):
+            continue
+        started = time.perf_counter()
+        converted = cache.refresh(name, args.force)
+        state = "converted" if converted else "fresh"
+        print(f"{name:<12}{state:<11}{cache.entry(name)['rows']:>12,} rows"
+              f"{time.perf_counter() - started:>9.2f}s")
+    print(f"Cache: {cache.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Query Result Cache
+------------------
+LRU cache for Cypher results shared by the chatbot apps.
+
+- Keyed on (cypher, params)
+- Bounded by an approximate byte budget (pickled size of each result)
+- Per-intent TTL, falling back to a default TTL
+- Invalidated as a whole when the graph version counter written by the ETL
+  (`(:GraphMeta {key: 'graph'}).version`) changes
+- Hit/miss/eviction counters for the dashboard
+"""
+
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from neo4j_pool import read_session
+from tracing import annotate
+
+# Written by load_data.py and the ETL at the end of every load
+GRAPH_VERSION_QUERY = """
+    OPTIONAL MATCH (m:GraphMeta {key: 'graph'})
+    RETURN m.version AS version
+"""
+
+BUMP_GRAPH_VERSION_QUERY = """
+    MERGE (m:GraphMeta {key: 'graph'})
+    SET m.version = coalesce(m.version, 0) + 1,
+        m.updated_at = datetime()
+"""
+
+# Seconds a result stays fresh, per intent. Directory-style data changes only
+# with an ETL run (which also bumps the graph version), so it can live longer.
+DEFAULT_INTENT_TTLS = {
+    "all_hospitals": 3600,
+    "hospitals_by_state": 3600,
+    "summary": 3600,
+    "physician_salaries": 3600,
+    "highest_paid_physicians": 3600,
+    "hospital_stats": 300,
+    "common_diagnoses": 300,
+    "reviews": 300,
+    "patients_by_physician": 60,
+    "patient_history": 60,
+    "all_physicians": 3600,
+    "search_by_diagnosis": 300,
+}
+
+# Streamed results are pulled in batches of this many records and only
+# cached when they are small enough to keep in memory
+STREAM_FETCH_SIZE = 200
+MAX_CACHED_ROWS = 1000
+
+
+def _cache_key(cypher, params):
+    """Stable key for a query and its parameters"""
+    return cypher, json.dumps(params or {}, sort_keys=True, default=str)
+
+
+def _estimate_size(value):
+    """Approximate memory footprint of a result in bytes"""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return len(repr(value))
+
+
+class QueryCache:
+    """
+    Thread-safe LRU result cache with a byte budget and TTLs.
+
+    Args:
+        max_bytes: Total size budget for cached results
+        default_ttl: Seconds a result stays fresh when its intent has no TTL
+        intent_ttls: Mapping of intent name -> TTL in seconds
+        version_loader: Callable returning the current graph version
+        version_check_interval: Seconds between graph version checks
+    """
+
+    def __init__(
+        self,
+        max_bytes=64 * 1024 * 1024,
+        default_ttl=300,
+        intent_ttls=None,
+        version_loader=None,
+        version_check_interval=5.0,
+    ):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.intent_ttls = dict(DEFAULT_INTENT_TTLS if intent_ttls is None else intent_ttls)
+        self.version_loader = version_loader
+        self.version_check_interval = version_check_interval
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        """Drop everything if the ETL wrote a new graph version"""
+        if self.version_loader is None:
+            return
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            return
+        self._version_checked_at = now
+        version = self.version_loader()
+        with self._lock:
+            if self._version is not None and version != self._version:
+                self._entries.clear()
+                self._bytes = 0
+                self.invalidations += 1
+            self._version = version
+
+    def get(self, cypher, params=None):
+        """Return (found, value) for a cached query"""
+        self._check_version()
+        key = _cache_key(cypher, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            value, size, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, cypher, params, value, intent=None):
+        """Store a result, evicting least recently used entries over budget"""
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        ttl = self.intent_ttls.get(intent, self.default_ttl)
+        key = _cache_key(cypher, params)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_load(self, cypher, params, loader, intent=None):
+        """Return the cached result or call loader() and cache what it returns"""
+        found, value = self.get(cypher, params)
+        if found:
+            return value
+        value = loader()
+        self.put(cypher, params, value, intent=intent)
+        return value
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+def stream_cached(cache, backend, cypher, params=None, intent=None,
+                  fetch_size=STREAM_FETCH_SIZE, max_cached_rows=MAX_CACHED_ROWS):
+    """
+    Yield rows for a query one at a time.
+
+    Cached results are replayed from memory. Otherwise rows are pulled from
+    the backend (graph_backend) in batches of `fetch_size`, so only one batch
+    is held at a time; results that finish within `max_cached_rows` are
+    cached as well. A query paged with `LIMIT $limit` is complete once
+    `limit` rows arrived, so it is cached right then: readers of a page stop
+    pulling after its last row and would never let the stream finish.
+    """
+    found, rows = cache.get(cypher, params)
+    annotate(cache_hit=found)
+    if found:
+        yield from rows
+        return
+    limit = (params or {}).get("limit")
+    collected = []
+    for row in backend.stream(cypher, params, fetch_size=fetch_size):
+        if collected is not None:
+            collected.append(row)
+            if len(collected) > max_cached_rows:
+                collected = None
+            elif len(collected) == limit:
+                cache.put(cypher, params, collected, intent=intent)
+                collected = None
+        yield row
+    if collected is not None:
+        cache.put(cypher, params, collected, intent=intent)
+
+
+def graph_version_loader(driver):
+    """Build a version_loader that reads the ETL's graph version counter"""
+
+    def load_version():
+        with read_session(driver) as session:
+            record = session.run(GRAPH_VERSION_QUERY).single()
+            return record["version"] if record else None
+
+    return load_version
+
+
+def cache_from_env(version_loader=None):
+    """Create a QueryCache configured from QUERY_CACHE_* environment variables"""
+    return QueryCache(
+        max_bytes=int(os.getenv("QUERY_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+        default_ttl=float(os.getenv("QUERY_CACHE_TTL", 300)),
+        version_loader=version_loader,
+        version_check_interval=float(os.getenv("QUERY_CACHE_VERSION_CHECK_INTERVAL", 5)),
+    )
@@ -0,0 +1,373 @@
+"""
+Query Plans
+-----------
+Plan regression checks for every Cypher query the two apps send: the
+chatbot intents (intent_router.py) and the dashboard queries
+(dashboard_queries.py).
+
+Each query is a PlanCase that states what a good plan looks like:
+- seeks: (label, property, kind) the plan must reach through an index,
+  where kind is "unique" (uniqueness constraint), "range" (CREATE INDEX)
+  or "text" (CREATE TEXT INDEX, which also answers CONTAINS)
+- scans: labels the query is meant to read in full (listing every
+  hospital is a label scan by design)
+
+Plans come from a live Neo4j instance (EXPLAIN, or PROFILE with
+--profile, which also records rows and db hits) or from plan fixtures
+recorded earlier with --record, so the check also runs without a
+database. A plan fails when it contains an AllNodesScan, a NodeByLabelScan
+of a label not listed in `scans`, or no index operator for an expected
+seek. Each failure names the index or constraint that would fix it (and,
+when connected, whether that index already exists but was not used).
+
+Usage:
+    python query_plans.py                    # EXPLAIN against NEO4J_URI
+    python query_plans.py --profile --record # PROFILE and save fixtures
+    python query_plans.py --fixtures         # check the saved fixtures
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+from dashboard_queries import (
+    HOSPITAL_QUERY,
+    HOSPITALS_QUERY,
+    PATIENT_HISTORY_QUERY,
+    PATIENTS_BY_PHYSICIAN_QUERY,
+    PHYSICIANS_QUERY,
+    REVIEWS_BY_HOSPITAL_QUERY,
+    SEARCH_BY_DIAGNOSIS_QUERY,
+    SEARCH_REVIEWS_QUERY,
+)
+from intent_router import DEFAULT_INTENT, HOSPITAL_INTENTS, REVIEW_SEARCH_INTENT
+
+# Where --record writes plans and --fixtures reads them
+QUERY_PLAN_FIXTURES = os.getenv("QUERY_PLAN_FIXTURES", "plan_fixtures")
+
+# Operators that read a label (or the whole graph) without an index
+LABEL_SCANS = {"NodeByLabelScan", "PartitionedNodeByLabelScan"}
+ALL_NODES_SCANS = {"AllNodesScan", "PartitionedAllNodesScan"}
+
+# "h:Hospital" (label scan) and "UNIQUE p:Physician(id) WHERE id IN $ids" (index)
+SCAN_DETAILS = re.compile(r"^\s*`?(\w+)`?:`?(\w+)`?\s*$")
+INDEX_DETAILS = re.compile(r"(?:UNIQUE |TEXT |RANGE )?`?\w+`?:`?(\w+)`?\(([^)]*)\)")
+
+# Values that make every parameterized query plannable (and cheap to PROFILE)
+SAMPLE_PARAMS = {
+    "state": "CA",
+    "physician_ids": [1, 2],
+    "patient_ids": [1, 2],
+    "review_ids": [1, 2, 3],
+    "name": "Smith",
+    "query": "diagnosis:(pneumonia*)",
+    "text": "pneumonia",
+    "skip": 0,
+    "limit": 10,
+}
+
+
+class PlanCase:
+    """
+    One query and the plan it should get.
+
+    Args:
+        name: "chatbot.<intent>" or "dashboard.<query>"
+        cypher: Query text
+        seeks: (label, property, kind) tuples reached through an index
+        scans: Labels the query is expected to scan in full
+    """
+
+    def __init__(self, name, cypher, seeks=(), scans=()):
+        self.name = name
+        self.cypher = cypher
+        self.seeks = list(seeks)
+        self.scans = set(scans)
+
+    @property
+    def params(self):
+        return {key: value for key, value in SAMPLE_PARAMS.items() if f"${key}" in self.cypher}
+
+    @property
+    def fingerprint(self):
+        """Short hash of the query text (a fixture is stale when it changes)"""
+        return hashlib.sha256(" ".join(self.cypher.split()).encode()).hexdigest()[:16]
+
+
+# ============================================================================
+# EXPECTED PLANS
+# ============================================================================
+CHATBOT_EXPECTATIONS = {
+    "hospital_stats": {"scans": ["Hospital"]},
+    "payer_billing": {"scans": ["Payer"]},
+    "busiest_physicians": {"scans": ["Physician"]},
+    "hospitals_by_state": {"seeks": [("Hospital", "state_name", "range")]},
+    "patients_by_physician": {"seeks": [("Physician", "id", "unique")]},
+    "patient_history": {"seeks": [("Patient", "id", "unique")]},
+    "physician_salaries": {"scans": ["Physician"]},
+    # IS NOT NULL lets the salary index return the top five in order
+    "highest_paid_physicians": {"seeks": [("Physician", "salary", "range")]},
+    "common_diagnoses": {"scans": ["DiagnosisStat"]},
+    # One page of reviews: the planner may start from either end
+    "reviews": {"scans": ["Visit", "Review"]},
+    "all_hospitals": {"scans": ["Hospital"]},
+    "summary": {"scans": ["Hospital"]},
+    "review_search": {"seeks": [("Review", "id", "unique")]},
+}
+
+PLAN_CASES = [
+    *(PlanCase(f"chatbot.{intent.name}", intent.cypher, **CHATBOT_EXPECTATIONS[intent.name])
+      for intent in [*HOSPITAL_INTENTS, DEFAULT_INTENT, REVIEW_SEARCH_INTENT]),
+    PlanCase("dashboard.hospitals", HOSPITALS_QUERY, scans=["Hospital"]),
+    PlanCase("dashboard.patients_by_physician", PATIENTS_BY_PHYSICIAN_QUERY,
+             seeks=[("Physician", "name", "text")]),
+    PlanCase("dashboard.hospital", HOSPITAL_QUERY, seeks=[("Hospital", "name", "range")]),
+    PlanCase("dashboard.reviews_by_hospital", REVIEWS_BY_HOSPITAL_QUERY, seeks=[("Hospital", "name", "range")]),
+    PlanCase("dashboard.patient_history", PATIENT_HISTORY_QUERY, seeks=[("Patient", "name", "text")]),
+    # Full-text searches start from db.index.fulltext.queryNodes
+    PlanCase("dashboard.search_by_diagnosis", SEARCH_BY_DIAGNOSIS_QUERY),
+    PlanCase("dashboard.search_reviews", SEARCH_REVIEWS_QUERY),
+    PlanCase("dashboard.physicians", PHYSICIANS_QUERY, scans=["Physician"]),
+]
+
+
+def index_statement(label, prop, kind):
+    """Cypher that creates the index or constraint behind an expected seek"""
+    name = f"{label.lower()}_{prop}"
+    if kind == "unique":
+        return f"CREATE CONSTRAINT {name}_unique IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+    if kind == "text":
+        return f"CREATE TEXT INDEX {name}_text IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"
+    return f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"
+
+
+# ============================================================================
+# PLANS
+# ============================================================================
+def normalize_plan(plan):
+    """
+    Plan tree from the driver (summary.plan or summary.profile) as plain
+    dicts: operator, details, estimated_rows, and for PROFILE rows and
+    db_hits.
+    """
+    arguments = plan.get("arguments", {})
+    node = {
+        "operator": plan.get("operatorType", "").split("@")[0],
+        "details": arguments.get("Details", ""),
+        "estimated_rows": round(float(arguments.get("EstimatedRows", 0.0)), 1),
+    }
+    if "dbHits" in plan:
+        node["rows"] = plan.get("rows", 0)
+        node["db_hits"] = plan["dbHits"]
+    node["children"] = [normalize_plan(child) for child in plan.get("children", [])]
+    return node
+
+
+def walk(plan):
+    """Operators of a normalized plan, root first"""
+    yield plan
+    for child in plan["children"]:
+        yield from walk(child)
+
+
+def _indexed(operator):
+    return operator["operator"].startswith(("NodeIndex", "NodeUniqueIndex", "MultiNodeIndex",
+                                            "AssertingMultiNodeIndex"))
+
+
+def check_plan(case, plan, existing_indexes=None):
+    """
+    Problems with a normalized plan, as (message, suggestion or None) pairs.
+
+    Args:
+        existing_indexes: Set of (label, property) with an online index, if
+            known; used to tell a missing index from an unused one
+    """
+    problems = []
+    operators = list(walk(plan))
+    seeks = set()
+    for operator in operators:
+        if _indexed(operator):
+            for label, properties in INDEX_DETAILS.findall(operator["details"]):
+                for prop in properties.split(","):
+                    seeks.add((label, prop.strip().strip("`")))
+
+    expected = {(label, prop) for label, prop, _ in case.seeks}
+    for operator in operators:
+        if operator["operator"] in ALL_NODES_SCANS:
+            problems.append((f"{operator['operator']} ({operator['details']})", None))
+        elif operator["operator"] in LABEL_SCANS:
+            match = SCAN_DETAILS.match(operator["details"])
+            variable, label = match.groups() if match else ("", operator["details"])
+            if label in case.scans or any(seek_label == label for seek_label, _ in expected):
+                continue
+            filters = [other["details"] for other in operators
+                       if other["operator"] == "Filter" and f"{variable}." in other["details"]]
+            where = f", filtered by {filters[0]}" if filters else ""
+            problems.append((
+                f"{operator['operator']} of {label}{where}",
+                f"index the filtered {label} property, or list {label} in the case's scans",
+            ))
+
+    for label, prop, kind in case.seeks:
+        if (label, prop) in seeks:
+            continue
+        message = f"no index seek on {label}.{prop}"
+        if existing_indexes is not None and (label, prop) in existing_indexes:
+            message += " (an index exists but the planner did not use it)"
+        problems.append((message, index_statement(label, prop, kind)))
+    return problems
+
+
+def plan_summary(plan):
+    """Leaf operators, estimated rows, and rows/db hits when profiled"""
+    operators = list(walk(plan))
+    summary = {
+        "leaves": [f"{op['operator']}({op['details']})" for op in operators if not op["children"]],
+        "estimated_rows": plan["estimated_rows"],
+    }
+    if "db_hits" in plan:
+        summary["rows"] = plan["rows"]
+        summary["db_hits"] = sum(op.get("db_hits", 0) for op in operators)
+    return summary
+
+
+# ============================================================================
+# SOURCES: live Neo4j or recorded fixtures
+# ============================================================================
+def live_plans(driver, cases, profile=False):
+    """Yield (case, normalized plan) by running EXPLAIN or PROFILE"""
+    prefix = "PROFILE" if profile else "EXPLAIN"
+    with driver.session() as session:
+        for case in cases:
+            result = session.run(f"{prefix} {case.cypher}", case.params)
+            summary = result.consume()
+            plan = summary.profile if profile else summary.plan
+            yield case, normalize_plan(plan or {})
+
+
+def online_indexes(driver):
+    """(label, property) pairs covered by an online index"""
+    covered = set()
+    with driver.session() as session:
+        rows = session.run(
+            "SHOW INDEXES YIELD entityType, labelsOrTypes, properties, state "
+            "WHERE entityType = 'NODE' AND state = 'ONLINE' RETURN labelsOrTypes, properties"
+        )
+        for row in rows:
+            for label in row["labelsOrTypes"] or []:
+                for prop in row["properties"] or []:
+                    covered.add((label, prop))
+    return covered
+
+
+def fixture_path(directory, case):
+    return os.path.join(directory, f"{case.name}.json")
+
+
+def save_fixture(directory, case, plan):
+    os.makedirs(directory, exist_ok=True)
+    with open(fixture_path(directory, case), "w") as f:
+        json.dump({"query": case.fingerprint, "plan": plan}, f, indent=1)
+
+
+def fixture_plans(directory, cases):
+    """Yield (case, plan) from recorded fixtures; plan is None when missing"""
+    for case in cases:
+        try:
+            with open(fixture_path(directory, case)) as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            yield case, None
+            continue
+        if fixture.get("query") != case.fingerprint:
+            print(f"warning: {case.name} changed since its fixture was recorded", file=sys.stderr)
+        yield case, fixture["plan"]
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+def check_all(plans, existing_indexes=None):
+    """Report rows for (case, plan) pairs"""
+    report = []
+    for case, plan in plans:
+        if plan is None:
+            report.append({"case": case.name, "status": "MISSING", "problems": []})
+            continue
+        problems = check_plan(case, plan, existing_indexes)
+        report.append({
+            "case": case.name,
+            "status": "FAIL" if problems else "OK",
+            **plan_summary(plan),
+            "problems": [{"message": message, "suggestion": suggestion} for message, suggestion in problems],
+        })
+    return report
+
+
+def print_report(report):
+    for row in report:
+        line = f"{row['status']:<8}{row['case']:<40}"
+        if "estimated_rows" in row:
+            line += f"est {row['estimated_rows']:>10,.0f}"
+        if "db_hits" in row:
+            line += f"  db hits {row['db_hits']:>10,}"
+        print(line)
+        if row["status"] == "FAIL":
+            print(f"        plan: {', '.join(row['leaves'])}")
+        for problem in row["problems"]:
+            print(f"        - {problem['message']}")
+            if problem["suggestion"]:
+                print(f"          fix: {problem['suggestion']}")
+    statements = sorted({problem["suggestion"] for row in report for problem in row["problems"]
+                         if problem["suggestion"] and problem["suggestion"].startswith("CREATE")})
+    if statements:
+        print("\nSuggested schema changes:")
+        for statement in statements:
+            print(f"  {statement};")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the query plans of every registered Cypher query")
+    parser.add_argument("--profile", action="store_true", help="run PROFILE instead of EXPLAIN (executes the queries)")
+    parser.add_argument("--fixtures", action="store_true", help="check recorded plans instead of a live database")
+    parser.add_argument("--record", action="store_true", help="save the live plans as fixtures")
+    parser.add_argument("--fixture-dir", default=QUERY_PLAN_FIXTURES)
+    parser.add_argument("--only", help="only cases whose name contains this text")
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    cases = [case for case in PLAN_CASES if not args.only or args.only in case.name]
+    if args.fixtures:
+        report = check_all(fixture_plans(args.fixture_dir, cases))
+    else:
+        from neo4j_pool import create_driver
+
+        driver = create_driver(
+            os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+            os.getenv("NEO4J_USERNAME", "neo4j"),
+            os.getenv("NEO4J_PASSWORD", "password"),
+        )
+        try:
+            plans = list(live_plans(driver, cases, args.profile))
+            if args.record:
+                for case, plan in plans:
+                    save_fixture(args.fixture_dir, case, plan)
+                print(f"Recorded {len(plans)} plans in {args.fixture_dir}\n")
+            report = check_all(plans, online_indexes(driver))
+        finally:
+            driver.close()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    if any(row["status"] != "OK" for row in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
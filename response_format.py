@@ -0,0 +1,270 @@
+"""
+Response Formatting
+-------------------
+Turns query result rows into the chatbot's markdown answer.
+
+Every result shape (the columns an intent returns) has a Formatter in
+FORMATTERS: a title and a line renderer. Answers to a known intent use the
+formatter INTENT_FORMATTERS binds to its name; other results are matched
+on their columns, looked up once and cached by column tuple, instead of
+walking an if/elif ladder for every answer. Rows are rendered RENDER_CHUNK_ROWS at a
+time and joined with str.join, so a 10k-row answer is a few dozen writes
+rather than one string concatenation per row. That also keeps
+st.write_stream, which re-renders the message after every chunk, from
+going quadratic.
+
+Answers stop after one page (RESPONSE_PAGE_ROWS rows, or the formatter's
+own page size) and say how to get the next one. `is_show_more` recognizes
+that follow-up, and ResponsePager remembers which query and page it
+continues. Paged intents (Intent.paged) take the page as SKIP $skip
+LIMIT $limit parameters, so each page is its own small query instead of
+the full result re-read and skipped on the client; the query fetches one
+row past the page to tell whether there is more.
+"""
+
+import itertools
+import os
+import re
+from functools import lru_cache
+
+# Rows per answer before "show more" is offered
+RESPONSE_PAGE_ROWS = int(os.getenv("RESPONSE_PAGE_ROWS", 200))
+
+# Rows joined into one chunk of the streamed answer
+RENDER_CHUNK_ROWS = 100
+
+NO_RESULTS = "I couldn't find any information matching your query. Please try rephrasing your question."
+
+SHOW_MORE_PATTERN = re.compile(r"(show|see|give me|list)?\s*(me\s+)?(some\s+)?more( results| rows)?\W*")
+
+
+def is_show_more(question):
+    """True for follow-ups like "show more" or "more results"""
+    return SHOW_MORE_PATTERN.fullmatch(question.strip().lower()) is not None
+
+
+class Formatter:
+    """
+    How one result shape is rendered.
+
+    Args:
+        name: Identifier (for benchmarks and debugging)
+        keys: Columns a result must have to use this formatter
+        title: Heading; "{total}" is filled in when the row count is known
+        line: Function rendering one row (a dict) to markdown
+        title_unknown: Heading used when the row count is not known up front
+            (streamed results); defaults to `title`
+        page_rows: Rows per page, defaults to RESPONSE_PAGE_ROWS
+    """
+
+    def __init__(self, name, keys, title, line, title_unknown=None, page_rows=None):
+        self.name = name
+        self.keys = frozenset(keys)
+        self.title = title
+        self.title_unknown = title_unknown or title
+        self.line = line
+        self.page_rows = page_rows
+
+    def heading(self, total):
+        return self.title.format(total=total) if total is not None else self.title_unknown
+
+    def render(self, rows):
+        """Yield markdown chunks for the given rows"""
+        line = self.line
+        rows = iter(rows)
+        while chunk := list(itertools.islice(rows, RENDER_CHUNK_ROWS)):
+            yield "".join(map(line, chunk))
+
+    def __repr__(self):
+        return f"Formatter({self.name!r})"
+
+
+# ============================================================================
+# LINE RENDERERS
+# ============================================================================
+def _patient_line(item):
+    visits = f" ({item['Visits']} visits)" if "Visits" in item else ""
+    return f"• **{item['Patient']}** treated by {item['Physician']}{visits}\n"
+
+
+def _salary_line(item):
+    school = f"   School: {item['School']}\n" if "School" in item else ""
+    return f"• **{item['Physician']}** - ${item['Salary']:,.0f}\n{school}"
+
+
+def _history_line(item):
+    return (
+        f"Date: {item.get('Date', 'N/A')}\n"
+        f"  Diagnosis: {item['Diagnosis']}\n"
+        f"  Hospital: {item.get('Hospital', 'N/A')}\n\n"
+    )
+
+
+def _generic_line(item):
+    return "".join([f"**{key}:** {value}\n" for key, value in item.items()]) + "\n"
+
+
+# ============================================================================
+# FORMATTER REGISTRY - ORDER MATTERS (first match wins)
+# ============================================================================
+FORMATTERS = [
+    Formatter(
+        "hospitals", ["Hospital", "State"], "I found {total} hospital(s):\n\n",
+        lambda item: f"• **{item['Hospital']}** - {item['State']}\n",
+        title_unknown="I found these hospitals:\n\n",
+    ),
+    # Before "patients": history rows also carry Patient and Physician
+    Formatter(
+        "patient_history", ["Patient", "Date", "Diagnosis"], "Patient medical information:\n\n",
+        _history_line,
+    ),
+    Formatter("patients", ["Patient", "Physician"], "Here are the patients:\n\n", _patient_line),
+    Formatter(
+        "payer_billing", ["Payer", "Total_Billing"], "Billing per insurance payer:\n\n",
+        lambda item: f"• **{item['Payer']}** - ${item['Total_Billing']:,.2f} over {item['Visits']} visits\n",
+    ),
+    Formatter(
+        "busiest_physicians", ["Physician", "Patients"], "Busiest physicians:\n\n",
+        lambda item: f"• **{item['Physician']}** - {item['Patients']} patients, {item['Visits']} visits\n",
+    ),
+    Formatter("physician_salaries", ["Physician", "Salary"], "Here are the physicians:\n\n", _salary_line),
+    Formatter(
+        "diagnosis_counts", ["Diagnosis", "Count"], "Most common diagnoses:\n\n",
+        lambda item: f"• **{item['Diagnosis']}** - {item['Count']} cases\n",
+    ),
+    Formatter(
+        "reviews", ["Review"], "Patient reviews:\n\n",
+        lambda item: f"• \"{item['Review']}\"\n  - {item.get('Patient', 'Anonymous')}\n\n",
+        page_rows=5,
+    ),
+    Formatter(
+        "hospital_stats", ["Total_Visits"], "Hospital statistics:\n\n",
+        lambda item: f"• **{item['Hospital']}** - {item['Total_Visits']} visits\n",
+    ),
+]
+
+GENERIC_FORMATTER = Formatter(
+    "generic", [], "Found {total} result(s):\n\n", _generic_line, title_unknown="Results:\n\n"
+)
+
+
+# Intent name (intent_router.py) -> formatter name
+INTENT_FORMATTERS = {
+    "hospital_stats": "hospital_stats",
+    "payer_billing": "payer_billing",
+    "busiest_physicians": "busiest_physicians",
+    "hospitals_by_state": "hospitals",
+    "patients_by_physician": "patients",
+    "patient_history": "patient_history",
+    "physician_salaries": "physician_salaries",
+    "highest_paid_physicians": "physician_salaries",
+    "common_diagnoses": "diagnosis_counts",
+    "reviews": "reviews",
+    "review_search": "reviews",
+    "all_hospitals": "hospitals",
+    "summary": "hospitals",
+}
+
+_FORMATTERS_BY_NAME = {formatter.name: formatter for formatter in [*FORMATTERS, GENERIC_FORMATTER]}
+
+
+def formatter_for(intent_name):
+    """Formatter bound to an intent, or None to resolve it from the columns"""
+    name = INTENT_FORMATTERS.get(intent_name)
+    return _FORMATTERS_BY_NAME[name] if name is not None else None
+
+
+@lru_cache(maxsize=256)
+def resolve(keys):
+    """Formatter for a tuple of result columns (cached per shape)"""
+    present = frozenset(keys)
+    for formatter in FORMATTERS:
+        if formatter.keys <= present:
+            return formatter
+    return GENERIC_FORMATTER
+
+
+# ============================================================================
+# RESPONSES
+# ============================================================================
+def page_params(params, skip=0, page_rows=RESPONSE_PAGE_ROWS):
+    """Parameters of a paged intent's query for the page starting at row `skip`"""
+    return {**params, "skip": skip, "limit": page_rows + 1}
+
+
+def iter_response(data, offset=0, pager=None, skipped=False, formatter=None):
+    """
+    Yield one page of the formatted answer chunk by chunk.
+
+    Args:
+        data: List of row dicts, a row iterator (streamed results) or
+            {"error": message}
+        offset: Rows to skip (the pages already shown)
+        pager: ResponsePager told where the next page starts, if any
+        skipped: The query already skipped `offset` rows and fetched one
+            page (see page_params), so `data` starts at the page
+        formatter: Formatter to use (see formatter_for); by default it is
+            resolved from the columns of the first row
+    """
+    if isinstance(data, dict) and "error" in data:
+        yield f"Sorry, I encountered an error: {data['error']}"
+        return
+
+    try:
+        # Lists know their size up front; streamed cursors and pages do not
+        total = len(data) if hasattr(data, "__len__") and not skipped else None
+        rows = itertools.islice(iter(data), 0 if skipped else offset, None)
+        first = next(rows, None)
+        if first is None:
+            yield NO_RESULTS if offset == 0 else "There are no more results."
+            return
+        formatter = formatter or resolve(tuple(first.keys()))
+        page_rows = formatter.page_rows or RESPONSE_PAGE_ROWS
+        if pager is not None:
+            pager.page_rows = page_rows
+        if offset == 0:
+            yield formatter.heading(total)
+        yield from formatter.render(itertools.chain([first], itertools.islice(rows, page_rows - 1)))
+        if next(rows, None) is not None:
+            shown = offset + page_rows
+            if pager is not None:
+                pager.next_offset = shown
+            of_total = f" of {total}" if total is not None else ""
+            yield f"\n_Showing {offset + 1}-{shown}{of_total}. Say **show more** for the next {page_rows}._\n"
+    except Exception as e:
+        yield f"\n\nSorry, I encountered an error: {e}"
+
+
+class ResponsePager:
+    """
+    Remembers the query behind the last answer so that "show more" can
+    re-run it for the next page.
+    """
+
+    def __init__(self):
+        self.intent = None
+        self.params = None
+        self.next_offset = None
+        self.page_rows = None
+
+    @property
+    def has_more(self):
+        return self.next_offset is not None
+
+    def query_params(self, intent, params, offset=0):
+        """
+        Parameters to run `intent` with for the page starting at `offset`.
+        The first page fetches RESPONSE_PAGE_ROWS, later ones the page size
+        of the formatter that rendered the previous page.
+        """
+        if not intent.paged:
+            return params
+        page_rows = self.page_rows if offset and self.page_rows else RESPONSE_PAGE_ROWS
+        return page_params(params, offset, page_rows)
+
+    def iter_page(self, intent, params, data, offset=0):
+        """iter_response for `intent`, remembering where the next page starts"""
+        self.intent, self.params, self.next_offset = intent, params, None
+        yield from iter_response(
+            data, offset, self, skipped=intent.paged, formatter=formatter_for(intent.name)
+        )
@@ -0,0 +1,551 @@
+"""
+Semantic Review Search
+----------------------
+Finds reviews by meaning rather than exact words, e.g. "complaints about
+wait times at Wallace-Hamilton", without a round trip to an LLM API.
+
+Review texts are embedded on the CPU, either with a local
+sentence-transformers model (REVIEW_EMBEDDING_MODEL, if the package is
+installed) or with a hashing vectorizer over stemmed words and word pairs
+that needs nothing beyond NumPy and Polars. Vectors are L2-normalized
+float32 rows in a memory-mapped file, so opening the index costs no reads
+and the OS page cache holds only the rows queries touch.
+
+An IVF (inverted file) index makes search sub-linear: k-means centroids
+split the vectors into ~2*sqrt(n) lists, a query scores only the rows in
+its `nprobe` closest lists. A hospital filter scores a small hospital's
+reviews directly, and otherwise probes proportionally more lists.
+
+    index = ReviewIndex("data/.review_index")
+    index.sync(reviews_frame("data"))          # embeds only new/changed reviews
+    index.search("long wait in the ER", k=10)  # -> [(review_id, score), ...]
+
+sync() appends new reviews to the existing lists and tombstones changed or
+deleted ones; the centroids are retrained once the index has doubled in
+size or a third of its rows are dead.
+
+Usage:
+    python review_search.py sync [--data-dir data]
+    python review_search.py query "complaints about wait times"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+import polars as pl
+
+from parquet_cache import ParquetCache
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # optional; the hashing embedder is used instead
+    SentenceTransformer = None
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+# Defaults to <data_dir>/.review_index
+REVIEW_INDEX_DIR = os.getenv("REVIEW_INDEX_DIR")
+
+# sentence-transformers model name or path; empty uses the hashing embedder
+REVIEW_EMBEDDING_MODEL = os.getenv("REVIEW_EMBEDDING_MODEL", "")
+
+# Width of the hashing embedder's vectors
+REVIEW_EMBEDDING_DIM = int(os.getenv("REVIEW_EMBEDDING_DIM", 256))
+
+# IVF lists scanned per query (more lists = better recall, slower queries)
+REVIEW_SEARCH_NPROBE = int(os.getenv("REVIEW_SEARCH_NPROBE", 16))
+
+# Filtered searches over at most this many reviews skip the IVF lists
+EXHAUSTIVE_SEARCH_ROWS = 16_384
+
+# Reviews embedded per batch while syncing
+EMBED_BATCH_SIZE = 200_000
+
+# k-means settings for the IVF centroids
+KMEANS_ITERATIONS = 8
+KMEANS_SAMPLE_PER_LIST = 64
+
+# Retrain the centroids once rows > trained rows * this, or this share is dead
+RETRAIN_GROWTH = 2.0
+RETRAIN_DEAD_SHARE = 0.33
+
+
+# ============================================================================
+# EMBEDDERS
+# ============================================================================
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+    a about above after again all also am an and any are as at be been before
+    being but by can could did do does doing for from had has have having he
+    her here hers him his how i if in into is it its just me more most my no
+    nor not of off on once only or other our out over own same she should so
+    some such than that the their them then there these they this those
+    through to too under until up very was we were what when where which
+    while who whom why will with would you your
+""".split())
+
+SUFFIXES = ("ing", "ed", "ly", "s")
+
+
+def _stem(word):
+    """Strip one common suffix so "waiting", "waited" and "waits" meet"""
+    for suffix in SUFFIXES:
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def _features(text):
+    words = [_stem(w) for w in WORD_PATTERN.findall((text or "").lower()) if w not in STOPWORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def _bucket(feature, dim):
+    digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dim, 1.0 if value >> 63 else -1.0
+
+
+def _batch_features(texts):
+    """
+    Features of a batch of texts as integer keys (same features as _features).
+
+    Returns:
+        (rows, keys, name): text index and feature key of every feature
+        occurrence, and a function naming a feature key
+    """
+    words = (
+        pl.DataFrame({"text": pl.Series(texts, dtype=pl.Utf8)})
+        .with_row_count("row")
+        .select("row", pl.col("text").str.to_lowercase().str.extract_all(WORD_PATTERN.pattern).alias("word"))
+        .explode("word")
+        .filter(pl.col("word").is_not_null() & ~pl.col("word").is_in(list(STOPWORDS)))
+        .with_columns(pl.col("word").cast(pl.Categorical))
+    )
+    rows = words["row"].to_numpy().astype(np.int64)
+    # Stem each distinct word once, then renumber words by stem
+    stems, stem_of_word = np.unique(
+        [_stem(word) for word in words["word"].cat.get_categories().to_list()], return_inverse=True
+    )
+    ids = stem_of_word.ravel()[words["word"].to_physical().to_numpy()].astype(np.int64)
+    # Word pairs never cross texts; pair (a, b) is keyed after all stems
+    same = rows[:-1] == rows[1:]
+    size = len(stems)
+    keys = np.concatenate([ids, size + ids[:-1][same] * size + ids[1:][same]])
+    rows = np.concatenate([rows, rows[:-1][same]])
+
+    def name(key):
+        if key < size:
+            return stems[key]
+        first, second = divmod(key - size, size)
+        return f"{stems[first]}_{stems[second]}"
+
+    return rows, keys, name
+
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of stemmed words and word pairs, with sublinear
+    term frequency and L2 normalization (cosine similarity = dot product).
+
+    Batches are tokenized with Polars and each distinct feature is hashed
+    once; a single query takes the plain-Python path.
+    """
+
+    def __init__(self, dim=REVIEW_EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _embed_one(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        counts = {}
+        for feature in _features(text):
+            counts[feature] = counts.get(feature, 0) + 1
+        for feature, count in counts.items():
+            column, sign = _bucket(feature, self.dim)
+            vector[column] += sign * (1.0 + np.log(count))
+        return vector
+
+    def embed(self, texts):
+        if len(texts) <= 16:
+            vectors = np.array([self._embed_one(text) for text in texts], dtype=np.float32)
+            vectors = vectors.reshape(len(texts), self.dim)
+        else:
+            rows, keys, name = _batch_features(texts)
+            if not len(rows):
+                return np.zeros((len(texts), self.dim), dtype=np.float32)
+            # Run-length count each (text, feature) pair
+            order = np.lexsort((keys, rows))
+            rows, keys = rows[order], keys[order]
+            starts = np.flatnonzero(np.r_[True, (rows[1:] != rows[:-1]) | (keys[1:] != keys[:-1])])
+            counts = np.diff(np.append(starts, len(rows)))
+            rows, keys = rows[starts], keys[starts]
+            # Hash each distinct feature once
+            features, inverse = np.unique(keys, return_inverse=True)
+            buckets = np.array([_bucket(name(key), self.dim) for key in features.tolist()]).reshape(-1, 2)
+            columns = buckets[:, 0].astype(np.int64)[inverse.ravel()]
+            weights = buckets[:, 1][inverse.ravel()] * (1.0 + np.log(counts))
+            vectors = np.bincount(rows * self.dim + columns, weights, minlength=len(texts) * self.dim)
+            vectors = vectors.reshape(len(texts), self.dim).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model, run on the CPU"""
+
+    def __init__(self, model_name):
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def embed(self, texts):
+        vectors = self.model.encode(
+            list(texts), batch_size=256, normalize_embeddings=True, show_progress_bar=False
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def embedder_from_env():
+    """REVIEW_EMBEDDING_MODEL if set and sentence-transformers is installed"""
+    if REVIEW_EMBEDDING_MODEL and SentenceTransformer is not None:
+        return SentenceTransformerEmbedder(REVIEW_EMBEDDING_MODEL)
+    return HashingEmbedder()
+
+
+# ============================================================================
+# IVF HELPERS
+# ============================================================================
+def _top(scores, k):
+    """Indexes of the k largest scores, best first"""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def _assign(vectors, centroids, batch_size=65_536):
+    """Nearest centroid (by dot product) of every row"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        labels[start:start + batch_size] = np.argmax(vectors[start:start + batch_size] @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(vectors, nlist, seed=0):
+    """Spherical k-means on a sample of the (normalized) vectors"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * KMEANS_SAMPLE_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _assign(sample, centroids)
+        order = np.argsort(labels, kind="stable")
+        present, starts = np.unique(labels[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[present] = np.add.reduceat(sample[order], starts)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty lists with random sample rows
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def _csr(labels, size):
+    order = np.argsort(labels, kind="stable")
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=size))))
+    return order, offsets
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+class ReviewIndex:
+    """
+    On-disk review vectors plus IVF lists.
+
+    Files in `directory`: meta.json, vectors.f32 (rows x dim float32),
+    centroids.npy and rows.npz (per row: review id, text hash, hospital id,
+    IVF list, alive flag).
+
+    Args:
+        directory: Index folder (created on first sync)
+        embedder: Defaults to embedder_from_env(); an index built with a
+            different embedder is rebuilt on the next sync
+    """
+
+    def __init__(self, directory, embedder=None):
+        self.directory = directory
+        self.embedder = embedder or embedder_from_env()
+        self._load()
+
+    # ------------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------------
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        try:
+            with open(self._path("meta.json")) as f:
+                self.meta = json.load(f)
+        except (OSError, ValueError):
+            self.meta = None
+        if self.meta is None or self.meta["embedder"] != self.embedder.name:
+            self._reset()
+            return
+        rows = np.load(self._path("rows.npz"))
+        self.ids, self.text_hashes = rows["ids"], rows["text_hashes"]
+        self.hospitals, self.lists, self.alive = rows["hospitals"], rows["lists"], rows["alive"]
+        self.centroids = np.load(self._path("centroids.npy"))
+        self.vectors = self._open_vectors(len(self.ids))
+        self._index_rows()
+
+    def _reset(self):
+        dim = self.embedder.dim
+        self.meta = {"embedder": self.embedder.name, "dim": dim, "rows": 0, "trained_rows": 0}
+        self.ids = np.empty(0, dtype=np.int64)
+        self.text_hashes = np.empty(0, dtype=np.uint64)
+        self.hospitals = np.empty(0, dtype=np.int64)
+        self.lists = np.empty(0, dtype=np.int32)
+        self.alive = np.empty(0, dtype=bool)
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self._index_rows()
+
+    def _open_vectors(self, rows):
+        if rows == 0:
+            return np.empty((0, self.meta["dim"]), dtype=np.float32)
+        return np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r",
+                         shape=(rows, self.meta["dim"]))
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        staging = self._path(f"rows.tmp-{os.getpid()}.npz")
+        np.savez(staging, ids=self.ids, text_hashes=self.text_hashes, hospitals=self.hospitals,
+                 lists=self.lists, alive=self.alive)
+        os.replace(staging, self._path("rows.npz"))
+        staging = self._path(f"centroids.tmp-{os.getpid()}.npy")
+        np.save(staging, self.centroids)
+        os.replace(staging, self._path("centroids.npy"))
+        self.meta["rows"] = len(self.ids)
+        staging = self._path(f"meta.tmp-{os.getpid()}.json")
+        with open(staging, "w") as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(staging, self._path("meta.json"))
+
+    def _write_vectors(self, vectors, append):
+        """
+        Append to vectors.f32, or replace it with a new file (processes that
+        still map the old one keep reading it until they reopen the index)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path("vectors.f32")
+        data = np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+        if not append or not os.path.exists(path):
+            staging = f"{path}.tmp-{os.getpid()}"
+            with open(staging, "wb") as f:
+                f.write(data)
+            os.replace(staging, path)
+            return
+        keep = len(self.ids) * self.meta["dim"] * 4
+        with open(path, "r+b") as f:
+            # Drop anything past the last saved row (an interrupted sync)
+            f.truncate(keep)
+            f.seek(keep)
+            f.write(data)
+
+    def _index_rows(self):
+        """Row lookups derived from the per-row arrays"""
+        live = np.flatnonzero(self.alive)
+        self._row_of_id = dict(zip(self.ids[live].tolist(), live.tolist()))
+        self._list_order, self._list_offsets = _csr(self.lists[live], len(self.centroids))
+        self._list_order = live[self._list_order]
+        order = live[np.argsort(self.hospitals[live], kind="stable")]
+        hospitals, starts = np.unique(self.hospitals[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self._rows_by_hospital = {
+            int(hospital): order[start:end] for hospital, start, end in zip(hospitals, starts, ends)
+        }
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    # ------------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------------
+    def _embed(self, texts):
+        parts = [self.embedder.embed(texts[start:start + EMBED_BATCH_SIZE])
+                 for start in range(0, len(texts), EMBED_BATCH_SIZE)]
+        return np.concatenate(parts) if parts else np.empty((0, self.meta["dim"]), dtype=np.float32)
+
+    def sync(self, reviews):
+        """
+        Bring the index in line with the current reviews.
+
+        Args:
+            reviews: DataFrame with review_id, review and hospital_id
+                (see reviews_frame)
+
+        Returns:
+            Dict with inserted/updated/deleted/rebuilt counts
+        """
+        # Polars hashes may change between releases; that only re-embeds once
+        reviews = reviews.unique("review_id", keep="last").with_columns(
+            pl.col("review").fill_null("").hash(seed=0).alias("text_hash"),
+            pl.col("hospital_id").fill_null(-1),
+        )
+        ids = reviews["review_id"].to_numpy()
+        hashes = reviews["text_hash"].to_numpy()
+        current = np.array([self._row_of_id.get(i, -1) for i in ids.tolist()], dtype=np.int64)
+        known = current >= 0
+        changed = np.zeros(len(ids), dtype=bool)
+        changed[known] = self.text_hashes[current[known]] != hashes[known]
+        fresh = ~known | changed
+
+        # Rows whose review disappeared or changed text are tombstoned
+        stale = np.ones(len(self.ids), dtype=bool)
+        stale[current[known & ~changed]] = False
+        dead = stale & self.alive
+        summary = {"inserted": int((~known).sum()), "updated": int(changed.sum()),
+                   "deleted": int(dead.sum() - changed.sum()), "rebuilt": False}
+
+        vectors = self._embed(reviews["review"].fill_null("").to_numpy()[fresh].tolist())
+        self.alive = self.alive & ~dead
+        rows = len(self.ids) + len(vectors)
+        needs_training = (
+            len(self.centroids) == 0
+            or rows > self.meta["trained_rows"] * RETRAIN_GROWTH
+            or (rows - self.alive.sum() - len(vectors)) > rows * RETRAIN_DEAD_SHARE
+        )
+        if needs_training:
+            # Compact: keep live rows, then retrain on everything
+            keep = np.flatnonzero(self.alive)
+            vectors = np.concatenate([np.asarray(self.vectors[keep]), vectors])
+            self.ids = np.concatenate([self.ids[keep], ids[fresh]])
+            self.text_hashes = np.concatenate([self.text_hashes[keep], hashes[fresh]])
+            self.hospitals = np.concatenate([self.hospitals[keep], reviews["hospital_id"].to_numpy()[fresh]])
+            nlist = max(1, min(int(2 * np.sqrt(len(vectors))), len(vectors)))
+            self.centroids = train_centroids(vectors, nlist) if len(vectors) else self.centroids
+            self.lists = _assign(vectors, self.centroids) if len(vectors) else np.empty(0, dtype=np.int32)
+            # Store rows list by list, so probing a list reads one contiguous run
+            order = np.argsort(self.lists, kind="stable")
+            vectors, self.lists = vectors[order], self.lists[order]
+            self.ids, self.text_hashes = self.ids[order], self.text_hashes[order]
+            self.hospitals = self.hospitals[order]
+            self.alive = np.ones(len(self.ids), dtype=bool)
+            self.meta["trained_rows"] = len(self.ids)
+            self._write_vectors(vectors, append=False)
+            summary["rebuilt"] = True
+        else:
+            self._write_vectors(vectors, append=True)
+            self.ids = np.concatenate([self.ids, ids[fresh]])
+            self.text_hashes = np.concatenate([self.text_hashes, hashes[fresh]])
+            self.hospitals = np.concatenate([self.hospitals, reviews["hospital_id"].to_numpy()[fresh]])
+            self.lists = np.concatenate([self.lists, _assign(vectors, self.centroids)])
+            self.alive = np.concatenate([self.alive, np.ones(len(vectors), dtype=bool)])
+        self._save()
+        self.vectors = self._open_vectors(len(self.ids))
+        self._index_rows()
+        return summary
+
+    # ------------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------------
+    def _probe(self, query, nprobe):
+        lists = _top(self.centroids @ query, min(nprobe, len(self.centroids)))
+        return np.concatenate([
+            self._list_order[self._list_offsets[i]:self._list_offsets[i + 1]] for i in lists
+        ])
+
+    def _candidates(self, query, hospital_ids, nprobe):
+        if not hospital_ids:
+            return self._probe(query, nprobe)
+        rows = np.concatenate(
+            [self._rows_by_hospital.get(int(h), np.empty(0, dtype=np.int64)) for h in hospital_ids]
+        )
+        if len(rows) <= EXHAUSTIVE_SEARCH_ROWS:
+            return rows
+        # Probe more lists the smaller the hospitals' share, keep their rows
+        nprobe = int(np.ceil(nprobe * len(self) / len(rows)))
+        candidates = self._probe(query, nprobe)
+        return candidates[np.isin(self.hospitals[candidates], hospital_ids)]
+
+    def search(self, text, k=10, hospital_ids=None, nprobe=REVIEW_SEARCH_NPROBE):
+        """
+        Top-k reviews by cosine similarity to `text`.
+
+        Args:
+            hospital_ids: Only reviews of visits at these hospitals
+            nprobe: IVF lists scanned (scaled up for a hospital filter)
+
+        Returns:
+            List of (review_id, score), best first
+        """
+        if not len(self) or k <= 0:
+            return []
+        query = self.embedder.embed([text])[0]
+        rows = self._candidates(query, hospital_ids, nprobe)
+        if not len(rows):
+            return []
+        # Sorted rows read the memory map sequentially
+        rows = np.sort(rows)
+        scores = self.vectors[rows] @ query
+        best = _top(scores, k)
+        return list(zip(self.ids[rows[best]].tolist(), scores[best].tolist()))
+
+
+# ============================================================================
+# SOURCE DATA
+# ============================================================================
+def reviews_frame(data_dir=None):
+    """review_id, review and hospital_id (through the review's visit)"""
+    cache = ParquetCache(data_dir or DATA_DIR)
+    reviews = cache.read("reviews", columns=["review_id", "visit_id", "review"])
+    visits = cache.read("visits", columns=["visit_id", "hospital_id"])
+    return reviews.join(visits, on="visit_id", how="left").select("review_id", "review", "hospital_id")
+
+
+def index_dir(data_dir=None):
+    return REVIEW_INDEX_DIR or os.path.join(data_dir or DATA_DIR, ".review_index")
+
+
+def index_from_env(data_dir=None):
+    """The synced review index, or None until `review_search.py sync` has run"""
+    index = ReviewIndex(index_dir(data_dir))
+    return index if len(index) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic review search index")
+    parser.add_argument("command", choices=["sync", "query"])
+    parser.add_argument("text", nargs="?", default="")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    index = ReviewIndex(index_dir(args.data_dir))
+    if args.command == "sync":
+        started = time.perf_counter()
+        summary = index.sync(reviews_frame(args.data_dir))
+        print(f"{summary} -> {len(index):,} reviews indexed with {index.embedder.name} "
+              f"in {time.perf_counter() - started:.1f}s")
+        return
+    reviews = reviews_frame(args.data_dir)
+    texts = dict(zip(reviews["review_id"].to_list(), reviews["review"].to_list()))
+    for review_id, score in index.search(args.text, args.k):
+        print(f"{score:6.3f}  #{review_id}  {texts.get(review_id, '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Synthetic Data
+--------------
+Writes a seeded, reproducible hospital dataset (hospitals, payers,
+physicians, patients, visits and reviews CSV files with every column the
+loaders and analytics read) at any scale from a thousand to tens of
+millions of visits.
+
+The skew follows real hospital data rather than uniform draws:
+- physician load is Zipfian (a few physicians see most patients) and each
+  physician works mostly at one hospital, so hospital volume is skewed too
+- diagnoses are Zipfian in the order of DIAGNOSES, each with a matching
+  chief complaint and treatment
+- lengths of stay are geometric, billing amounts log-normal and a small
+  share of visits are still open (no discharge date)
+
+The same (visits, seed) always produces byte-identical files. Visits are
+generated and written VISIT_CHUNK_ROWS at a time, so memory stays flat
+as the dataset grows.
+
+Usage:
+    python synthetic_data.py --visits 1000000 --out data/synthetic
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import polars as pl
+
+VISIT_CHUNK_ROWS = 1_000_000
+
+# Zipf exponents: physician visit load and diagnosis frequency
+PHYSICIAN_ZIPF = 0.8
+DIAGNOSIS_ZIPF = 1.2
+
+# Share of visits at a physician's own hospital (the rest are elsewhere)
+HOME_HOSPITAL_SHARE = 0.9
+
+REVIEW_RATE = 0.1
+OPEN_VISIT_RATE = 0.02
+
+FIRST_DATE = np.datetime64("2019-01-01")
+DATE_RANGE_DAYS = 5 * 365
+
+# (diagnosis, chief complaint, treatment), most common first
+DIAGNOSES = [
+    ("Hypertension", "Headache and dizziness", "Started on lisinopril, low sodium diet"),
+    ("Diabetes", "Excessive thirst and fatigue", "Insulin titration and dietary counselling"),
+    ("Pneumonia", "Cough with fever", "IV antibiotics and oxygen therapy"),
+    ("Asthma", "Shortness of breath", "Nebulized bronchodilators and steroids"),
+    ("Fracture", "Pain and swelling after a fall", "Reduction and casting"),
+    ("Migraine", "Severe one-sided headache", "Triptans and rest in a dark room"),
+    ("Urinary tract infection", "Painful urination", "Oral antibiotics"),
+    ("Chest pain", "Pressure in the chest", "ECG, troponin monitoring and aspirin"),
+    ("Heart failure", "Leg swelling and breathlessness", "Diuretics and fluid restriction"),
+    ("COPD exacerbation", "Worsening cough and wheeze", "Bronchodilators, steroids and antibiotics"),
+    ("Appendicitis", "Right lower abdominal pain", "Laparoscopic appendectomy"),
+    ("Cellulitis", "Red, warm swollen skin", "IV antibiotics and limb elevation"),
+    ("Gastroenteritis", "Vomiting and diarrhea", "IV fluids and antiemetics"),
+    ("Kidney stones", "Severe flank pain", "Pain control and lithotripsy"),
+    ("Atrial fibrillation", "Palpitations", "Rate control and anticoagulation"),
+    ("Stroke", "Sudden weakness on one side", "Thrombolysis and stroke unit care"),
+    ("Sepsis", "Fever and confusion", "Broad-spectrum antibiotics and fluids"),
+    ("Anemia", "Fatigue and pale skin", "Iron supplementation"),
+    ("Concussion", "Headache after a head injury", "Observation and cognitive rest"),
+    ("Depression", "Low mood and poor sleep", "SSRI and therapy referral"),
+    ("Anxiety", "Racing heart and worry", "Counselling and short-term anxiolytics"),
+    ("Bronchitis", "Persistent cough", "Rest, fluids and inhalers"),
+    ("Pancreatitis", "Upper abdominal pain radiating to the back", "Bowel rest and IV fluids"),
+    ("Gallstones", "Pain after fatty meals", "Laparoscopic cholecystectomy"),
+    ("Dehydration", "Dizziness and dry mouth", "IV rehydration"),
+    ("Hip replacement", "Chronic hip pain", "Total hip arthroplasty and physiotherapy"),
+    ("Knee injury", "Knee pain and instability", "Bracing and physiotherapy"),
+    ("Allergic reaction", "Rash and itching", "Antihistamines and epinephrine"),
+    ("Hypothyroidism", "Weight gain and cold intolerance", "Levothyroxine"),
+    ("Deep vein thrombosis", "Calf pain and swelling", "Anticoagulation"),
+]
+
+PAYERS = ["Medicaid", "UnitedHealthcare", "Aetna", "Cigna", "Blue Cross", "Medicare", "Humana"]
+PAYER_WEIGHTS = [0.22, 0.2, 0.16, 0.12, 0.12, 0.12, 0.06]
+
+STATES = ["CA", "TX", "FL", "NY", "PA", "IL", "OH", "GA", "NC", "MI", "WA", "CO"]
+HOSPITAL_KINDS = ["General Hospital", "Medical Center", "Memorial Hospital",
+                  "Regional Medical Center", "Community Hospital", "University Hospital"]
+MEDICAL_SCHOOLS = ["Johns Hopkins University", "Harvard Medical School", "Stanford University",
+                   "University of Michigan", "Duke University", "Baylor College of Medicine",
+                   "University of Washington", "Emory University", "Ohio State University",
+                   "University of Florida"]
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David",
+    "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas",
+    "Sarah", "Christopher", "Karen", "Daniel", "Lisa", "Matthew", "Nancy", "Anthony", "Betty",
+    "Mark", "Sandra", "Steven", "Ashley", "Paul", "Emily", "Andrew", "Donna", "Joshua", "Michelle",
+    "Kevin", "Carol", "Brian", "Amanda", "George", "Melissa", "Timothy", "Deborah", "Ronald",
+    "Stephanie", "Jason", "Rebecca", "Ryan", "Laura",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+    "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor",
+    "Moore", "Jackson", "Martin", "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez",
+    "Clark", "Ramirez", "Lewis", "Robinson", "Walker", "Young", "Allen", "King", "Wright",
+    "Scott", "Torres", "Nguyen", "Hill", "Flores", "Green", "Adams", "Nelson", "Baker", "Hall",
+    "Rivera", "Campbell", "Mitchell", "Carter", "Roberts",
+]
+
+# Review sentences, positive first; a review joins two of them
+REVIEW_PHRASES = [
+    "The staff provided great care during my stay.",
+    "Nurses were kind and attentive.",
+    "The doctor explained everything clearly.",
+    "Discharge was quick and smooth.",
+    "Pain was managed well after the procedure.",
+    "I waited hours in the emergency room before anyone saw me.",
+    "The wait time was far too long.",
+    "The billing department overcharged my insurance.",
+    "My room was dirty and noisy at night.",
+    "The food was cold and tasteless.",
+    "Parking was expensive and hard to find.",
+    "Staff at the front desk were rude.",
+    "I could not get my test results for days.",
+]
+
+
+def zipf_weights(count, exponent):
+    """Probabilities proportional to 1 / rank**exponent for ranks 1..count"""
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def dimension_sizes(visits):
+    """Row counts of the dimension tables for a dataset with `visits` visits"""
+    return {
+        "hospitals": int(np.clip(visits // 5_000, 30, 2_000)),
+        "payers": len(PAYERS),
+        "physicians": int(np.clip(visits // 200, 50, 50_000)),
+        "patients": max(1_000, visits // 5),
+    }
+
+
+def _pick(values, rng_or_index, count=None):
+    """
+    values[index] as a Polars Series (much faster than NumPy string arrays).
+
+    Pass an index array, or a Generator and a count to pick uniformly.
+    """
+    index = rng_or_index if count is None else rng_or_index.integers(0, len(values), count)
+    return pl.Series(list(values)).gather(index)
+
+
+def _names(rng, count):
+    first = _pick(FIRST_NAMES, rng, count)
+    last = _pick(LAST_NAMES, rng, count)
+    return (first + " " + last).alias("name")
+
+
+def _dates(first, days):
+    """pl.Date series of `first` (numpy datetime64[D]) plus integer day offsets"""
+    epoch_days = first.astype("datetime64[D]").astype(np.int64)
+    return pl.Series((epoch_days + days).astype(np.int32)).cast(pl.Date)
+
+
+def _random_dates(rng, count, first_year, years):
+    return _dates(np.datetime64(f"{first_year}-01-01"), rng.integers(0, years * 365, count))
+
+
+def _write(frame, directory, name):
+    frame.write_csv(os.path.join(directory, f"{name}.csv"))
+
+
+class _Dimensions:
+    """The dimension tables, plus the lookups visits and reviews need"""
+
+    def __init__(self, rng, sizes):
+        hospitals, physicians, patients = sizes["hospitals"], sizes["physicians"], sizes["patients"]
+        pairs = len(LAST_NAMES) * len(HOSPITAL_KINDS)
+        # Past every place/kind pair, add a number to keep names unique
+        self.hospital_names = pl.Series([
+            f"{LAST_NAMES[i % len(LAST_NAMES)]} {HOSPITAL_KINDS[(i // len(LAST_NAMES)) % len(HOSPITAL_KINDS)]}"
+            + (f" {i}" if i >= pairs else "")
+            for i in range(hospitals)
+        ])
+        self.hospitals = pl.DataFrame({
+            "hospital_id": np.arange(hospitals),
+            "hospital_name": self.hospital_names,
+            "hospital_state": _pick(STATES, rng, hospitals),
+        })
+        self.payers = pl.DataFrame({"payer_id": np.arange(len(PAYERS)), "payer_name": PAYERS})
+
+        self.physician_names = _names(rng, physicians)
+        born = rng.integers(0, 40 * 365, physicians)
+        first_born = np.datetime64("1950-01-01")
+        self.physicians = pl.DataFrame({
+            "physician_id": np.arange(physicians),
+            "physician_name": self.physician_names,
+            "physician_dob": _dates(first_born, born),
+            # Medical school ends in the physician's mid-twenties to early thirties
+            "physician_grad_year": _dates(first_born, born + rng.integers(25 * 365, 32 * 365, physicians)),
+            "medical_school": _pick(MEDICAL_SCHOOLS, rng, physicians),
+            "salary": rng.normal(300_000, 60_000, physicians).clip(120_000, 650_000).round(2),
+        })
+        # Busiest physicians are spread over the id range, not ids 0, 1, 2...
+        self.physician_by_rank = rng.permutation(physicians)
+        self.physician_weights = zipf_weights(physicians, PHYSICIAN_ZIPF)
+        self.home_hospital = rng.integers(0, hospitals, physicians)
+
+        self.patient_names = _names(rng, patients)
+        self.patients = pl.DataFrame({
+            "patient_id": np.arange(patients),
+            "patient_name": self.patient_names,
+            "patient_sex": _pick(["Female", "Male"], rng, patients),
+            "patient_dob": _random_dates(rng, patients, 1930, 90),
+            "patient_blood_type": _pick(
+                ["O+", "A+", "B+", "AB+", "O-", "A-", "B-", "AB-"],
+                rng.choice(8, patients, p=[0.37, 0.36, 0.09, 0.03, 0.07, 0.06, 0.015, 0.005]),
+            ),
+        })
+
+
+def _visit_chunk(rng, dims, start, rows):
+    physicians = dims.physician_by_rank[rng.choice(len(dims.physician_weights), rows, p=dims.physician_weights)]
+    hospitals = dims.home_hospital[physicians]
+    away = rng.random(rows) >= HOME_HOSPITAL_SHARE
+    hospitals[away] = rng.integers(0, len(dims.hospital_names), int(away.sum()))
+    diagnosis = rng.choice(len(DIAGNOSES), rows, p=zipf_weights(len(DIAGNOSES), DIAGNOSIS_ZIPF))
+    admitted = rng.integers(0, DATE_RANGE_DAYS, rows)
+    stay = rng.geometric(0.25, rows) - 1
+    is_open = rng.random(rows) < OPEN_VISIT_RATE
+    names, complaints, treatments = zip(*DIAGNOSES)
+    return pl.DataFrame({
+        "visit_id": np.arange(start, start + rows),
+        "patient_id": rng.integers(0, len(dims.patient_names), rows),
+        "date_of_admission": _dates(FIRST_DATE, admitted),
+        "billing_amount": rng.lognormal(9.0, 1.0, rows).clip(50, 250_000).round(2),
+        "room_number": rng.integers(100, 500, rows),
+        "admission_type": _pick(["Elective", "Emergency", "Urgent"], rng, rows),
+        "discharge_date": _dates(FIRST_DATE, admitted + stay),
+        "test_results": _pick(["Normal", "Abnormal", "Inconclusive"], rng, rows),
+        "visit_status": _pick(["DISCHARGED", "OPEN"], is_open.astype(np.int64)),
+        "physician_id": physicians,
+        "payer_id": rng.choice(len(PAYERS), rows, p=PAYER_WEIGHTS),
+        "hospital_id": hospitals,
+        "chief_complaint": _pick(complaints, diagnosis),
+        "treatment_description": _pick(treatments, diagnosis),
+        "primary_diagnosis": _pick(names, diagnosis),
+    }).with_columns(
+        # Open visits have no discharge date (written as an empty field)
+        pl.when(pl.col("visit_status") == "OPEN").then(None).otherwise(pl.col("discharge_date"))
+        .alias("discharge_date")
+    )
+
+
+def _review_chunk(rng, dims, visits, first_id, review_rate):
+    reviewed = visits.filter(pl.Series(rng.random(visits.height) < review_rate))
+    rows = reviewed.height
+    first = rng.integers(0, len(REVIEW_PHRASES), rows)
+    second = (first + rng.integers(1, len(REVIEW_PHRASES), rows)) % len(REVIEW_PHRASES)
+    return pl.DataFrame({
+        "review_id": np.arange(first_id, first_id + rows),
+        "visit_id": reviewed["visit_id"],
+        "review": _pick(REVIEW_PHRASES, first) + " " + _pick(REVIEW_PHRASES, second),
+        "physician_name": dims.physician_names.gather(reviewed["physician_id"]),
+        "hospital_name": dims.hospital_names.gather(reviewed["hospital_id"]),
+        "patient_name": dims.patient_names.gather(reviewed["patient_id"]),
+    })
+
+
+def write_dataset(directory, visits, seed=42, review_rate=REVIEW_RATE, sizes=None):
+    """
+    Write the six CSV files for a dataset with `visits` visits.
+
+    Args:
+        directory: Output folder (created if missing; files are overwritten)
+        visits: Number of visits
+        seed: Random seed; the same seed and size give the same files
+        review_rate: Share of visits with a review
+        sizes: Overrides for dimension_sizes() ({"physicians": 100, ...})
+
+    Returns:
+        Dict of table name -> rows written
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    sizes = {**dimension_sizes(visits), **(sizes or {})}
+    dims = _Dimensions(rng, sizes)
+    for name in ("hospitals", "payers", "physicians", "patients"):
+        _write(getattr(dims, name), directory, name)
+
+    reviews = 0
+    with open(os.path.join(directory, "visits.csv"), "wb") as visit_file, \
+            open(os.path.join(directory, "reviews.csv"), "wb") as review_file:
+        for start in range(0, max(visits, 1), VISIT_CHUNK_ROWS):
+            chunk = _visit_chunk(rng, dims, start, min(VISIT_CHUNK_ROWS, visits - start))
+            chunk.write_csv(visit_file, include_header=start == 0)
+            chunk_reviews = _review_chunk(rng, dims, chunk, reviews, review_rate)
+            chunk_reviews.write_csv(review_file, include_header=start == 0)
+            reviews += chunk_reviews.height
+    return {**{name: sizes[name] for name in ("hospitals", "payers", "physicians", "patients")},
+            "visits": visits, "reviews": reviews}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic hospital dataset")
+    parser.add_argument("--visits", type=int, default=100_000)
+    parser.add_argument("--out", default=os.path.join("data", "synthetic"), help="output folder")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--review-rate", type=float, default=REVIEW_RATE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = write_dataset(args.out, args.visits, args.seed, args.review_rate)
+    print(f"Wrote {args.out} in {time.perf_counter() - started:.1f}s")
+    for name, rows in counts.items():
+        print(f"  {name:<12}{rows:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Chatbot questions routed and answered end to end on the in-process graph"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from graph_backend import CHATBOT_QUERY_HANDLERS, InMemoryBackend, InMemoryGraph  # noqa: E402
+from intent_router import build_hospital_router  # noqa: E402
+from name_index import NameIndex  # noqa: E402
+from response_format import ResponsePager  # noqa: E402
+from synthetic_data import write_dataset  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp("data")
+    write_dataset(str(data_dir), 500)
+    return InMemoryGraph.from_csv_dir(str(data_dir))
+
+
+def answer(backend, question):
+    names = NameIndex()
+    backend.load_names(names)
+    intent, slots = build_hospital_router(names).route(question)
+    params = {slot: slots[slot] for slot in intent.slots}
+    pager = ResponsePager()
+    rows = backend.stream(intent.cypher, pager.query_params(intent, params))
+    return intent, "".join(pager.iter_page(intent, params, rows))
+
+
+def test_history_question_renders_the_visit_history(graph):
+    backend = InMemoryBackend(graph, CHATBOT_QUERY_HANDLERS)
+    physicians = set(graph.physicians["name"].tolist())
+    patient = next(
+        graph.patients["name"][row] for row in graph.visit_patient
+        if row >= 0 and graph.patients["name"][row] not in physicians
+    )
+
+    intent, text = answer(backend, f"What is the visit history for patient {patient}?")
+
+    assert intent.name == "patient_history"
+    assert text.startswith("Patient medical information:")
+    assert "Date: " in text and "Diagnosis: " in text
+    assert "treated by" not in text
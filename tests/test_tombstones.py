@@ -0,0 +1,77 @@
+"""
+Tombstoned nodes are not listed or resolvable.
+
+Runs against the scratch Neo4j database in NEO4J_TEST_URI (skipped when
+unset); it creates and removes two Hospital nodes with negative ids.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dashboard_queries import HOSPITAL_QUERY, HOSPITALS_QUERY  # noqa: E402
+from intent_router import HOSPITAL_INTENTS  # noqa: E402
+from load_data import TOMBSTONE_QUERY  # noqa: E402
+from name_index import NameIndex  # noqa: E402
+from response_format import page_params  # noqa: E402
+
+NEO4J_TEST_URI = os.getenv("NEO4J_TEST_URI")
+
+pytestmark = pytest.mark.skipif(not NEO4J_TEST_URI, reason="NEO4J_TEST_URI (scratch database) not set")
+
+LIVE = {"id": -1001, "name": "Tombstone Test Live Hospital"}
+DELETED = {"id": -1002, "name": "Tombstone Test Deleted Hospital"}
+
+
+@pytest.fixture
+def driver():
+    from neo4j import GraphDatabase
+
+    driver = GraphDatabase.driver(
+        NEO4J_TEST_URI,
+        auth=(os.getenv("NEO4J_USERNAME", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")),
+    )
+    with driver.session() as session:
+        session.run(
+            "UNWIND $hospitals AS hospital "
+            "CREATE (:Hospital {id: hospital.id, name: hospital.name, state_name: 'CA'})",
+            hospitals=[LIVE, DELETED],
+        ).consume()
+        session.run(TOMBSTONE_QUERY.format(label="Hospital"), ids=[DELETED["id"]]).consume()
+    yield driver
+    with driver.session() as session:
+        session.run(
+            "MATCH (h:Hospital) WHERE h.id IN $ids DETACH DELETE h", ids=[LIVE["id"], DELETED["id"]]
+        ).consume()
+    driver.close()
+
+
+def _names(driver, cypher, params, column):
+    with driver.session() as session:
+        return {record[column] for record in session.run(cypher, params)}
+
+
+def test_tombstoned_hospital_is_not_listed(driver):
+    intents = {intent.name: intent for intent in HOSPITAL_INTENTS}
+    everything = page_params({}, page_rows=1_000_000)
+    listings = [
+        (HOSPITALS_QUERY, {}, "name"),
+        (intents["all_hospitals"].cypher, everything, "Hospital"),
+        (intents["hospital_stats"].cypher, everything, "Hospital"),
+        (intents["hospitals_by_state"].cypher, {**everything, "state": "CA"}, "Hospital"),
+    ]
+    for cypher, params, column in listings:
+        names = _names(driver, cypher, params, column)
+        assert LIVE["name"] in names
+        assert DELETED["name"] not in names
+    assert not _names(driver, HOSPITAL_QUERY, {"name": DELETED["name"]}, "hospital")
+
+
+def test_tombstoned_hospital_is_not_resolved(driver):
+    names = NameIndex()
+    names.load(driver)
+    assert names.prefix(LIVE["name"], label="Hospital")
+    assert not names.prefix(DELETED["name"], label="Hospital")
@@ -0,0 +1,142 @@
+"""
+Text Search
+-----------
+Ranked keyword search over visit and review text.
+
+Neo4j answers searches from the full-text (Lucene) indexes the loaders
+create; `lucene_query` turns what the user typed into a safe Lucene query
+restricted to one field, matching word prefixes and (for longer words)
+small typos:
+
+    lucene_query("pneumonia", "diagnosis")
+    -> 'diagnosis:(pneumonia* OR pneumonia~1)'
+
+The in-process graph backend has no Lucene, so it uses TrigramIndex: every
+text is split into padded 3-character grams ("  p", " pn", "pne", ...) held
+as sorted NumPy posting lists. A query scores each text by the share of its
+own trigrams the text contains, so substrings score 1.0 and typos still
+score high, and only the posting lists of the query's trigrams are read.
+"""
+
+import re
+
+import numpy as np
+
+# Index names, as created by hospital_neo4j_etl/src/search_indexes.py
+VISIT_TEXT_INDEX = "visit_text"
+REVIEW_TEXT_INDEX = "review_text"
+
+# Words are runs of letters/digits; everything else separates words
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words shorter than this are matched by prefix only (fuzzy would be noise)
+FUZZY_MIN_LENGTH = 4
+
+# Share of the query trigrams a text must contain to be returned
+TRIGRAM_MIN_SCORE = 0.6
+
+
+def words(text):
+    return WORD_PATTERN.findall((text or "").lower())
+
+
+def lucene_query(text, field=None):
+    """
+    Lucene query for the words in `text` (all must match), or "" if none.
+
+    Only [a-z0-9] words survive, so user input can never inject Lucene
+    syntax.
+    """
+    terms = []
+    for word in words(text):
+        if len(word) >= FUZZY_MIN_LENGTH:
+            terms.append(f"({word}* OR {word}~1)")
+        else:
+            terms.append(f"{word}*")
+    if not terms:
+        return ""
+    query = " AND ".join(terms)
+    return f"{field}:({query})" if field else query
+
+
+def _padded(text):
+    """Words padded like pg_trgm: two spaces before and one after each word"""
+    return "".join(f"  {word} " for word in words(text))
+
+
+def _trigram_codes(padded):
+    data = np.frombuffer(padded.encode("ascii"), dtype=np.uint8).astype(np.int64)
+    return np.unique((data[:-2] << 16) | (data[1:-1] << 8) | data[2:])
+
+
+class TrigramIndex:
+    """
+    Trigram posting lists over a column of strings.
+
+    Equal strings are indexed once (diagnoses repeat across millions of
+    visits), and search results are expanded back to the original rows.
+
+    Args:
+        texts: Sequence (or NumPy array) of strings, one per row
+    """
+
+    def __init__(self, texts):
+        values, inverse = np.unique(np.asarray(texts, dtype=str), return_inverse=True)
+        self.values = values
+        inverse = inverse.ravel()
+        # CSR from distinct value -> rows holding it
+        self._row_order = np.argsort(inverse, kind="stable")
+        self._row_offsets = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=len(values)))))
+
+        padded = [_padded(value) for value in values.tolist()]
+        lengths = np.fromiter((len(text) for text in padded), dtype=np.int64, count=len(padded))
+        data = np.frombuffer("".join(padded).encode("ascii"), dtype=np.uint8).astype(np.int64)
+        if len(data) < 3:
+            self._grams = self._postings = np.empty(0, dtype=np.int64)
+            self._offsets = np.zeros(1, dtype=np.int64)
+            return
+        owner = np.repeat(np.arange(len(values), dtype=np.int64), lengths)
+        codes = (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+        # Drop grams spanning two values, then (gram, value) duplicates
+        same = owner[:-2] == owner[2:]
+        keys = np.unique((codes[same] << 32) | owner[:-2][same])
+        codes, self._postings = keys >> 32, keys & 0xFFFFFFFF
+        self._grams, starts = np.unique(codes, return_index=True)
+        self._offsets = np.append(starts, len(codes))
+
+    def __len__(self):
+        return len(self._row_order)
+
+    def _value_scores(self, query):
+        """(distinct value indexes, scores) for values sharing query trigrams"""
+        padded = _padded(query)
+        if not padded:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        grams = _trigram_codes(padded)
+        if not len(self._grams):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        slots = np.minimum(np.searchsorted(self._grams, grams), len(self._grams) - 1)
+        slots = slots[self._grams[slots] == grams]
+        if not len(slots):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        postings = np.concatenate([self._postings[self._offsets[s]:self._offsets[s + 1]] for s in slots])
+        matched, hits = np.unique(postings, return_counts=True)
+        return matched, hits / len(grams)
+
+    def search(self, query, min_score=TRIGRAM_MIN_SCORE):
+        """
+        Rows whose text matches `query`, best first.
+
+        Returns:
+            (rows, scores): rows ordered by score descending, then row index
+        """
+        matched, scores = self._value_scores(query)
+        keep = scores >= min_score
+        matched, scores = matched[keep], scores[keep]
+        if not len(matched):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        starts, ends = self._row_offsets[matched], self._row_offsets[matched + 1]
+        rows = np.concatenate([self._row_order[s:e] for s, e in zip(starts, ends)])
+        row_scores = np.repeat(scores, ends - starts)
+        order = np.lexsort((rows, -row_scores))
+        return rows[order], row_scores[order]
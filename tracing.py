@@ -0,0 +1,322 @@
+"""
+Tracing
+-------
+Per-request latency spans for the chatbot apps.
+
+    with TRACER.span("chat_turn") as turn:
+        with TRACER.span("route"):
+            intent, params = bot.route(prompt)
+        turn.set(intent=intent.name)
+        rows = TRACER.traced("query", bot.stream_query(intent.cypher, params))
+
+span() times a block. traced() times only what happens inside an
+iterator's next() calls, so streamed query rows and the formatting that
+consumes them are measured separately even though they interleave. A
+traced iterator's parent is the span that is current when it is first
+pulled.
+
+Code running inside a span attaches what it knows with annotate(): rows
+returned, result cache hits and, for Neo4j, the server's
+result_available_after/result_consumed_after. With TRACE_PROFILE=true,
+queries also run under PROFILE and their db hits are added (debug only,
+since PROFILE slows every query down).
+
+When a trace's root span ends:
+- its spans go to the exporter chosen by TRACE_EXPORTER: "json" writes one
+  JSON line per span to the hospital_chatbot.trace logger, and "otel"
+  creates OpenTelemetry spans through the globally configured tracer
+  provider (needs opentelemetry-api)
+- LatencyStats keeps the last TRACE_WINDOW durations per intent and stage
+  for the p50/p95/p99 sidebar panels. A stage's time excludes its child
+  spans, and "total" is the whole request.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # optional; only needed for TRACE_EXPORTER=otel
+    otel_trace = None
+
+# "none", "json" or "otel"
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+
+# Run Neo4j queries under PROFILE and record db hits (debug only)
+TRACE_PROFILE = os.getenv("TRACE_PROFILE", "false").lower() == "true"
+
+# Requests kept per intent and stage for the percentiles
+TRACE_WINDOW = int(os.getenv("TRACE_WINDOW", 500))
+
+LOGGER = logging.getLogger("hospital_chatbot.trace")
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed stage of a request.
+
+    Args:
+        name: Stage name ("route", "query", ...)
+        parent: Enclosing span, or None for the root of a new trace
+        attributes: Initial attributes (e.g. intent)
+    """
+
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.parent = parent
+        self.root = self if parent is None else parent.root
+        self.trace_id = uuid.uuid4().hex if parent is None else parent.trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        # Time spent in the span (for traced iterators: inside next() only)
+        self.elapsed_ns = 0
+        self.children_ns = 0
+        self.error = None
+        if parent is None:
+            self.finished = []
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self):
+        return self.elapsed_ns / 1e6
+
+    @property
+    def self_ms(self):
+        """Time not spent in child spans"""
+        return max(self.elapsed_ns - self.children_ns, 0) / 1e6
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "self_ms": round(self.self_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def current_span():
+    return _current.get()
+
+
+def annotate(**attributes):
+    """Set attributes on the current span (no-op outside a span)"""
+    span = _current.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+# ============================================================================
+# EXPORTERS
+# ============================================================================
+class JsonLogExporter:
+    """One JSON object per finished span on the hospital_chatbot.trace logger"""
+
+    def __init__(self, logger=LOGGER):
+        self.logger = logger
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+    def on_start(self, span):
+        pass
+
+    def on_end(self, span):
+        self.logger.info(json.dumps(span.to_dict(), default=str))
+
+
+class OpenTelemetryExporter:
+    """Mirrors spans into OpenTelemetry (exported by the app's tracer provider)"""
+
+    def __init__(self):
+        if otel_trace is None:
+            raise RuntimeError("TRACE_EXPORTER=otel needs the opentelemetry-api package")
+        self.tracer = otel_trace.get_tracer("hospital_chatbot")
+        self._lock = threading.Lock()
+        self._spans = {}
+
+    def on_start(self, span):
+        with self._lock:
+            parent = self._spans.get(span.parent.span_id) if span.parent is not None else None
+        context = otel_trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = self.tracer.start_span(span.name, context=context, start_time=span.start_ns)
+        with self._lock:
+            self._spans[span.span_id] = otel_span
+
+    def on_end(self, span):
+        with self._lock:
+            otel_span = self._spans.pop(span.span_id, None)
+        if otel_span is None:
+            return
+        otel_span.set_attributes({
+            key: value for key, value in span.attributes.items()
+            if isinstance(value, (str, bool, int, float))
+        })
+        if span.error is not None:
+            otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, span.error))
+        otel_span.end(end_time=span.end_ns)
+
+
+# ============================================================================
+# ROLLING PERCENTILES
+# ============================================================================
+class LatencyStats:
+    """
+    The last `window` durations per (intent, stage), thread-safe.
+
+    A trace is filed under its root span's "intent" attribute (or the root
+    span's name when it has none).
+    """
+
+    def __init__(self, window=TRACE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, root):
+        intent = root.attributes.get("intent") or root.name
+        stages = {"total": root.duration_ms}
+        for span in root.finished:
+            stages[span.name] = stages.get(span.name, 0.0) + span.self_ms
+        with self._lock:
+            for stage, milliseconds in stages.items():
+                samples = self._samples.get((intent, stage))
+                if samples is None:
+                    samples = self._samples[(intent, stage)] = deque(maxlen=self.window)
+                samples.append(milliseconds)
+
+    def summary(self):
+        """Rows of intent, stage, n, p50_ms, p95_ms, p99_ms"""
+        with self._lock:
+            samples = [(key, np.array(values)) for key, values in sorted(self._samples.items())]
+        rows = []
+        for (intent, stage), values in samples:
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            rows.append({
+                "intent": intent, "stage": stage, "n": len(values),
+                "p50_ms": round(float(p50), 1), "p95_ms": round(float(p95), 1), "p99_ms": round(float(p99), 1),
+            })
+        return rows
+
+
+# ============================================================================
+# TRACER
+# ============================================================================
+class Tracer:
+    """
+    Creates spans, hands finished ones to the exporters and files each
+    finished trace in `stats`.
+
+    Args:
+        exporters: Objects with on_start(span) and on_end(span)
+        stats: LatencyStats (a new one by default)
+    """
+
+    def __init__(self, exporters=(), stats=None):
+        self.exporters = list(exporters)
+        self.stats = stats if stats is not None else LatencyStats()
+
+    def _start(self, name, attributes):
+        span = Span(name, _current.get(), attributes)
+        for exporter in self.exporters:
+            exporter.on_start(span)
+        return span
+
+    def _finish(self, span):
+        span.end_ns = time.time_ns()
+        if span.parent is not None:
+            span.parent.children_ns += span.elapsed_ns
+        span.root.finished.append(span)
+        for exporter in self.exporters:
+            try:
+                exporter.on_end(span)
+            except Exception:  # tracing must never break a request
+                LOGGER.exception("Span export failed")
+        if span.parent is None:
+            self.stats.record(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block as a child of the current span"""
+        span = self._start(name, attributes)
+        token = _current.set(span)
+        started = time.perf_counter_ns()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.elapsed_ns += time.perf_counter_ns() - started
+            _current.reset(token)
+            self._finish(span)
+
+    def traced(self, name, iterable, counter="rows", **attributes):
+        """
+        Yield from `iterable`, timing only the next() calls.
+
+        The span starts on the first pull, records the number of items
+        yielded under `counter` (unless something inside set it), and ends
+        when the iterator is exhausted or closed.
+        """
+        iterator = iter(iterable)
+        span = None
+        rows = 0
+        try:
+            while True:
+                started = time.perf_counter_ns()
+                if span is None:
+                    span = self._start(name, attributes)
+                token = _current.set(span)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                except BaseException as e:
+                    span.error = repr(e)
+                    raise
+                finally:
+                    span.elapsed_ns += time.perf_counter_ns() - started
+                    _current.reset(token)
+                rows += 1
+                yield item
+        finally:
+            if span is not None:
+                span.attributes.setdefault(counter, rows)
+                self._finish(span)
+
+
+def tracer_from_env():
+    """Tracer with the exporter named by TRACE_EXPORTER"""
+    exporters = []
+    if TRACE_EXPORTER == "json":
+        exporters.append(JsonLogExporter())
+    elif TRACE_EXPORTER == "otel":
+        exporters.append(OpenTelemetryExporter())
+    return Tracer(exporters)
+
+
+# Shared by every Streamlit session in the process (modules are imported once)
+TRACER = tracer_from_env()
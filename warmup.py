@@ -0,0 +1,324 @@
+"""
+Warm-Up
+-------
+Startup warm-up and readiness signal for the chatbot apps.
+
+Every session needs the same small datasets (the hospital list behind the
+dashboard's selectboxes, the physician list, the top diagnoses). Warmup
+loads them once per process into st.cache_data, so sessions share one copy,
+and runs the queries users ask most once, so Neo4j's page cache is hot
+before the first real request. A background thread reloads the datasets
+every WARMUP_REFRESH_SECONDS. The fresh copy is cached under a new
+generation before readers switch to it, so no request ever waits for a
+reload.
+
+Streamlit only executes an app script when a browser session connects, so
+warming up from inside the script would always happen on a user's time.
+Start the app through this module instead; it starts the warm-up and the
+readiness endpoint in the Streamlit process, then runs the app:
+
+    python warmup.py chatbot_app.py [streamlit run options]
+
+With READINESS_PORT set, a small HTTP server answers
+
+    GET /ready   200 once warm, 503 while warming up (JSON status)
+    GET /live    200 while the process is up
+
+so a load balancer only routes traffic to warm instances. Apps started
+with plain `streamlit run` still get the shared cache, but warm up on the
+first session.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+from dotenv import load_dotenv
+
+from dashboard_queries import (
+    DASHBOARD_QUERY_HANDLERS,
+    HOSPITAL_QUERY,
+    HOSPITALS_QUERY,
+    PHYSICIANS_QUERY,
+    REVIEWS_BY_HOSPITAL_QUERY,
+)
+from graph_backend import CHATBOT_QUERY_HANDLERS, backend_from_env
+from intent_router import DEFAULT_INTENT, HOSPITAL_INTENTS
+from response_format import page_params
+
+load_dotenv()
+
+# Seconds between background reloads of the hot datasets
+WARMUP_REFRESH_SECONDS = int(os.getenv("WARMUP_REFRESH_SECONDS", 300))
+
+# Seconds between attempts while the first warm-up fails (e.g. Neo4j starting)
+WARMUP_RETRY_SECONDS = int(os.getenv("WARMUP_RETRY_SECONDS", 10))
+
+# Hospitals whose dashboard statistics are primed at startup
+WARMUP_PRIME_HOSPITALS = int(os.getenv("WARMUP_PRIME_HOSPITALS", 50))
+
+# Port of the /ready and /live endpoints (unset: no readiness server)
+READINESS_PORT = os.getenv("READINESS_PORT")
+
+LOGGER = logging.getLogger("hospital_chatbot.warmup")
+
+_CHATBOT_INTENTS = {intent.name: intent for intent in [*HOSPITAL_INTENTS, DEFAULT_INTENT]}
+
+
+def _first_page(intent):
+    """Parameters of the first answer page of a chatbot intent without slots"""
+    return page_params({}) if intent.paged else {}
+
+
+def _hospital_stats_params(warmup):
+    hospitals = warmup.get("hospitals")[:WARMUP_PRIME_HOSPITALS]
+    return [{"name": hospital["name"]} for hospital in hospitals]
+
+
+# ============================================================================
+# APPS: Hot datasets and primer queries per app
+# ============================================================================
+# datasets: name -> (intent, cypher, params), cached and refreshed
+# primers:  (intent, cypher, params or warmup -> list of params), run once at
+#           startup in this order; their results are dropped
+APPS = {
+    "dashboard": {
+        "script": "chatbot_app.py",
+        "handlers": DASHBOARD_QUERY_HANDLERS,
+        "datasets": {
+            "hospitals": ("all_hospitals", HOSPITALS_QUERY, {}),
+            "physicians": ("all_physicians", PHYSICIANS_QUERY, {}),
+        },
+        "primers": [
+            ("hospital_stats", HOSPITAL_QUERY, _hospital_stats_params),
+            ("reviews", REVIEWS_BY_HOSPITAL_QUERY, _hospital_stats_params),
+        ],
+    },
+    "chatbot": {
+        "script": "chatbot_ai.py",
+        "handlers": CHATBOT_QUERY_HANDLERS,
+        "datasets": {
+            name: (name, _CHATBOT_INTENTS[name].cypher, _first_page(_CHATBOT_INTENTS[name]))
+            for name in ["all_hospitals", "physician_salaries", "common_diagnoses"]
+        },
+        # Every intent that needs no names, i.e. the questions asked most
+        "primers": [
+            (intent.name, intent.cypher, _first_page(intent))
+            for intent in _CHATBOT_INTENTS.values() if not intent.slots
+        ],
+    },
+}
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_rows(key, generation, _load):
+    """Rows of one hot dataset; each refresh is cached as a new generation"""
+    return _load()
+
+
+# ============================================================================
+# WARM-UP
+# ============================================================================
+class Warmup:
+    """
+    Loads an app's hot datasets and primer queries, then keeps the datasets
+    fresh from a daemon thread.
+
+    Args:
+        app: APPS key ("dashboard" or "chatbot")
+        backend: Graph backend (see graph_backend.py) the queries run on
+        refresh_seconds: Interval of the background reloads
+    """
+
+    def __init__(self, app, backend, refresh_seconds=WARMUP_REFRESH_SECONDS):
+        self.app = app
+        self.backend = backend
+        self.datasets = APPS[app]["datasets"]
+        self.primers = APPS[app]["primers"]
+        self.refresh_seconds = refresh_seconds
+        self.ready = threading.Event()
+        self.warm_seconds = None
+        self.refreshed_at = None
+        self.error = None
+        self._generations = {name: 0 for name in self.datasets}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __contains__(self, name):
+        return name in self.datasets
+
+    def serves(self, name, params):
+        """True when the hot dataset `name` is the result of a query with `params`"""
+        return name in self.datasets and self.datasets[name][2] == (params or {})
+
+    def _loader(self, name):
+        _, cypher, params = self.datasets[name]
+        return lambda: self.backend.run(cypher, params)
+
+    def get(self, name):
+        """Rows of a hot dataset (loaded on the spot if warm-up has not reached it)"""
+        with self._lock:
+            generation = self._generations[name]
+        return _cached_rows(f"{self.app}.{name}", generation, self._loader(name))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.app}-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._warm()
+                break
+            except Exception as e:
+                self.error = repr(e)
+                LOGGER.warning("Warm-up failed, retrying in %ss: %s", WARMUP_RETRY_SECONDS, e)
+                self._stopped.wait(WARMUP_RETRY_SECONDS)
+        while not self._stopped.wait(self.refresh_seconds):
+            self.refresh()
+
+    def _warm(self):
+        started = time.perf_counter()
+        for name in self.datasets:
+            self.get(name)
+        primed = 0
+        for intent, cypher, params in self.primers:
+            for values in (params(self) if callable(params) else [params]):
+                try:
+                    self.backend.run(cypher, values)
+                    primed += 1
+                except Exception as e:  # a slow or failing primer must not block readiness
+                    LOGGER.warning("Primer %s failed: %s", intent, e)
+        self.warm_seconds = time.perf_counter() - started
+        self.refreshed_at = time.time()
+        self.error = None
+        self.ready.set()
+        LOGGER.info("%s warm in %.2fs (%d datasets, %d primer queries)",
+                    self.app, self.warm_seconds, len(self.datasets), primed)
+
+    def refresh(self):
+        """Reload every dataset into the next generation, then switch readers to it"""
+        for name in self.datasets:
+            with self._lock:
+                generation = self._generations[name] + 1
+            try:
+                _cached_rows(f"{self.app}.{name}", generation, self._loader(name))
+            except Exception as e:  # keep serving the previous generation
+                self.error = repr(e)
+                LOGGER.warning("Refreshing %s failed: %s", name, e)
+                continue
+            with self._lock:
+                self._generations[name] = generation
+        self.refreshed_at = time.time()
+
+    def status(self):
+        with self._lock:
+            generations = dict(self._generations)
+        return {
+            "app": self.app,
+            "ready": self.ready.is_set(),
+            "warm_seconds": round(self.warm_seconds, 3) if self.warm_seconds is not None else None,
+            "refreshed_at": self.refreshed_at,
+            "generations": generations,
+            "error": self.error,
+        }
+
+
+# ============================================================================
+# READINESS ENDPOINT
+# ============================================================================
+class _ReadinessHandler(BaseHTTPRequestHandler):
+    warmup = None
+
+    def do_GET(self):
+        if self.path == "/live":
+            code, body = 200, {"live": True}
+        elif self.path == "/ready":
+            body = self.warmup.status()
+            code = 200 if body["ready"] else 503
+        else:
+            code, body = 404, {"error": "not found"}
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):  # probes would flood the log
+        pass
+
+
+# One readiness server per port and one warm-up per app in the process,
+# shared by the launcher below and every Streamlit session
+_SERVERS = {}
+_WARMUPS = {}
+_WARMUPS_LOCK = threading.Lock()
+
+
+def serve_readiness(warmup, port):
+    """Serve /ready and /live for `warmup` from a daemon thread (once per port)"""
+    port = int(port)
+    with _WARMUPS_LOCK:
+        server = _SERVERS.get(port)
+        if server is None:
+            handler = type("ReadinessHandler", (_ReadinessHandler,), {"warmup": warmup})
+            server = _SERVERS[port] = ThreadingHTTPServer(("0.0.0.0", port), handler)
+            threading.Thread(target=server.serve_forever, name="readiness", daemon=True).start()
+            LOGGER.info("Readiness endpoint on port %s (/ready, /live)", port)
+        return server
+
+
+def warmup_for(app, backend):
+    """The process's Warmup for `app`, created and started on first use"""
+    with _WARMUPS_LOCK:
+        warmup = _WARMUPS.get(app)
+        if warmup is None:
+            warmup = _WARMUPS[app] = Warmup(app, backend).start()
+    if READINESS_PORT:
+        serve_readiness(warmup, READINESS_PORT)
+    return warmup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm up a chatbot app, then run it with Streamlit")
+    parser.add_argument("script", choices=[spec["script"] for spec in APPS.values()])
+    parser.add_argument("streamlit_args", nargs=argparse.REMAINDER,
+                        help="passed on to `streamlit run`")
+    args = parser.parse_args()
+
+    # Run as a script this file is __main__; the apps' `from warmup import
+    # warmup_for` loads it again as `warmup`. Register the warm-up in that
+    # module so the apps find it instead of starting their own.
+    import warmup
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s]: %(message)s")
+    app = next(name for name, spec in warmup.APPS.items() if spec["script"] == args.script)
+    backend = backend_from_env(
+        uri=os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        user=os.getenv("NEO4J_USERNAME", "neo4j"),
+        password=os.getenv("NEO4J_PASSWORD", "password"),
+        memory_handlers=warmup.APPS[app]["handlers"],
+    )
+    warmup.warmup_for(app, backend)
+
+    from streamlit.web import cli as stcli
+
+    sys.argv = ["streamlit", "run", args.script, *args.streamlit_args]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()